@@ -0,0 +1 @@
+"""Микробенчмарки горячих путей бота."""
@@ -0,0 +1,149 @@
+"""
+Микробенчмарки валидации, форматирования и клавиатур.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.bench_utils
+    python -m benchmarks.bench_utils --factor 2.0   # медленная машина / CI
+
+Для каждого замера задан бюджет времени в микросекундах на одно имя
+(или на один вызов для клавиатур). Превышение бюджета считается
+регрессией, и скрипт завершается с кодом 1.
+"""
+import argparse
+import random
+import sys
+import timeit
+from typing import Callable
+
+from services.settings_service import settings
+import keyboards
+import utils
+from services.name_dictionary import name_dictionary
+
+
+# Размеры списков имен для замеров
+SIZES = (10, 100, 10_000)
+
+# Бюджеты: мкс на одно имя для функций над списками
+PER_NAME_BUDGETS_US = {
+    "validate_name": 4.0,
+    "validate_names_list": 4.0,
+    "validate_new_names": 4.0,
+    "format_note_text": 1.5,
+    "format_prayer_text": 1.5,
+    "suggest_canonical": 100.0,
+}
+
+# Бюджеты: мкс на один вызов для клавиатур
+PER_CALL_BUDGETS_US = {
+    "get_main_menu_keyboard": 2.0,
+    "get_note_type_keyboard": 2.0,
+    "get_priest_main_keyboard": 2.0,
+    "get_priest_note_type_keyboard": 2.0,
+    "get_note_actions_keyboard": 25.0,
+    "get_admin_main_keyboard": 2.0,
+    "get_cancel_keyboard": 2.0,
+}
+
+_BASE_NAMES = (
+    "Иоанн", "Мария", "Александр", "Елена", "Николай", "Татиана", "Сергий",
+    "Ольга", "Димитрий", "Наталия", "Андрей", "Ирина", "Михаил", "Анна",
+    "Георгий", "Екатерина", "Алексий", "Ксения", "Владимир", "Людмила",
+    "Пётр", "Евдокия", "Феодор", "Параскева", "Павел", "Надежда", "Василий",
+    "Любовь", "Константин", "Вера", "Игорь", "София", "Стефан", "Галина",
+)
+
+_QUALIFIERS = (
+    "младенца", "отрока", "отроковицы", "воина", "болящего", "болящей",
+    "путешествующего", "иерея", "монахини", "новопреставленного",
+)
+
+
+def make_names(count: int, seed: int = 42) -> list[str]:
+    """Сгенерировать реалистичный список имен на кириллице."""
+    rnd = random.Random(seed)
+    names = []
+    for _ in range(count):
+        name = rnd.choice(_BASE_NAMES)
+        roll = rnd.random()
+        if roll < 0.2:
+            name = f"{rnd.choice(_QUALIFIERS)} {name}"
+        elif roll < 0.25:
+            name = f"{name}-{rnd.choice(_BASE_NAMES)}"
+        names.append(name)
+    return names
+
+
+def _measure(func: Callable[[], object]) -> float:
+    """Среднее время одного вызова в микросекундах (лучший из повторов)."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / number * 1_000_000
+
+
+def run(factor: float = 1.0) -> list[tuple[str, int, float, float]]:
+    """
+    Выполнить все замеры.
+    Возвращает список (имя замера, размер, мкс на единицу, бюджет).
+    """
+    results = []
+    
+    # Ограничение на количество имен не должно мешать замерам больших списков
+    settings.MAX_NAMES_PER_NOTE = max(SIZES)
+    
+    for size in SIZES:
+        names = make_names(size)
+        half = size // 2
+        cases = {
+            "validate_name": lambda: [utils.validate_name(n) for n in names],
+            "validate_names_list": lambda: utils.validate_names_list(names),
+            "validate_new_names": lambda: utils.validate_new_names(names),
+            "format_note_text": lambda: utils.format_note_text(
+                "for_health", names[:half], names[half:]
+            ),
+            "format_prayer_text": lambda: utils.format_prayer_text("for_health", names),
+            "suggest_canonical": lambda: name_dictionary.suggest_canonical(names),
+        }
+        for case, func in cases.items():
+            per_name = _measure(func) / size
+            results.append((case, size, per_name, PER_NAME_BUDGETS_US[case] * factor))
+    
+    for case, budget in PER_CALL_BUDGETS_US.items():
+        builder = getattr(keyboards, case)
+        if case == "get_note_actions_keyboard":
+            func = lambda: builder(123456)
+        else:
+            func = builder
+        results.append((case, 1, _measure(func), budget * factor))
+    
+    return results
+
+
+def main() -> int:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--factor",
+        type=float,
+        default=1.0,
+        help="множитель бюджетов (для медленных машин)"
+    )
+    args = parser.parse_args()
+    
+    failed = 0
+    print(f"{'замер':<32}{'размер':>8}{'мкс/ед.':>12}{'бюджет':>10}")
+    for case, size, value, budget in run(args.factor):
+        mark = "" if value <= budget else "  РЕГРЕССИЯ"
+        failed += bool(mark)
+        print(f"{case:<32}{size:>8}{value:>12.3f}{budget:>10.1f}{mark}")
+    
+    if failed:
+        print(f"\nПревышен бюджет в {failed} замерах")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,287 @@
 """Подключение к базе данных и инициализация таблиц."""
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool
+import logging
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+from sqlalchemy import event, inspect, literal, text, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from config import Config
-from models import Base
+
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Ключ advisory lock PostgreSQL: миграции выполняет один экземпляр за раз
+MIGRATION_LOCK_ID = 7_310_049
+
+# Ревизия схемы, которую создавали версии без миграций (create_all)
+BASELINE_REVISION = "0001"
+
+# Отставание реплики PostgreSQL в секундах: 0, если это не реплика
+# или все полученные изменения уже применены
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _configure_sqlite(engine, memory: bool):
+    """
+    Профиль SQLite: WAL (чтение снаружи, например резервное копирование,
+    не блокирует запись) и настройки на каждое соединение.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{Config.SQLITE_CACHE_MB * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _alembic_config(connection=None):
+    """Конфигурация Alembic независимо от текущего каталога."""
+    from alembic.config import Config as AlembicConfig
+    
+    alembic_config = AlembicConfig(str(BASE_DIR / "alembic.ini"))
+    alembic_config.set_main_option("script_location", str(BASE_DIR / "migrations"))
+    if connection is not None:
+        alembic_config.attributes["connection"] = connection
+    return alembic_config
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    """Движок для PostgreSQL или SQLite с профилем соответствующей БД."""
+    parsed_url = make_url(url)
+    is_sqlite = parsed_url.get_backend_name() == "sqlite"
+    
+    if is_sqlite:
+        # SQLite допускает одного писателя, а транзакция, начатая чтением,
+        # не может дождаться блокировки записи (сразу "database is locked").
+        # Поэтому процесс работает через одно соединение: сессии ждут его
+        # в очереди пула и выполняются по одной. База в памяти живет,
+        # пока это соединение открыто.
+        engine_options = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": 1,
+            "max_overflow": 0,
+            "pool_timeout": Config.SQLITE_POOL_TIMEOUT,
+        }
+    elif Config.DB_POOL_SIZE > 0:
+        # Соединения переиспользуются, поэтому кэш подготовленных выражений
+        # asyncpg (на соединение) действительно работает для горячих запросов
+        engine_options = {
+            "pool_size": Config.DB_POOL_SIZE,
+            "max_overflow": Config.DB_POOL_MAX_OVERFLOW,
+            "pool_recycle": 1800,
+        }
+    else:
+        # Внешний пул (PgBouncer в режиме transaction): соединение на сессию,
+        # подготовленные выражения выключаются через DB_STATEMENT_CACHE_SIZE=0
+        engine_options = {"poolclass": NullPool}
+    
+    if parsed_url.get_driver_name() == "asyncpg":
+        engine_options["connect_args"] = {
+            "prepared_statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE
+        }
+    
+    engine = create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        **engine_options
+    )
+    if is_sqlite:
+        _configure_sqlite(engine, parsed_url.database in (None, "", ":memory:"))
+    return engine
 
 
 class Database:
-    """Класс для работы с базой данных."""
+    """
+    Класс для работы с базой данных. Отчеты и выгрузки могут читать
+    с реплики (read_url): она используется, пока доступна и отстает
+    не больше чем на DATABASE_READ_MAX_LAG_SECONDS, иначе - основная БД.
+    """
     
-    def __init__(self):
+    def __init__(self, url: str = Config.DATABASE_URL, read_url: str | None = Config.DATABASE_READ_URL):
         """Инициализация подключения к БД."""
-        self.engine = create_async_engine(
-            Config.DATABASE_URL,
-            echo=False,
-            poolclass=NullPool,
-            future=True
-        )
+        self.is_sqlite = make_url(url).get_backend_name() == "sqlite"
+        self.engine = _create_engine(url)
         self.async_session_maker = async_sessionmaker(
             self.engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        
+        self.read_engine = _create_engine(read_url) if read_url else None
+        self.read_session_maker = async_sessionmaker(
+            self.read_engine,
+            class_=AsyncSession,
+            expire_on_commit=False
+        ) if self.read_engine else None
+        self.max_replica_lag = Config.DATABASE_READ_MAX_LAG_SECONDS
+        self.replica_check_interval = Config.DATABASE_READ_CHECK_SECONDS
+        self._replica_usable = False
+        self._replica_checked_at: float | None = None
+    
+    @property
+    def supports_skip_locked(self) -> bool:
+        """Поддерживает ли БД SELECT ... FOR UPDATE SKIP LOCKED."""
+        return not self.is_sqlite
+    
+    def skip_locked(self, query):
+        """
+        Пакетная выборка без строк, захваченных другими процессами
+        (FOR UPDATE SKIP LOCKED). В SQLite запись и так идет по одной,
+        поэтому запрос не меняется.
+        """
+        if self.supports_skip_locked:
+            return query.with_for_update(skip_locked=True)
+        return query
     
     async def init_db(self):
-        """Создание всех таблиц в базе данных."""
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        """
+        Проверка версии схемы вместо create_all: одно чтение alembic_version
+        и сравнение с последней миграцией. Если схема отстает, миграции
+        применяются при DB_AUTO_MIGRATE (на PostgreSQL под advisory lock,
+        чтобы экземпляры не мигрировали одновременно), иначе запуск
+        прерывается. База без alembic_version, но с таблицами создана
+        версией без миграций: она помечается исходной ревизией и
+        обновляется дальше.
+        """
+        # Alembic нужен только здесь: импорт не задерживает остальной запуск
+        from alembic import command
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+        
+        def read_state(sync_conn) -> tuple[str | None, bool]:
+            current = MigrationContext.configure(sync_conn).get_current_revision()
+            return current, current is None and inspect(sync_conn).has_table("users")
+        
+        def upgrade(sync_conn):
+            alembic_config = _alembic_config(sync_conn)
+            if unversioned:
+                command.stamp(alembic_config, BASELINE_REVISION)
+            command.upgrade(alembic_config, "head")
+        
+        head = ScriptDirectory.from_config(_alembic_config()).get_current_head()
+        async with self.engine.connect() as conn:
+            current, unversioned = await conn.run_sync(read_state)
+            if current == head:
+                return
+            
+            if not Config.DB_AUTO_MIGRATE:
+                hint = f"alembic stamp {BASELINE_REVISION} && " if unversioned else ""
+                raise RuntimeError(
+                    f"Схема БД не актуальна ({current} вместо {head}): выполните {hint}alembic upgrade head"
+                )
+            
+            logger.info(f"Миграция схемы БД: {current} -> {head}")
+            await conn.rollback()
+            if not self.is_sqlite:
+                await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+                await conn.commit()
+            try:
+                # Пока ждали блокировку, базу мог обновить другой экземпляр
+                current, unversioned = await conn.run_sync(read_state)
+                await conn.rollback()
+                if current != head:
+                    await conn.run_sync(upgrade)
+                    await conn.commit()
+            finally:
+                if not self.is_sqlite:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                    await conn.commit()
     
     async def close(self):
         """Закрытие соединения с БД."""
         await self.engine.dispose()
+        if self.read_engine is not None:
+            await self.read_engine.dispose()
     
     def get_session(self):
         """Получение сессии БД (async context manager)."""
         return self.async_session_maker()
+    
+    async def replica_lag(self) -> float | None:
+        """Отставание реплики в секундах; None - реплика недоступна."""
+        try:
+            async with self.read_engine.connect() as conn:
+                if self.read_engine.dialect.name != "postgresql":
+                    await conn.execute(text("SELECT 1"))
+                    return 0.0
+                return float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0)
+        except Exception as e:
+            logger.warning(f"Реплика БД недоступна: {e}")
+            return None
+    
+    async def is_replica_usable(self) -> bool:
+        """
+        Можно ли читать с реплики. Проверка кэшируется на
+        replica_check_interval секунд, чтобы не удваивать запросы.
+        """
+        if self.read_engine is None:
+            return False
+        
+        now = time.monotonic()
+        if self._replica_checked_at is None or now - self._replica_checked_at >= self.replica_check_interval:
+            self._replica_checked_at = now
+            lag = await self.replica_lag()
+            usable = lag is not None and lag <= self.max_replica_lag
+            if not usable and self._replica_usable:
+                logger.warning(f"Чтение переключено на основную БД (отставание реплики: {lag})")
+            self._replica_usable = usable
+        return self._replica_usable
+    
+    @asynccontextmanager
+    async def get_read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Сессия только для чтения (отчеты, статистика, выгрузки): реплика,
+        если она настроена и достаточно свежая, иначе основная БД.
+        """
+        maker = self.read_session_maker if await self.is_replica_usable() else self.async_session_maker
+        async with maker() as session:
+            yield session
+    
+    async def iter_batches(self, query, keys, batch_size: int, read: bool = False) -> AsyncIterator[tuple]:
+        """
+        Строки query пачками по batch_size с keyset-пагинацией по колонкам
+        keys (по возрастанию, вместе уникальны). Ключи - id и перечисления,
+        не время: в SQLite func.now() и переданный datetime хранятся
+        строками разного формата и не сравниваются точно.
+        
+        Каждая пачка читается в своей короткой сессии (read - сессия для
+        чтения): соединение свободно, пока вызывающий отдает строки
+        медленному клиенту, что важно для единственного соединения SQLite.
+        Пачки читаются разными транзакциями, общего снимка у них нет.
+        Колонки keys в строки не входят.
+        """
+        query = query.add_columns(*keys).order_by(*keys).limit(batch_size)
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                page = page.where(
+                    tuple_(*keys) > tuple_(*(literal(value, key.type) for value, key in zip(last, keys)))
+                )
+            async with (self.get_read_session() if read else self.get_session()) as session:
+                rows = (await session.execute(page)).all()
+            
+            for row in rows:
+                yield tuple(row[:-len(keys)])
+            if len(rows) < batch_size:
+                return
+            last = tuple(rows[-1][-len(keys):])
 
 
 # Глобальный экземпляр базы данных
 db = Database()
-
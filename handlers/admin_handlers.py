@@ -1,18 +1,36 @@
 """Обработчики для администратора."""
+import tempfile
+from datetime import datetime, timedelta
+from html import escape
 from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message
+from aiogram.types import Message, FSInputFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import db
-from models import UserRole
+from models import NoteType, UserRole, DEFAULT_PARISH_ID
 from services.user_service import UserService
 from services.note_service import NoteService
+from services.stats_service import StatsService
+from services.activity_service import ActivityService
+from services.export_service import ExportService, parse_date_range
+from services.settings_service import Settings, SettingsService, get_settings
+from services.slot_service import SlotService, SERVICE_TYPE_MAX_LENGTH, to_local
+from services.parish_service import ParishService
 from keyboards import get_admin_main_keyboard, get_cancel_keyboard
+from middlewares.role_middleware import RoleFilter
 
 
 router = Router()
+router.message.filter(RoleFilter(UserRole.ADMIN))
+router.callback_query.filter(RoleFilter(UserRole.ADMIN))
+
+# Подписи типов записок в отчете
+REPORT_TYPE_TITLES = {
+    NoteType.FOR_HEALTH: "🙏 За здравие",
+    NoteType.FOR_REPOSE: "🕯️ Об упокоении",
+}
 
 
 class AdminStates(StatesGroup):
@@ -21,43 +39,28 @@ class AdminStates(StatesGroup):
     waiting_for_role = State()
 
 
-def check_admin_access(func):
-    """Декоратор для проверки доступа администратора."""
-    async def wrapper(message: Message, *args, **kwargs):
-        async with db.get_session() as session:
-            is_admin = await UserService.is_admin(session, message.from_user.id)
-            if not is_admin:
-                await message.answer("❌ У вас нет доступа к этой функции.")
-                return
-            return await func(message, *args, **kwargs)
-    return wrapper
-
-
 @router.message(Command("start"))
-async def cmd_start_admin(message: Message):
+async def cmd_start_admin(message: Message, state: FSMContext):
     """Обработчик команды /start для администратора."""
-    async with db.get_session() as session:
-        is_admin = await UserService.is_admin(session, message.from_user.id)
-        if is_admin:
-            await message.answer(
-                "Добро пожаловать! Вы вошли как администратор.\n\n"
-                "Используйте кнопки меню для управления системой.",
-                reply_markup=get_admin_main_keyboard()
-            )
+    await state.clear()
+    await message.answer(
+        "Добро пожаловать! Вы вошли как администратор.\n\n"
+        "Используйте кнопки меню для управления системой.",
+        reply_markup=get_admin_main_keyboard()
+    )
 
 
 @router.message(F.text == "📊 Статистика")
-@check_admin_access
-async def show_statistics(message: Message):
-    """Показать статистику системы."""
-    async with db.get_session() as session:
-        queue_count = await NoteService.get_queue_count(session)
+async def show_statistics(message: Message, parish_id: int):
+    """Показать статистику прихода."""
+    async with db.get_read_session() as session:
+        queue_count = await NoteService.get_queue_count(session, parish_id)
         
         # Получаем количество пользователей по ролям
-        users = await UserService.get_users_by_role(session, UserRole.USER)
-        priests = await UserService.get_users_by_role(session, UserRole.PRIEST)
-        altar_servers = await UserService.get_users_by_role(session, UserRole.ALTAR_SERVER)
-        admins = await UserService.get_users_by_role(session, UserRole.ADMIN)
+        users = await UserService.get_users_by_role(session, UserRole.USER, parish_id)
+        priests = await UserService.get_users_by_role(session, UserRole.PRIEST, parish_id)
+        altar_servers = await UserService.get_users_by_role(session, UserRole.ALTAR_SERVER, parish_id)
+        admins = await UserService.get_users_by_role(session, UserRole.ADMIN, parish_id)
         
         stats_text = (
             "📊 <b>Статистика системы</b>\n\n"
@@ -72,8 +75,77 @@ async def show_statistics(message: Message):
         await message.answer(stats_text, parse_mode="HTML")
 
 
+@router.message(F.text == "📅 Отчет")
+@router.message(Command("report"))
+async def show_report(message: Message, parish_id: int):
+    """Отчет прихода по дням: пожертвования, прочтения, время до прочтения."""
+    days = 7
+    parts = (message.text or "").split()
+    if len(parts) > 1 and parts[1].isdigit():
+        days = max(1, min(int(parts[1]), 90))
+    
+    async with db.get_read_session() as session:
+        daily = await StatsService.get_daily_report(session, parish_id, days)
+        readers = await StatsService.get_reader_report(session, parish_id, days)
+    
+    report_text = f"📅 <b>Отчет за {days} дн.</b>\n\n"
+    
+    if not daily:
+        report_text += "Нет данных за период."
+    else:
+        current_day = None
+        for day, note_type, paid, donations, read, latency in daily:
+            if day != current_day:
+                if current_day is not None:
+                    report_text += "\n"
+                report_text += f"<b>{day.strftime('%d.%m.%Y')}</b>\n"
+                current_day = day
+            avg = f", в среднем {latency / read / 3600:.1f} ч до прочтения" if read else ""
+            report_text += (
+                f"{REPORT_TYPE_TITLES[note_type]}: оплачено {paid} "
+                f"({donations:.2f} руб.), прочитано {read}{avg}\n"
+            )
+    
+    if readers:
+        report_text += "\n📖 <b>Прочтения по читающим:</b>\n"
+        for reader, read, latency in readers:
+            username = reader.username or f"ID: {reader.telegram_id}"
+            avg = f", в среднем {latency / read / 3600:.1f} ч от оплаты" if read else ""
+            report_text += f"• {username}: {read}{avg}\n"
+    
+    await message.answer(report_text, parse_mode="HTML")
+
+
+@router.message(Command("export"))
+async def export_notes(message: Message, parish_id: int):
+    """
+    Выгрузка записок и платежей прихода в CSV (gzip) для бухгалтерии.
+    Формат: /export [YYYY-MM-DD] [YYYY-MM-DD]
+    """
+    parts = message.text.split()[1:]
+    try:
+        start, end = parse_date_range(*(parts + [None, None])[:2])
+    except ValueError:
+        await message.answer("❌ Формат: /export [ГГГГ-ММ-ДД] [ГГГГ-ММ-ДД]")
+        return
+    
+    first_day = to_local(start).date()
+    last_day = to_local(end).date() - timedelta(days=1)
+    filename = f"notes_{first_day}_{last_day}.csv.gz"
+    
+    # Выгрузка пишется во временный файл по чанкам, без накопления в памяти
+    with tempfile.NamedTemporaryFile(suffix=".csv.gz") as tmp:
+        async for chunk in ExportService.iter_export(start, end, "csv", parish_id):
+            tmp.write(chunk)
+        tmp.flush()
+        
+        await message.answer_document(
+            FSInputFile(tmp.name, filename=filename),
+            caption=f"📤 Выгрузка за {first_day:%d.%m.%Y} – {last_day:%d.%m.%Y} (без имен)"
+        )
+
+
 @router.message(F.text == "👥 Управление ролями")
-@check_admin_access
 async def start_manage_roles(message: Message, state: FSMContext):
     """Начать управление ролями."""
     await message.answer(
@@ -84,8 +156,7 @@ async def start_manage_roles(message: Message, state: FSMContext):
 
 
 @router.message(StateFilter(AdminStates.waiting_for_user_id))
-@check_admin_access
-async def process_user_id(message: Message, state: FSMContext):
+async def process_user_id(message: Message, state: FSMContext, parish_id: int):
     """Обработка Telegram ID пользователя."""
     if message.text == "❌ Отмена":
         await state.clear()
@@ -104,6 +175,16 @@ async def process_user_id(message: Message, state: FSMContext):
             await message.answer("❌ Пользователь с таким ID не найден.")
             return
         
+        # Служащих другого прихода может менять только администратор
+        # прихода по умолчанию
+        if (
+            user.role != UserRole.USER
+            and user.parish_id != parish_id
+            and parish_id != DEFAULT_PARISH_ID
+        ):
+            await message.answer("❌ Пользователь относится к другому приходу.")
+            return
+        
         await state.update_data(telegram_id=telegram_id, current_role=user.role.value)
         
         roles_text = (
@@ -121,8 +202,7 @@ async def process_user_id(message: Message, state: FSMContext):
 
 
 @router.message(StateFilter(AdminStates.waiting_for_role))
-@check_admin_access
-async def process_role(message: Message, state: FSMContext):
+async def process_role(message: Message, state: FSMContext, parish_id: int):
     """Обработка выбора роли."""
     if message.text == "❌ Отмена":
         await state.clear()
@@ -156,7 +236,8 @@ async def process_role(message: Message, state: FSMContext):
             await state.clear()
             return
         
-        success = await UserService.update_user_role(session, user.id, role)
+        # Назначенный пользователь привязывается к приходу администратора
+        success = await UserService.update_user_role(session, user.id, role, parish_id)
         
         if success:
             await message.answer(
@@ -174,48 +255,182 @@ async def process_role(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "📈 Активность")
-@check_admin_access
-async def show_activity(message: Message):
-    """Показать активность священников/алтарников."""
-    async with db.get_session() as session:
-        priests = await UserService.get_users_by_role(session, UserRole.PRIEST)
-        altar_servers = await UserService.get_users_by_role(session, UserRole.ALTAR_SERVER)
-        
-        activity_text = "📈 <b>Активность священников и алтарников</b>\n\n"
-        
-        if not priests and not altar_servers:
-            activity_text += "Нет назначенных священников или алтарников."
-        else:
-            # Здесь можно добавить логику получения последней активности
-            # Пока просто показываем список
-            if priests:
-                activity_text += "🙏 <b>Священники:</b>\n"
-                for priest in priests:
-                    username = priest.username or f"ID: {priest.telegram_id}"
-                    activity_text += f"• {username}\n"
-                activity_text += "\n"
-            
-            if altar_servers:
-                activity_text += "🕯️ <b>Алтарники:</b>\n"
-                for altar in altar_servers:
-                    username = altar.username or f"ID: {altar.telegram_id}"
-                    activity_text += f"• {username}\n"
-        
-        await message.answer(activity_text, parse_mode="HTML")
+async def show_activity(message: Message, parish_id: int):
+    """Показать активность священников/алтарников прихода."""
+    days = 7
+    async with db.get_read_session() as session:
+        activity = await ActivityService.get_reader_activity(session, parish_id, days)
+    
+    activity_text = "📈 <b>Активность священников и алтарников</b>\n\n"
+    
+    if not activity:
+        activity_text += "Нет назначенных священников или алтарников."
+    else:
+        sections = (
+            (UserRole.PRIEST, "🙏 <b>Священники:</b>\n"),
+            (UserRole.ALTAR_SERVER, "🕯️ <b>Алтарники:</b>\n"),
+        )
+        for role, title in sections:
+            readers = [row for row in activity if row[0].role == role]
+            if not readers:
+                continue
+            activity_text += title
+            for reader, reads_count, last_seen in readers:
+                username = reader.username or f"ID: {reader.telegram_id}"
+                last = to_local(last_seen).strftime("%d.%m.%Y %H:%M") if last_seen else "нет прочтений"
+                activity_text += f"• {username}: {reads_count} за {days} дн., последнее: {last}\n"
+            activity_text += "\n"
+    
+    await message.answer(activity_text, parse_mode="HTML")
 
 
 @router.message(F.text == "⚙️ Настройки")
-@check_admin_access
-async def show_settings(message: Message):
-    """Показать настройки системы."""
-    from config import Config
-    
+async def show_settings(message: Message, parish_id: int):
+    """Показать настройки прихода."""
+    settings = get_settings(parish_id)
     settings_text = (
         "⚙️ <b>Настройки системы</b>\n\n"
-        f"Минимальная сумма пожертвования: {Config.MIN_DONATION_AMOUNT:.2f} руб.\n"
-        f"Максимальное количество имен: {Config.MAX_NAMES_PER_NOTE}\n"
-        f"Описание платежа: {Config.PAYMENT_DESCRIPTION}"
+        f"Минимальная сумма пожертвования: {settings.MIN_DONATION_AMOUNT:.2f} руб.\n"
+        f"Максимальное количество имен: {settings.MAX_NAMES_PER_NOTE}\n"
+        f"Описание платежа: {escape(settings.PAYMENT_DESCRIPTION)}\n\n"
+        "Изменить: <code>/set ключ значение</code>\n"
+        "Ключи: " + ", ".join(f"<code>{key}</code>" for key in Settings.EDITABLE)
     )
     
     await message.answer(settings_text, parse_mode="HTML")
 
+
+@router.message(Command("set"))
+async def set_setting(message: Message, parish_id: int):
+    """Изменить настройку прихода: /set ключ значение."""
+    parts = message.text.split(maxsplit=2)
+    if len(parts) < 3:
+        await message.answer(
+            "❌ Формат: /set ключ значение\n"
+            f"Ключи: {', '.join(Settings.EDITABLE)}"
+        )
+        return
+    
+    key, raw = parts[1].lower(), parts[2]
+    async with db.get_session() as session:
+        try:
+            value = await SettingsService.set_value(session, key, raw, parish_id)
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return
+    
+    await message.answer(f"✅ Настройка {key} изменена: {value}")
+
+
+@router.message(Command("slot_add"))
+async def add_slot(message: Message, parish_id: int):
+    """Добавить богослужение: /slot_add ГГГГ-ММ-ДД ЧЧ:ММ Название."""
+    parts = message.text.split(maxsplit=3)
+    try:
+        starts_at = datetime.strptime(f"{parts[1]} {parts[2]}", "%Y-%m-%d %H:%M").astimezone()
+        service_type = parts[3].strip()
+    except (IndexError, ValueError):
+        await message.answer("❌ Формат: /slot_add ГГГГ-ММ-ДД ЧЧ:ММ Название службы")
+        return
+    if len(service_type) > SERVICE_TYPE_MAX_LENGTH:
+        await message.answer(f"❌ Название службы длиннее {SERVICE_TYPE_MAX_LENGTH} символов.")
+        return
+    
+    async with db.get_session() as session:
+        slot = await SlotService.add_slot(session, parish_id, starts_at, service_type)
+    
+    await message.answer(
+        f"✅ Богослужение №{slot.id} добавлено: {service_type}, {starts_at:%d.%m.%Y %H:%M}"
+    )
+
+
+@router.message(Command("slots"))
+async def show_slots(message: Message, parish_id: int):
+    """Показать ближайшие богослужения прихода."""
+    async with db.get_session() as session:
+        slots = await SlotService.get_upcoming_slots(session, parish_id)
+    
+    if not slots:
+        await message.answer(
+            "Богослужения не запланированы.\n"
+            "Добавить: /slot_add ГГГГ-ММ-ДД ЧЧ:ММ Название службы"
+        )
+        return
+    
+    slots_text = "⛪ <b>Богослужения</b>\n\n"
+    for slot, notes_count in slots:
+        slots_text += (
+            f"№{slot.id}: {to_local(slot.starts_at):%d.%m.%Y %H:%M}, "
+            f"{escape(slot.service_type)} - записок: {notes_count}\n"
+        )
+    slots_text += "\nУдалить: /slot_del номер"
+    
+    await message.answer(slots_text, parse_mode="HTML")
+
+
+@router.message(Command("slot_del"))
+async def delete_slot(message: Message, parish_id: int):
+    """Удалить богослужение: /slot_del номер."""
+    parts = message.text.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        await message.answer("❌ Формат: /slot_del номер")
+        return
+    
+    async with db.get_session() as session:
+        deleted = await SlotService.delete_slot(session, parish_id, int(parts[1]))
+    
+    if deleted:
+        await message.answer("✅ Богослужение удалено, его записки возвращены в общую очередь.")
+    else:
+        await message.answer("❌ Богослужение не найдено.")
+
+
+@router.message(Command("parishes"))
+async def show_parishes(message: Message, parish_id: int):
+    """Список приходов (для администратора прихода по умолчанию)."""
+    if parish_id != DEFAULT_PARISH_ID:
+        await message.answer("❌ Команда доступна администратору основного прихода.")
+        return
+    
+    async with db.get_session() as session:
+        parishes = await ParishService.list_parishes(session)
+    
+    bot_user = await message.bot.me()
+    parishes_text = "🏛 <b>Приходы</b>\n\n"
+    for parish in parishes:
+        parishes_text += (
+            f"№{parish.id}: {escape(parish.name)}\n"
+            f"https://t.me/{bot_user.username}?start={parish.code}\n"
+        )
+    parishes_text += "\nДобавить: /parish_add код Название"
+    
+    await message.answer(parishes_text, parse_mode="HTML", disable_web_page_preview=True)
+
+
+@router.message(Command("parish_add"))
+async def add_parish(message: Message, parish_id: int):
+    """
+    Добавить приход: /parish_add код Название. Реквизиты YooKassa
+    прихода задаются в таблице parishes (без них - общие из окружения).
+    """
+    if parish_id != DEFAULT_PARISH_ID:
+        await message.answer("❌ Команда доступна администратору основного прихода.")
+        return
+    
+    parts = message.text.split(maxsplit=2)
+    if len(parts) < 3:
+        await message.answer("❌ Формат: /parish_add код Название")
+        return
+    
+    async with db.get_session() as session:
+        try:
+            parish = await ParishService.add_parish(session, parts[1], parts[2].strip())
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return
+    
+    await message.answer(
+        f"✅ Приход №{parish.id} добавлен: {escape(parish.name)}\n"
+        f"Ссылка для прихожан: /start {parish.code}",
+        parse_mode="HTML"
+    )
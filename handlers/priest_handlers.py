@@ -1,79 +1,102 @@
 """Обработчики для священника/алтарника."""
-from aiogram import Router, F
+import logging
+from collections import Counter
+from aiogram import Bot, Router, F
 from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import db
-from models import NoteType, UserRole
+from config import Config
+from models import NoteStatus, NoteType, UserRole
 from services.user_service import UserService
-from services.note_service import NoteService
+from services.note_service import NoteService, NoteInfo
+from services.queue_service import queue_page_cache
+from services.slot_service import SlotService, slot_batch_cache, to_local
+from services.print_service import build_print_url
+from services.drain_service import drain_controller
 from keyboards import (
     get_priest_main_keyboard,
     get_priest_note_type_keyboard,
-    get_note_actions_keyboard
+    get_note_actions_keyboard,
+    get_queue_type_keyboard,
+    get_queue_page_keyboard,
+    get_slot_batch_keyboard,
+    QUEUE_CODE_TYPES
 )
-from utils import format_prayer_text
+from utils import format_prayer_text, decode_id
+from middlewares.role_middleware import RoleFilter
 
 
+logger = logging.getLogger(__name__)
+
 router = Router()
+router.message.filter(RoleFilter(UserRole.PRIEST, UserRole.ALTAR_SERVER))
+router.callback_query.filter(RoleFilter(UserRole.PRIEST, UserRole.ALTAR_SERVER))
 
 
-def check_priest_access(func):
-    """Декоратор для проверки доступа священника/алтарника."""
-    async def wrapper(message: Message, *args, **kwargs):
-        async with db.get_session() as session:
-            is_priest = await UserService.is_priest_or_altar_server(
-                session,
-                message.from_user.id
-            )
-            if not is_priest:
-                await message.answer("❌ У вас нет доступа к этой функции.")
-                return
-            return await func(message, *args, **kwargs)
-    return wrapper
+def render_prayer(note: NoteInfo) -> str:
+    """Текст молитвы с именами из записки."""
+    prayer_text = ""
+    
+    if note.names_for_health:
+        prayer_text += format_prayer_text("for_health", note.names_for_health)
+        prayer_text += "\n\n"
+    
+    if note.names_for_repose:
+        prayer_text += format_prayer_text("for_repose", note.names_for_repose)
+    
+    return prayer_text
 
 
 @router.message(Command("start"))
-async def cmd_start_priest(message: Message):
+async def cmd_start_priest(message: Message, state: FSMContext):
     """Обработчик команды /start для священника."""
-    async with db.get_session() as session:
-        is_priest = await UserService.is_priest_or_altar_server(
-            session,
-            message.from_user.id
-        )
-        if is_priest:
-            await message.answer(
-                "Добро пожаловать! Вы вошли как священник/алтарник.\n\n"
-                "Используйте кнопки меню для работы с записками.",
-                reply_markup=get_priest_main_keyboard()
-            )
+    await state.clear()
+    await message.answer(
+        "Добро пожаловать! Вы вошли как священник/алтарник.\n\n"
+        "Используйте кнопки меню для работы с записками.",
+        reply_markup=get_priest_main_keyboard()
+    )
 
 
 @router.message(F.text == "📊 Статистика очереди")
-@check_priest_access
-async def show_queue_stats(message: Message):
+async def show_queue_stats(message: Message, parish_id: int):
     """Показать статистику очереди."""
     async with db.get_session() as session:
-        total_count = await NoteService.get_queue_count(session)
-        health_count = await NoteService.get_queue_count(session, NoteType.FOR_HEALTH)
-        repose_count = await NoteService.get_queue_count(session, NoteType.FOR_REPOSE)
+        counts = await NoteService.get_queue_counts(session, parish_id)
         
         stats_text = (
             "📊 <b>Статистика очереди</b>\n\n"
-            f"Всего записок: {total_count}\n"
-            f"За здравие: {health_count}\n"
-            f"Об упокоении: {repose_count}"
+            f"Всего записок: {sum(counts.values())}\n"
+            f"За здравие: {counts[NoteType.FOR_HEALTH]}\n"
+            f"Об упокоении: {counts[NoteType.FOR_REPOSE]}"
         )
         
         await message.answer(stats_text, parse_mode="HTML")
 
 
+@router.message(F.text == "🔔 Дежурство")
+async def toggle_duty(message: Message):
+    """Включить/выключить уведомления о новых оплаченных записках."""
+    async with db.get_session() as session:
+        user = await UserService.get_user_by_telegram_id(session, message.from_user.id)
+        on_duty = not user.on_duty
+        await UserService.set_on_duty(session, user.id, on_duty)
+    
+    if on_duty:
+        await message.answer(
+            "🔔 Вы на дежурстве. Я сообщу, когда в очереди появятся новые оплаченные записки."
+        )
+    else:
+        await message.answer("🔕 Дежурство завершено, уведомления отключены.")
+
+
 @router.message(F.text == "📖 Прочитать записку")
-@check_priest_access
-async def start_read_note(message: Message):
+async def start_read_note(message: Message, parish_id: int):
     """Начать чтение записки."""
     async with db.get_session() as session:
-        total_count = await NoteService.get_queue_count(session)
+        total_count = await NoteService.get_queue_count(session, parish_id)
         
         if total_count == 0:
             await message.answer("📭 В очереди нет записок.")
@@ -86,22 +109,14 @@ async def start_read_note(message: Message):
 
 
 @router.callback_query(F.data.startswith("read_note:"))
-async def read_note(callback: CallbackQuery):
+async def read_note(callback: CallbackQuery, parish_id: int):
     """Прочитать записку."""
     async with db.get_session() as session:
-        is_priest = await UserService.is_priest_or_altar_server(
-            session,
-            callback.from_user.id
-        )
-        if not is_priest:
-            await callback.answer("❌ У вас нет доступа.", show_alert=True)
-            return
-        
         note_type_str = callback.data.split(":")[1]
         note_type = NoteType(note_type_str)
         
         # Получаем следующую записку из очереди
-        note = await NoteService.get_next_note(session, note_type)
+        note = await NoteService.get_next_note(session, parish_id, note_type)
         
         if not note:
             note_type_name = "За здравие" if note_type == NoteType.FOR_HEALTH else "Об упокоении"
@@ -110,23 +125,9 @@ async def read_note(callback: CallbackQuery):
             )
             return
         
-        # Разделяем имена по типам
-        names_for_health = [n.name for n in note.names if n.list_type == NoteType.FOR_HEALTH]
-        names_for_repose = [n.name for n in note.names if n.list_type == NoteType.FOR_REPOSE]
-        
-        # Формируем текст молитвы
-        prayer_text = ""
-        
-        if names_for_health:
-            prayer_text += format_prayer_text("for_health", names_for_health)
-            prayer_text += "\n\n"
-        
-        if names_for_repose:
-            prayer_text += format_prayer_text("for_repose", names_for_repose)
-        
         # Сохраняем ID записки для подтверждения
         await callback.message.edit_text(
-            prayer_text,
+            render_prayer(note),
             parse_mode="HTML",
             reply_markup=get_note_actions_keyboard(note.id)
         )
@@ -134,34 +135,154 @@ async def read_note(callback: CallbackQuery):
         await callback.answer()
 
 
-@router.callback_query(F.data.startswith("confirm_read:"))
-async def confirm_read_note(callback: CallbackQuery):
-    """Подтвердить прочтение записки."""
+@router.message(F.text == "📋 Очередь")
+async def start_queue_browser(message: Message):
+    """Начать просмотр очереди."""
+    await message.answer(
+        "Выберите тип записок для просмотра очереди:",
+        reply_markup=get_queue_type_keyboard()
+    )
+
+
+@router.message(F.text == "⛪ Богослужение")
+async def show_slot_batch(message: Message, parish_id: int):
+    """Показать заранее собранную пачку записок текущего богослужения."""
+    async with db.get_session() as session:
+        slot = await SlotService.get_current_slot(session, parish_id)
+        if not slot:
+            await message.answer("Сейчас нет богослужения с закрепленными записками.")
+            return
+        batch = await SlotService.get_batch(session, slot)
+    
+    if not batch.note_ids:
+        await message.answer(
+            f"📭 К богослужению {to_local(batch.starts_at):%d.%m %H:%M} записок нет."
+        )
+        return
+    
+    print_url = build_print_url(batch.slot_id) if Config.TELEGRAM_WEBHOOK_URL else None
+    for i, page in enumerate(batch.pages, 1):
+        await message.answer(
+            page,
+            parse_mode="HTML",
+            reply_markup=get_slot_batch_keyboard(batch.slot_id, print_url) if i == len(batch.pages) else None
+        )
+
+
+async def notify_batch_read(bot: Bot, telegram_ids: Counter):
+    """Одно уведомление каждому пользователю о прочтении его записок."""
+    for telegram_id, count in telegram_ids.items():
+        try:
+            await bot.send_message(
+                telegram_id,
+                f"✅ Ваши записки прочитаны на богослужении ({count} шт.)."
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось отправить уведомление о прочтении: {e}")
+
+
+@router.callback_query(F.data.startswith("sr:"))
+async def confirm_slot_read(
+    callback: CallbackQuery,
+    user_role: UserRole,
+    db_user_id: int | None,
+    parish_id: int
+):
+    """Подтвердить прочтение всей пачки богослужения."""
+    slot_id = decode_id(callback.data.split(":")[1])
+    
     async with db.get_session() as session:
-        is_priest = await UserService.is_priest_or_altar_server(
-            session,
-            callback.from_user.id
+        read = await NoteService.mark_slot_as_read(
+            session, parish_id, slot_id, user_role.value, db_user_id
         )
-        if not is_priest:
-            await callback.answer("❌ У вас нет доступа.", show_alert=True)
+        if not read:
+            await callback.answer("Пачка уже прочитана.", show_alert=True)
             return
+        users = await UserService.get_telegram_ids(session, {user_id for user_id, _ in read})
+    
+    slot_batch_cache.pop(slot_id, None)
+    telegram_ids = Counter(users[user_id] for user_id, _ in read if user_id in users)
+    # Уведомления отправляются в фоне, чтобы не задерживать ответ на апдейт
+    drain_controller.spawn(notify_batch_read(callback.bot, telegram_ids), name="notify_batch_read")
+    
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.answer(
+        f"✅ Пачка прочитана: {len(read)} записок. Пользователям отправляются уведомления."
+    )
+    await callback.answer("Пачка прочитана")
+
+
+@router.callback_query(F.data.startswith("qb:"))
+async def show_queue_page(callback: CallbackQuery, parish_id: int):
+    """Страница очереди: qb:<тип>:<id последней записки предыдущей страницы>."""
+    _, code, cursor = callback.data.split(":")
+    note_type = QUEUE_CODE_TYPES[code]
+    after_id = decode_id(cursor) if cursor else None
+    
+    key = (parish_id, note_type, after_id)
+    page = queue_page_cache.get(key)
+    if page is None:
+        async with db.get_session() as session:
+            rows, next_after = await NoteService.get_queue_page(
+                session, parish_id, note_type, after_id, Config.QUEUE_PAGE_SIZE
+            )
         
+        note_type_name = "За здравие" if note_type == NoteType.FOR_HEALTH else "Об упокоении"
+        if rows:
+            text = f"📋 Очередь '{note_type_name}'. Выберите записку:"
+        else:
+            text = f"📭 Нет записок типа '{note_type_name}' в очереди."
+        page = (text, get_queue_page_keyboard(note_type, rows, next_after, after_id is None))
+        queue_page_cache.put(key, page)
+    
+    text, keyboard = page
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("qn:"))
+async def open_queue_note(callback: CallbackQuery, parish_id: int):
+    """Открыть выбранную в очереди записку."""
+    note_id = decode_id(callback.data.split(":")[1])
+    
+    async with db.get_session() as session:
+        note = await NoteService.get_note_info(session, note_id)
+    
+    if not note or note.parish_id != parish_id or note.status != NoteStatus.PAID:
+        await callback.answer("Записка уже прочитана или недоступна.", show_alert=True)
+        return
+    
+    await callback.message.edit_text(
+        render_prayer(note),
+        parse_mode="HTML",
+        reply_markup=get_note_actions_keyboard(note.id)
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("confirm_read:"))
+async def confirm_read_note(
+    callback: CallbackQuery,
+    user_role: UserRole,
+    db_user_id: int | None,
+    parish_id: int
+):
+    """Подтвердить прочтение записки."""
+    async with db.get_session() as session:
         note_id = int(callback.data.split(":")[1])
         
-        # Получаем записку
+        # Получаем записку (только своего прихода)
         note = await NoteService.get_note_with_names(session, note_id)
-        if not note:
+        if not note or note.parish_id != parish_id:
             await callback.answer("❌ Записка не найдена.", show_alert=True)
             return
         
         user = note.user
         
-        # Получаем роль читающего
-        reader = await UserService.get_user_by_telegram_id(session, callback.from_user.id)
-        reader_role = reader.role.value if reader else "unknown"
-        
-        # Отмечаем как прочитанную
-        await NoteService.mark_note_as_read(session, note_id, reader_role)
+        # Отмечаем как прочитанную (уже прочитанную другим читающим - нет)
+        if not await NoteService.mark_note_as_read(session, note_id, user_role.value, db_user_id):
+            await callback.answer("Записка уже прочитана.", show_alert=True)
+            return
         
         # Отправляем уведомление пользователю
         from aiogram import Bot
@@ -173,17 +294,16 @@ async def confirm_read_note(callback: CallbackQuery):
                 user.telegram_id,
                 f"✅ Ваша записка прочитана на богослужении.\n\n"
                 f"Тип: {'За здравие' if note.type == NoteType.FOR_HEALTH else 'Об упокоении'}\n"
-                f"Дата прочтения: {note.read_at.strftime('%d.%m.%Y %H:%M') if note.read_at else 'Не указано'}"
+                f"Дата прочтения: {to_local(note.read_at).strftime('%d.%m.%Y %H:%M') if note.read_at else 'Не указано'}"
             )
         except Exception as e:
             # Если не удалось отправить уведомление, логируем, но продолжаем
             pass
         
-        # Удаляем записку
-        await NoteService.delete_note(session, note_id)
-        
+        # Записка остается в статусе READ, как при чтении пачки богослужения:
+        # имена удаляются при архивации
         await callback.message.edit_text(
-            "✅ Записка прочитана и удалена из системы.\n"
+            "✅ Записка прочитана.\n"
             "Пользователю отправлено уведомление."
         )
         await callback.answer("Записка прочитана")
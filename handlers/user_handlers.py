@@ -1,6 +1,6 @@
 """Обработчики для обычных пользователей."""
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -11,13 +11,25 @@ from models import NoteType, UserRole
 from services.user_service import UserService
 from services.note_service import NoteService
 from services.payment_service import PaymentService
+from services.parish_service import ParishService
+from services.subscription_service import SubscriptionService, SUBSCRIPTION_PERIODS
+from services.name_dictionary import name_dictionary
 from keyboards import (
     get_main_menu_keyboard,
     get_note_type_keyboard,
+    get_period_keyboard,
     get_cancel_keyboard
 )
-from utils import validate_names_list, validate_amount, format_note_text
+from utils import (
+    validate_amount,
+    format_note_text,
+    parse_names,
+    validate_new_names,
+    format_errors,
+    MAX_REPORTED_ERRORS
+)
 from config import Config
+from services.settings_service import get_settings
 
 
 router = Router()
@@ -28,20 +40,26 @@ class CreateNoteStates(StatesGroup):
     waiting_for_type = State()
     waiting_for_health_names = State()
     waiting_for_repose_names = State()
+    waiting_for_period = State()
     waiting_for_amount = State()
     confirming = State()
 
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext):
-    """Обработчик команды /start."""
+async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
+    """Обработчик команды /start (ссылка /start <код прихода> выбирает приход)."""
     await state.clear()
     
     async with db.get_session() as session:
+        parish = None
+        if command.args:
+            parish = await ParishService.get_by_code(session, command.args.strip())
+        
         user = await UserService.get_or_create_user(
             session,
             message.from_user.id,
-            message.from_user.username
+            message.from_user.username,
+            parish.id if parish else None
         )
         
         # Определяем клавиатуру в зависимости от роли
@@ -54,26 +72,30 @@ async def cmd_start(message: Message, state: FSMContext):
         else:
             keyboard = get_main_menu_keyboard()
         
+        greeting = "Добро пожаловать! Я помогу вам отправить записку на молитву.\n\n"
+        if parish and user.parish_id == parish.id:
+            greeting += f"Приход: {parish.name}\n\n"
+        
         await message.answer(
-            "Добро пожаловать! Я помогу вам отправить записку на молитву.\n\n"
-            "Используйте кнопки меню для навигации.",
+            greeting + "Используйте кнопки меню для навигации.",
             reply_markup=keyboard
         )
 
 
 @router.message(Command("help"))
-async def cmd_help(message: Message):
+async def cmd_help(message: Message, parish_id: int):
     """Обработчик команды /help."""
+    settings = get_settings(parish_id)
     help_text = (
         "📖 <b>Помощь</b>\n\n"
         "Для создания записки:\n"
         "1. Нажмите 'Создать записку'\n"
         "2. Выберите тип записки\n"
-        "3. Введите имена (по одному на строку)\n"
+        "3. Введите имена (по одному на строку) или отправьте .txt файл со списком\n"
         "4. Укажите сумму пожертвования\n"
         "5. Подтвердите и перейдите к оплате\n\n"
-        f"Максимальное количество имен: {Config.MAX_NAMES_PER_NOTE}\n"
-        f"Минимальная сумма: {Config.MIN_DONATION_AMOUNT:.2f} руб."
+        f"Максимальное количество имен: {settings.MAX_NAMES_PER_NOTE}\n"
+        f"Минимальная сумма: {settings.MIN_DONATION_AMOUNT:.2f} руб."
     )
     await message.answer(help_text, parse_mode="HTML")
 
@@ -113,13 +135,84 @@ async def process_note_type(callback: CallbackQuery, state: FSMContext):
     await state.set_state(CreateNoteStates.waiting_for_health_names)
 
 
+async def add_names(message: Message, state: FSMContext, key: str, text: str, parish_id: int):
+    """
+    Добавить имена из текста в список key ("health_names" или "repose_names").
+    Проверяются только новые имена, лимит считается по всей записке
+    (по настройкам прихода parish_id).
+    """
+    data = await state.get_data()
+    health_names = data.get("health_names", [])
+    repose_names = data.get("repose_names", [])
+    current = data.get(key, [])
+    
+    new_names = parse_names(text)
+    errors = validate_new_names(
+        new_names,
+        len(health_names) + len(repose_names),
+        get_settings(parish_id)
+    )
+    if errors:
+        await message.answer(format_errors(errors))
+        return
+    
+    all_names = current + new_names
+    await state.update_data(**{key: all_names})
+    
+    reply = (
+        f"✅ Добавлено имен: {len(all_names)}\n"
+        f"Отправьте 'Готово' или 'Далее' для продолжения."
+    )
+    
+    suggestions = name_dictionary.suggest_canonical(new_names)
+    if suggestions:
+        shown = list(suggestions.items())[:MAX_REPORTED_ERRORS]
+        reply += "\n\n💡 Церковное написание имен:\n" + "\n".join(
+            f"• {name} → {canonical}" for name, canonical in shown
+        )
+    
+    await message.answer(reply)
+
+
+async def read_names_document(message: Message) -> str | None:
+    """Скачать текстовый файл со списком имен. Возвращает текст или None."""
+    document = message.document
+    if document.file_size and document.file_size > Config.MAX_NAMES_FILE_SIZE:
+        await message.answer(
+            f"❌ Файл слишком большой (максимум {Config.MAX_NAMES_FILE_SIZE // 1024} КБ)."
+        )
+        return None
+    
+    is_text = (document.mime_type or "").startswith("text/") or (
+        (document.file_name or "").lower().endswith(".txt")
+    )
+    if not is_text:
+        await message.answer("❌ Поддерживаются только текстовые файлы (.txt).")
+        return None
+    
+    content = (await message.bot.download(document)).getvalue()
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    
+    await message.answer("❌ Не удалось прочитать файл. Сохраните его в кодировке UTF-8.")
+    return None
+
+
+@router.message(StateFilter(CreateNoteStates.waiting_for_health_names), F.document)
+async def process_health_names_document(message: Message, state: FSMContext, parish_id: int):
+    """Обработка файла с именами для молитвы за здравие."""
+    text = await read_names_document(message)
+    if text is not None:
+        await add_names(message, state, "health_names", text, parish_id)
+
+
 @router.message(StateFilter(CreateNoteStates.waiting_for_health_names))
-async def process_health_names(message: Message, state: FSMContext):
+async def process_health_names(message: Message, state: FSMContext, parish_id: int):
     """Обработка имен для молитвы за здравие."""
     if message.text.lower() in ("готово", "далее", "пропустить"):
-        data = await state.get_data()
-        health_names = data.get("health_names", [])
-        
         await message.answer(
             "Введите имена для молитвы <b>Об упокоении</b>.\n"
             "По одному имени на строку.\n"
@@ -130,28 +223,19 @@ async def process_health_names(message: Message, state: FSMContext):
         await state.set_state(CreateNoteStates.waiting_for_repose_names)
         return
     
-    data = await state.get_data()
-    health_names = data.get("health_names", [])
-    
-    # Парсинг имен из сообщения
-    new_names = [name.strip() for name in message.text.split("\n") if name.strip()]
-    
-    all_names = health_names + new_names
-    
-    is_valid, error = validate_names_list(all_names)
-    if not is_valid:
-        await message.answer(f"❌ {error}")
-        return
-    
-    await state.update_data(health_names=all_names)
-    await message.answer(
-        f"✅ Добавлено имен: {len(all_names)}\n"
-        f"Отправьте 'Готово' или 'Далее' для продолжения."
-    )
+    await add_names(message, state, "health_names", message.text, parish_id)
+
+
+@router.message(StateFilter(CreateNoteStates.waiting_for_repose_names), F.document)
+async def process_repose_names_document(message: Message, state: FSMContext, parish_id: int):
+    """Обработка файла с именами для молитвы об упокоении."""
+    text = await read_names_document(message)
+    if text is not None:
+        await add_names(message, state, "repose_names", text, parish_id)
 
 
 @router.message(StateFilter(CreateNoteStates.waiting_for_repose_names))
-async def process_repose_names(message: Message, state: FSMContext):
+async def process_repose_names(message: Message, state: FSMContext, parish_id: int):
     """Обработка имен для молитвы об упокоении."""
     if message.text.lower() in ("готово", "далее", "пропустить"):
         data = await state.get_data()
@@ -163,42 +247,37 @@ async def process_repose_names(message: Message, state: FSMContext):
             return
         
         await message.answer(
-            f"Введите сумму пожертвования (минимум {Config.MIN_DONATION_AMOUNT:.2f} руб.):",
-            reply_markup=get_cancel_keyboard()
-        )
-        await state.set_state(CreateNoteStates.waiting_for_amount)
-        return
-    
-    data = await state.get_data()
-    repose_names = data.get("repose_names", [])
-    health_names = data.get("health_names", [])
-    
-    # Парсинг имен из сообщения
-    new_names = [name.strip() for name in message.text.split("\n") if name.strip()]
-    
-    all_names = repose_names + new_names
-    total_names = len(health_names) + len(all_names)
-    
-    if total_names > Config.MAX_NAMES_PER_NOTE:
-        await message.answer(
-            f"❌ Превышено максимальное количество имен: {Config.MAX_NAMES_PER_NOTE}"
+            "Как долго поминать?\n"
+            "При поминовении на период записка читается каждый день, "
+            "оплата - один раз.",
+            reply_markup=get_period_keyboard()
         )
+        await state.set_state(CreateNoteStates.waiting_for_period)
         return
     
-    is_valid, error = validate_names_list(all_names)
-    if not is_valid:
-        await message.answer(f"❌ {error}")
+    await add_names(message, state, "repose_names", message.text, parish_id)
+
+
+@router.callback_query(F.data.startswith("period:"), StateFilter(CreateNoteStates.waiting_for_period))
+async def process_period(callback: CallbackQuery, state: FSMContext, parish_id: int):
+    """Обработка выбора периода поминовения."""
+    days = int(callback.data.split(":")[1])
+    if days != 1 and days not in SUBSCRIPTION_PERIODS:
+        await callback.answer("❌ Неизвестный период.", show_alert=True)
         return
     
-    await state.update_data(repose_names=all_names)
-    await message.answer(
-        f"✅ Добавлено имен: {len(all_names)}\n"
-        f"Отправьте 'Готово' или 'Далее' для продолжения."
+    await state.update_data(days=days)
+    await callback.message.edit_text(SUBSCRIPTION_PERIODS.get(days, "Однократно"))
+    await callback.message.answer(
+        f"Введите сумму пожертвования (минимум {get_settings(parish_id).MIN_DONATION_AMOUNT:.2f} руб.):",
+        reply_markup=get_cancel_keyboard()
     )
+    await state.set_state(CreateNoteStates.waiting_for_amount)
+    await callback.answer()
 
 
 @router.message(StateFilter(CreateNoteStates.waiting_for_amount))
-async def process_amount(message: Message, state: FSMContext):
+async def process_amount(message: Message, state: FSMContext, parish_id: int):
     """Обработка суммы пожертвования."""
     try:
         amount = float(message.text.replace(",", "."))
@@ -206,7 +285,7 @@ async def process_amount(message: Message, state: FSMContext):
         await message.answer("❌ Пожалуйста, введите корректное число.")
         return
     
-    is_valid, error = validate_amount(amount)
+    is_valid, error = validate_amount(amount, get_settings(parish_id))
     if not is_valid:
         await message.answer(f"❌ {error}")
         return
@@ -226,6 +305,9 @@ async def process_amount(message: Message, state: FSMContext):
         note_type = "for_repose"
     
     note_text = format_note_text(note_type, health_names, repose_names)
+    days = data.get("days", 1)
+    if days in SUBSCRIPTION_PERIODS:
+        note_text += f"\n📅 Поминовение: {SUBSCRIPTION_PERIODS[days]}"
     note_text += f"\n💰 Сумма пожертвования: {amount:.2f} руб."
     
     await state.update_data(amount=amount, note_type=note_type)
@@ -249,6 +331,7 @@ async def confirm_note(message: Message, state: FSMContext):
     repose_names = data.get("repose_names", [])
     amount = data.get("amount")
     note_type_str = data.get("note_type")
+    days = data.get("days", 1)
     
     async with db.get_session() as session:
         user = await UserService.get_user_by_telegram_id(session, message.from_user.id)
@@ -259,30 +342,53 @@ async def confirm_note(message: Message, state: FSMContext):
         
         note_type = NoteType(note_type_str)
         
-        # Создаем записку
-        note = await NoteService.create_note(
-            session,
-            user.id,
-            note_type,
-            health_names,
-            repose_names,
-            amount
-        )
+        if days in SUBSCRIPTION_PERIODS:
+            # Поминовение на период: записки создаются ежедневно после оплаты
+            subscription = await SubscriptionService.create_subscription(
+                session,
+                user.id,
+                note_type,
+                health_names,
+                repose_names,
+                amount,
+                days,
+                user.parish_id
+            )
+        else:
+            # Создаем записку
+            note = await NoteService.create_note(
+                session,
+                user.id,
+                note_type,
+                health_names,
+                repose_names,
+                amount,
+                user.parish_id
+            )
         
-        # Создаем платеж
-        payment_service = PaymentService()
+        # Создаем платеж на реквизиты прихода
+        payment_service = PaymentService(await ParishService.get(session, user.parish_id))
         return_url = f"{Config.TELEGRAM_WEBHOOK_URL}/payment-success"
         
         try:
-            payment = payment_service.create_payment(
-                amount,
-                note.id,
-                user.id,
-                return_url
-            )
-            
-            # Сохраняем ID платежа
-            await NoteService.update_note_payment(session, note.id, payment.id)
+            if days in SUBSCRIPTION_PERIODS:
+                payment = payment_service.create_subscription_payment(
+                    amount,
+                    subscription.id,
+                    user.id,
+                    return_url
+                )
+                await SubscriptionService.set_payment_id(session, subscription.id, payment.id)
+            else:
+                payment = payment_service.create_payment(
+                    amount,
+                    note.id,
+                    user.id,
+                    return_url
+                )
+                
+                # Сохраняем ID платежа; в очередь записка попадет после webhook об оплате
+                await NoteService.set_payment_id(session, note.id, payment.id)
             
             # Отправляем ссылку на оплату
             if payment.confirmation and payment.confirmation.confirmation_url:
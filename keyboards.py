@@ -1,108 +1,255 @@
 """Клавиатуры для Telegram бота."""
+from datetime import datetime
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from aiohttp import FormData
 from models import NoteType
+from utils import encode_id
 
 
-def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
-    """Главное меню для обычных пользователей."""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📝 Создать записку")],
-            [KeyboardButton(text="ℹ️ Помощь")]
+# Статические клавиатуры собираются один раз при импорте модуля.
+# Объекты aiogram неизменяемые (frozen), поэтому их можно безопасно
+# переиспользовать во всех ответах.
+
+MAIN_MENU_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="📝 Создать записку")],
+        [KeyboardButton(text="ℹ️ Помощь")]
+    ],
+    resize_keyboard=True
+)
+
+NOTE_TYPE_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="За здравие",
+                callback_data="note_type:for_health"
+            ),
+            InlineKeyboardButton(
+                text="Об упокоении",
+                callback_data="note_type:for_repose"
+            )
+        ],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")]
+    ]
+)
+
+PERIOD_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="Однократно", callback_data="period:1")],
+        [InlineKeyboardButton(text="Сорокоуст (40 дней)", callback_data="period:40")],
+        [InlineKeyboardButton(text="На год", callback_data="period:365")]
+    ]
+)
+
+PRIEST_MAIN_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="📊 Статистика очереди")],
+        [KeyboardButton(text="📖 Прочитать записку"), KeyboardButton(text="📋 Очередь")],
+        [KeyboardButton(text="⛪ Богослужение")],
+        [KeyboardButton(text="🔔 Дежурство"), KeyboardButton(text="ℹ️ Помощь")]
+    ],
+    resize_keyboard=True
+)
+
+PRIEST_NOTE_TYPE_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="За здравие",
+                callback_data="read_note:for_health"
+            ),
+            InlineKeyboardButton(
+                text="Об упокоении",
+                callback_data="read_note:for_repose"
+            )
+        ],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_menu")]
+    ]
+)
+
+# Короткие коды типа записки в callback_data просмотра очереди
+QUEUE_TYPE_CODES = {NoteType.FOR_HEALTH: "h", NoteType.FOR_REPOSE: "r"}
+QUEUE_CODE_TYPES = {code: note_type for note_type, code in QUEUE_TYPE_CODES.items()}
+
+QUEUE_TYPE_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text="За здравие", callback_data="qb:h:"),
+            InlineKeyboardButton(text="Об упокоении", callback_data="qb:r:")
         ],
-        resize_keyboard=True
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_menu")]
+    ]
+)
+
+ADMIN_MAIN_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="📊 Статистика"), KeyboardButton(text="📅 Отчет")],
+        [KeyboardButton(text="👥 Управление ролями")],
+        [KeyboardButton(text="📈 Активность")],
+        [KeyboardButton(text="⚙️ Настройки")]
+    ],
+    resize_keyboard=True
+)
+
+CANCEL_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="❌ Отмена")]],
+    resize_keyboard=True
+)
+
+# Шаблон клавиатуры действий с запиской: для каждой записки копируется
+# заранее собранный шаблон с подменой callback_data (без валидации pydantic)
+_CONFIRM_READ_TEMPLATE = InlineKeyboardButton(
+    text="✅ Подтвердить прочтение",
+    callback_data="confirm_read:0"
+)
+_NOTE_ACTIONS_TEMPLATE = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [_CONFIRM_READ_TEMPLATE],
+        [InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_menu")]
+    ]
+)
+
+# Заранее сериализованный JSON статических клавиатур (по id объекта)
+_SERIALIZED = {
+    id(markup): markup.model_dump_json(exclude_none=True)
+    for markup in (
+        MAIN_MENU_KEYBOARD,
+        NOTE_TYPE_KEYBOARD,
+        PERIOD_KEYBOARD,
+        PRIEST_MAIN_KEYBOARD,
+        PRIEST_NOTE_TYPE_KEYBOARD,
+        QUEUE_TYPE_KEYBOARD,
+        ADMIN_MAIN_KEYBOARD,
+        CANCEL_KEYBOARD,
     )
-    return keyboard
+}
+
+
+def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
+    """Главное меню для обычных пользователей."""
+    return MAIN_MENU_KEYBOARD
 
 
 def get_note_type_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора типа записки."""
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="За здравие",
-                    callback_data="note_type:for_health"
-                ),
-                InlineKeyboardButton(
-                    text="Об упокоении",
-                    callback_data="note_type:for_repose"
-                )
-            ],
-            [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")]
-        ]
-    )
-    return keyboard
+    return NOTE_TYPE_KEYBOARD
+
+
+def get_period_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура выбора периода поминовения."""
+    return PERIOD_KEYBOARD
 
 
 def get_priest_main_keyboard() -> ReplyKeyboardMarkup:
     """Главное меню для священника/алтарника."""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📊 Статистика очереди")],
-            [KeyboardButton(text="📖 Прочитать записку")],
-            [KeyboardButton(text="ℹ️ Помощь")]
-        ],
-        resize_keyboard=True
-    )
-    return keyboard
+    return PRIEST_MAIN_KEYBOARD
 
 
 def get_priest_note_type_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора типа записки для прочтения."""
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="За здравие",
-                    callback_data="read_note:for_health"
-                ),
-                InlineKeyboardButton(
-                    text="Об упокоении",
-                    callback_data="read_note:for_repose"
-                )
-            ],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_menu")]
-        ]
-    )
-    return keyboard
+    return PRIEST_NOTE_TYPE_KEYBOARD
+
+
+def get_queue_type_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура выбора типа записок для просмотра очереди."""
+    return QUEUE_TYPE_KEYBOARD
+
+
+def get_queue_page_keyboard(
+    note_type: NoteType,
+    rows: list[tuple[int, datetime, int]],
+    next_after: int | None,
+    is_first: bool
+) -> InlineKeyboardMarkup:
+    """
+    Страница очереди: кнопка на каждую записку (qn:<id>) и навигация
+    (qb:<тип>:<курсор>). id передаются в base36.
+    """
+    code = QUEUE_TYPE_CODES[note_type]
+    keyboard = [
+        [InlineKeyboardButton(
+            text=f"№{note_id} · {created_at:%d.%m %H:%M} · имен: {names_count}",
+            callback_data=f"qn:{encode_id(note_id)}"
+        )]
+        for note_id, created_at, names_count in rows
+    ]
+    
+    navigation = []
+    if not is_first:
+        navigation.append(InlineKeyboardButton(text="⏮ В начало", callback_data=f"qb:{code}:"))
+    if next_after is not None:
+        navigation.append(InlineKeyboardButton(
+            text="Далее ▶️",
+            callback_data=f"qb:{code}:{encode_id(next_after)}"
+        ))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_menu")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_slot_batch_keyboard(slot_id: int, print_url: str | None) -> InlineKeyboardMarkup:
+    """Действия с пачкой богослужения: печать и подтверждение прочтения всей пачки."""
+    keyboard = []
+    if print_url:
+        keyboard.append([InlineKeyboardButton(text="🖨 Версия для печати", url=print_url)])
+    keyboard.append([InlineKeyboardButton(
+        text="✅ Прочитано все",
+        callback_data=f"sr:{encode_id(slot_id)}"
+    )])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def get_note_actions_keyboard(note_id: int) -> InlineKeyboardMarkup:
     """Клавиатура действий с запиской."""
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="✅ Подтвердить прочтение",
-                    callback_data=f"confirm_read:{note_id}"
-                )
-            ],
-            [InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_menu")]
-        ]
+    confirm = _CONFIRM_READ_TEMPLATE.model_copy(
+        update={"callback_data": f"confirm_read:{note_id}"}
+    )
+    return _NOTE_ACTIONS_TEMPLATE.model_copy(
+        update={"inline_keyboard": [[confirm], _NOTE_ACTIONS_TEMPLATE.inline_keyboard[1]]}
     )
-    return keyboard
 
 
 def get_admin_main_keyboard() -> ReplyKeyboardMarkup:
     """Главное меню для администратора."""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📊 Статистика")],
-            [KeyboardButton(text="👥 Управление ролями")],
-            [KeyboardButton(text="📈 Активность")],
-            [KeyboardButton(text="⚙️ Настройки")]
-        ],
-        resize_keyboard=True
-    )
-    return keyboard
+    return ADMIN_MAIN_KEYBOARD
 
 
 def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура с кнопкой отмены."""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text="❌ Отмена")]],
-        resize_keyboard=True
-    )
-    return keyboard
+    return CANCEL_KEYBOARD
+
 
+class KeyboardCacheSession(AiohttpSession):
+    """
+    HTTP-сессия бота, которая подставляет заранее сериализованный JSON
+    статических клавиатур вместо сериализации pydantic на каждый ответ.
+    """
+    
+    def build_form_data(self, bot: Bot, method: TelegramMethod) -> FormData:
+        """Сборка тела запроса к Bot API."""
+        markup = getattr(method, "reply_markup", None)
+        serialized = _SERIALIZED.get(id(markup)) if markup is not None else None
+        if serialized is None:
+            return super().build_form_data(bot, method)
+        
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", serialized)
+        for key, value in files.items():
+            form.add_field(
+                key,
+                value.read(bot),
+                filename=value.filename or key,
+            )
+        return form
@@ -1,6 +1,14 @@
 """Главный файл приложения."""
+import time
+
+# Отсчет времени запуска начинается до импорта aiogram, SQLAlchemy и сервисов
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
+import hmac
 import logging
+import signal
+from datetime import timedelta
 from aiohttp import web
 from aiogram import Bot, Dispatcher, F
 from aiogram.filters import Command
@@ -8,9 +16,25 @@ from aiogram.types import Update
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from config import Config
 from database import db
+from keyboards import KeyboardCacheSession
+from middlewares.role_middleware import RoleMiddleware
+from middlewares.throttling_middleware import ThrottlingMiddleware
 from handlers import user_handlers, priest_handlers, admin_handlers
-from services.payment_service import PaymentService
+from services.payment_service import PaymentService, yookassa_client
 from services.note_service import NoteService
+from services.scheduler_service import scheduler
+from services.cleanup_service import CleanupService
+from services.archive_service import ArchiveService
+from services.reconciliation_service import ReconciliationService
+from services.subscription_service import SubscriptionService
+from services.slot_service import SlotService, to_local
+from services.print_service import PrintService, verify_print_signature
+from services.export_service import ExportService, EXPORT_FORMATS, parse_date_range
+from services.settings_service import SettingsService
+from services.parish_service import ParishService
+from services.duty_service import DutyNotifier
+from services.health_service import HealthService, LoopLagMonitor
+from services.drain_service import drain_controller
 
 
 # Настройка логирования
@@ -20,14 +44,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Длительность этапов запуска (секунды) для итоговой строки в логе
+startup_timings: dict[str, float] = {"импорт": time.perf_counter() - _IMPORT_STARTED}
+
 
-async def on_startup(bot: Bot):
+async def on_startup(bot: Bot, duty_notifier: DutyNotifier, loop_monitor: LoopLagMonitor):
     """Действия при запуске бота."""
     logger.info("Бот запускается...")
+    loop_monitor.start()
+    phase_started = time.perf_counter()
     
-    # Инициализация БД
+    def mark(phase: str):
+        nonlocal phase_started
+        now = time.perf_counter()
+        startup_timings[phase] = now - phase_started
+        phase_started = now
+    
+    # Проверка версии схемы БД (миграции - только если она отстает)
     await db.init_db()
     logger.info("База данных инициализирована")
+    mark("схема БД")
+    
+    # Приход по умолчанию и настройки из таблицы settings поверх значений из окружения
+    async with db.get_session() as session:
+        await ParishService.ensure_default(session)
+        await SettingsService.load(session)
+    mark("настройки")
     
     # Настройка webhook
     if Config.TELEGRAM_WEBHOOK_URL:
@@ -36,11 +78,101 @@ async def on_startup(bot: Bot):
         logger.info(f"Webhook установлен: {webhook_url}")
     else:
         logger.warning("TELEGRAM_WEBHOOK_URL не установлен, webhook не настроен")
+    mark("webhook")
+    
+    # Фоновые задачи
+    scheduler.add_job(
+        "refresh_settings",
+        SettingsService.refresh_if_changed,
+        interval=Config.SETTINGS_REFRESH_SECONDS,
+        first_delay=Config.SETTINGS_REFRESH_SECONDS
+    )
+    scheduler.add_job(
+        "expire_pending_notes",
+        CleanupService.expire_pending_notes,
+        interval=Config.CLEANUP_INTERVAL_MINUTES * 60,
+        first_delay=60
+    )
+    scheduler.add_job(
+        "expire_pending_subscriptions",
+        CleanupService.expire_pending_subscriptions,
+        interval=Config.CLEANUP_INTERVAL_MINUTES * 60,
+        first_delay=90
+    )
+    scheduler.add_job(
+        "reconcile_pending_payments",
+        ReconciliationService.reconcile_pending_payments,
+        interval=Config.RECONCILE_INTERVAL_MINUTES * 60,
+        first_delay=30
+    )
+    scheduler.add_job(
+        "reconcile_pending_subscriptions",
+        ReconciliationService.reconcile_pending_subscriptions,
+        interval=Config.RECONCILE_INTERVAL_MINUTES * 60,
+        first_delay=45
+    )
+    scheduler.add_job(
+        "materialize_subscriptions",
+        SubscriptionService.materialize_day,
+        interval=Config.SUBSCRIPTION_INTERVAL_MINUTES * 60,
+        first_delay=15
+    )
+    scheduler.add_job(
+        "prebuild_slot_batches",
+        SlotService.prebuild_batches,
+        interval=Config.SLOT_PREBUILD_INTERVAL_MINUTES * 60,
+        first_delay=20
+    )
+    scheduler.add_job(
+        "archive_notes",
+        ArchiveService.archive_notes,
+        interval=Config.ARCHIVE_INTERVAL_HOURS * 3600,
+        first_delay=300
+    )
+    scheduler.add_job(
+        "purge_subscription_names",
+        ArchiveService.purge_subscription_names,
+        interval=Config.ARCHIVE_INTERVAL_HOURS * 3600,
+        first_delay=330
+    )
+    scheduler.start()
+    duty_notifier.start()
+    mark("фоновые задачи")
+    
+    breakdown = ", ".join(f"{phase} {seconds * 1000:.0f} мс" for phase, seconds in startup_timings.items())
+    logger.info(f"Запуск за {sum(startup_timings.values()):.2f} с: {breakdown}")
 
 
-async def on_shutdown(bot: Bot):
-    """Действия при остановке бота."""
+async def on_drain(duty_notifier: DutyNotifier):
+    """
+    Первый этап остановки: новые апдейты и webhook получают 503, текущие
+    обработчики, фоновые задачи и уведомления дежурным получают общий срок
+    SHUTDOWN_DRAIN_SECONDS. Соединения закрываются только после этого.
+    """
     logger.info("Бот останавливается...")
+    drain_controller.begin()
+    
+    # Обработчики дожидаются вместе с выполняющимися фоновыми задачами
+    _, (jobs_finished, jobs_abandoned) = await asyncio.gather(
+        drain_controller.wait(),
+        scheduler.stop(drain_controller.remaining())
+    )
+    # Накопленные уведомления дежурным - после обработчиков, которые их добавляют
+    drain_controller.spawn(duty_notifier.close(), name="duty_notify_flush")
+    drained, abandoned = await drain_controller.wait()
+    
+    drained += jobs_finished
+    abandoned += jobs_abandoned
+    if abandoned:
+        logger.warning(f"Остановка: дождались задач: {drained}, брошено: {abandoned}")
+    else:
+        logger.info(f"Остановка: дождались задач: {drained}, брошено: 0")
+
+
+async def on_shutdown(bot: Bot, loop_monitor: LoopLagMonitor):
+    """Закрытие ресурсов после этапа ожидания."""
+    await loop_monitor.stop()
+    await yookassa_client.close()
     await bot.session.close()
     await db.close()
 
@@ -60,6 +192,7 @@ async def yookassa_webhook_handler(request: web.Request):
         payment_id = result["payment_id"]
         status = result["status"]
         note_id = result.get("note_id")
+        subscription_id = result.get("subscription_id")
         
         # Если платеж успешен, обновляем статус записки
         if status == "succeeded" and note_id:
@@ -69,6 +202,13 @@ async def yookassa_webhook_handler(request: web.Request):
                     await NoteService.update_note_payment(session, note.id, payment_id)
                     logger.info(f"Записка {note_id} помечена как оплаченная")
         
+        # Оплата поминовения на период: записки создаются ежедневно
+        if status == "succeeded" and subscription_id:
+            async with db.get_session() as session:
+                subscription = await SubscriptionService.get_by_payment_id(session, payment_id)
+                if subscription and await SubscriptionService.activate(session, subscription.id, payment_id):
+                    logger.info(f"Поминовение {subscription_id} активировано")
+        
         return web.Response(status=200, text="OK")
     
     except Exception as e:
@@ -76,8 +216,97 @@ async def yookassa_webhook_handler(request: web.Request):
         return web.Response(status=500, text="Internal server error")
 
 
+async def healthz_handler(request: web.Request):
+    """Живость процесса: отвечает, пока работает event loop (без обращения к БД)."""
+    return web.json_response({
+        "status": "ok",
+        "loop": request.app["loop_monitor"].stats(),
+    })
+
+
+async def readyz_handler(request: web.Request):
+    """Готовность: БД доступна и фоновые задачи работают, иначе 503."""
+    ready, details = await HealthService.readiness()
+    details["status"] = "ok" if ready else "unavailable"
+    details["loop"] = request.app["loop_monitor"].stats()
+    return web.json_response(details, status=200 if ready else 503)
+
+
+async def export_handler(request: web.Request):
+    """
+    Потоковая выгрузка записок и платежей (gzip).
+    GET /admin/export?from=YYYY-MM-DD&to=YYYY-MM-DD&format=csv|jsonl[&parish=<код>]
+    Без parish выгружаются все приходы. Авторизация: заголовок "Authorization: Bearer <EXPORT_TOKEN>".
+    """
+    if not Config.EXPORT_TOKEN:
+        raise web.HTTPNotFound()
+    
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token, Config.EXPORT_TOKEN):
+        raise web.HTTPUnauthorized()
+    
+    fmt = request.query.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise web.HTTPBadRequest(text="Unsupported format")
+    
+    try:
+        start, end = parse_date_range(request.query.get("from"), request.query.get("to"))
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    
+    parish_id = None
+    if request.query.get("parish"):
+        async with db.get_session() as session:
+            parish = await ParishService.get_by_code(session, request.query["parish"])
+        if not parish:
+            raise web.HTTPNotFound(text="Unknown parish")
+        parish_id = parish.id
+    
+    first_day = to_local(start).date()
+    last_day = to_local(end).date() - timedelta(days=1)
+    filename = f"notes_{first_day}_{last_day}.{fmt}.gz"
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "application/gzip",
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+    )
+    await response.prepare(request)
+    
+    async for chunk in ExportService.iter_export(start, end, fmt, parish_id):
+        await response.write(chunk)
+    
+    await response.write_eof()
+    return response
+
+
+async def print_slot_handler(request: web.Request):
+    """
+    Версия пачки богослужения для печати (HTML, потоково).
+    GET /print/slot/<id>?exp=<unix time>&sig=<HMAC>
+    """
+    slot_id = int(request.match_info["slot_id"])
+    if not verify_print_signature(slot_id, request.query.get("exp", ""), request.query.get("sig", "")):
+        raise web.HTTPForbidden()
+    
+    async with db.get_session() as session:
+        slot = await SlotService.get_slot(session, slot_id)
+    if not slot:
+        raise web.HTTPNotFound()
+    
+    response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+    await response.prepare(request)
+    async for chunk in PrintService.iter_slot_html(slot):
+        await response.write(chunk)
+    
+    await response.write_eof()
+    return response
+
+
 def create_app() -> web.Application:
     """Создание приложения aiohttp."""
+    created_started = time.perf_counter()
+    
     # Валидация конфигурации
     try:
         Config.validate()
@@ -86,16 +315,34 @@ def create_app() -> web.Application:
         raise
     
     # Инициализация бота и диспетчера
-    bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+    bot = Bot(token=Config.TELEGRAM_BOT_TOKEN, session=KeyboardCacheSession())
     dp = Dispatcher()
     
-    # Регистрация роутеров
-    dp.include_router(user_handlers.router)
-    dp.include_router(priest_handlers.router)
+    # Anti-flood регистрируется первым: лишние апдейты отбрасываются
+    # до определения роли и любых запросов к БД
+    throttling = ThrottlingMiddleware()
+    dp.update.outer_middleware(throttling)
+    
+    # Роль пользователя определяется один раз на апдейт; роутеры
+    # администратора и священника отсекаются фильтром по роли, поэтому
+    # обычные пользователи проходят сразу в пользовательский роутер
+    dp.update.outer_middleware(RoleMiddleware())
+    
+    # Регистрация роутеров (от более привилегированных ролей к общим)
     dp.include_router(admin_handlers.router)
+    dp.include_router(priest_handlers.router)
+    dp.include_router(user_handlers.router)
     
     # Создание приложения aiohttp
-    app = web.Application()
+    app = web.Application(middlewares=[drain_controller.middleware])
+    app["throttling"] = throttling
+    loop_monitor = LoopLagMonitor()
+    app["loop_monitor"] = loop_monitor
+    
+    # Ожидание текущей работы регистрируется первым: обработчик webhook
+    # закрывает сессию бота в своем on_shutdown
+    duty_notifier = DutyNotifier(bot)
+    app.on_shutdown.append(lambda app: on_drain(duty_notifier))
     
     # Настройка webhook для Telegram
     if Config.TELEGRAM_WEBHOOK_URL:
@@ -108,13 +355,24 @@ def create_app() -> web.Application:
     # Обработчик webhook от Яндекс.Кассы
     app.router.add_post("/yookassa-webhook", yookassa_webhook_handler)
     
+    # Проверки для оркестратора и балансировщика
+    app.router.add_get("/healthz", healthz_handler)
+    app.router.add_get("/readyz", readyz_handler)
+    
+    # Выгрузка для бухгалтерии
+    app.router.add_get("/admin/export", export_handler)
+    
+    # Версия пачки богослужения для печати
+    app.router.add_get(r"/print/slot/{slot_id:\d+}", print_slot_handler)
+    
     # Настройка приложения
     setup_application(app, dp, bot=bot)
     
     # Обработчики запуска и остановки
-    app.on_startup.append(lambda app: on_startup(bot))
-    app.on_shutdown.append(lambda app: on_shutdown(bot))
+    app.on_startup.append(lambda app: on_startup(bot, duty_notifier, loop_monitor))
+    app.on_shutdown.append(lambda app: on_shutdown(bot, loop_monitor))
     
+    startup_timings["приложение"] = time.perf_counter() - created_started
     return app
 
 
@@ -131,10 +389,17 @@ async def main():
     
     logger.info(f"Сервер запущен на {Config.HOST}:{Config.PORT}")
     
-    # Ожидание бесконечно
+    # Ожидание сигнала остановки (SIGTERM при перевыкатке)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    
     try:
-        await asyncio.Event().wait()
-    except KeyboardInterrupt:
+        await stop_event.wait()
         logger.info("Получен сигнал остановки")
     finally:
         await runner.cleanup()
@@ -0,0 +1 @@
+"""Middleware и фильтры диспетчера."""
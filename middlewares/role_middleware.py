@@ -0,0 +1,53 @@
+"""Определение роли пользователя и маршрутизация по ролям."""
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject, User as TelegramUser
+from database import db
+from models import UserRole, DEFAULT_PARISH_ID
+from services.user_service import UserService
+
+
+class RoleMiddleware(BaseMiddleware):
+    """
+    Определяет роль пользователя один раз на апдейт и кладет ее
+    в данные обработчика как user_role (ID в БД - как db_user_id,
+    приход пользователя - как parish_id).
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Обработка апдейта."""
+        role = UserRole.USER
+        user_id = None
+        parish_id = DEFAULT_PARISH_ID
+        from_user: TelegramUser | None = data.get("event_from_user")
+        
+        if from_user is not None:
+            async with db.get_session() as session:
+                user = await UserService.get_user_by_telegram_id(session, from_user.id)
+            if user:
+                role = user.role
+                user_id = user.id
+                parish_id = user.parish_id
+        
+        data["user_role"] = role
+        data["db_user_id"] = user_id
+        data["parish_id"] = parish_id
+        return await handler(event, data)
+
+
+class RoleFilter(BaseFilter):
+    """Фильтр роутера по роли, определенной RoleMiddleware (без запросов к БД)."""
+    
+    def __init__(self, *roles: UserRole):
+        """Инициализация фильтра."""
+        self.roles = frozenset(roles)
+    
+    async def __call__(self, event: TelegramObject, user_role: UserRole = UserRole.USER) -> bool:
+        """Проверка роли."""
+        return user_role in self.roles
@@ -0,0 +1,98 @@
+"""Ограничение частоты апдейтов от одного чата (token bucket)."""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject, Update, User as TelegramUser
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-chat token bucket. Апдейты сверх лимита отбрасываются до того,
+    как дойдут до обработчиков и базы данных.
+    """
+    
+    def __init__(
+        self,
+        rate: float = Config.THROTTLE_RATE,
+        burst: int = Config.THROTTLE_BURST,
+        eviction_interval: float = 60.0
+    ):
+        """
+        Инициализация.
+        rate - пополнение токенов в секунду, burst - емкость корзины.
+        """
+        self.rate = rate
+        self.burst = float(burst)
+        self.eviction_interval = eviction_interval
+        
+        # chat_id -> (токены, время последнего обновления)
+        self._buckets: dict[int, tuple[float, float]] = {}
+        self._last_eviction = time.monotonic()
+        
+        self.passed = 0
+        self.throttled = 0
+        self.evicted = 0
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Обработка апдейта."""
+        chat: Chat | None = data.get("event_chat")
+        user: TelegramUser | None = data.get("event_from_user")
+        key = chat.id if chat else (user.id if user else None)
+        if key is None:
+            return await handler(event, data)
+        
+        now = time.monotonic()
+        if now - self._last_eviction >= self.eviction_interval:
+            self._evict(now)
+        
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            self.throttled += 1
+            await self._notify(event)
+            return None
+        
+        self._buckets[key] = (tokens - 1.0, now)
+        self.passed += 1
+        return await handler(event, data)
+    
+    async def _notify(self, event: TelegramObject):
+        """Снять "часики" с inline-кнопки; сообщения отбрасываются молча."""
+        if isinstance(event, Update) and event.callback_query:
+            try:
+                await event.callback_query.answer("⏳ Слишком часто, подождите немного.")
+            except Exception as e:
+                logger.debug(f"Не удалось ответить на callback: {e}")
+    
+    def _evict(self, now: float):
+        """Удалить корзины, которые уже полностью восполнились."""
+        full = [
+            key for key, (tokens, updated_at) in self._buckets.items()
+            if tokens + (now - updated_at) * self.rate >= self.burst
+        ]
+        for key in full:
+            del self._buckets[key]
+        
+        self.evicted += len(full)
+        self._last_eviction = now
+    
+    def stats(self) -> dict:
+        """Счетчики middleware."""
+        return {
+            "passed": self.passed,
+            "throttled": self.throttled,
+            "evicted": self.evicted,
+            "tracked_chats": len(self._buckets),
+        }
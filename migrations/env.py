@@ -0,0 +1,68 @@
+"""Окружение Alembic: миграции из CLI и при запуске приложения."""
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy.engine import Connection
+from config import Config
+from database import _create_engine
+from models import Base
+
+
+config = context.config
+target_metadata = Base.metadata
+
+# Логирование из alembic.ini только при запуске из CLI: у приложения свое
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+
+def run_migrations_offline():
+    """SQL миграций без подключения (alembic upgrade head --sql)."""
+    context.configure(
+        url=Config.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection):
+    """Выполнить миграции на готовом соединении."""
+    is_sqlite = connection.dialect.name == "sqlite"
+    if is_sqlite:
+        # Batch-режим SQLite пересоздает таблицу (копия, DROP, переименование),
+        # а DROP таблицы, на которую ссылаются записи, не проходит проверку
+        # внешних ключей. PRAGMA действует только вне транзакции
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
+    try:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=is_sqlite,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        if is_sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+            connection.commit()
+
+
+async def run_async_migrations():
+    """Миграции из CLI: свое подключение к DATABASE_URL."""
+    engine = _create_engine(Config.DATABASE_URL)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif "connection" in config.attributes:
+    # Запуск из приложения (Database.init_db): соединение уже открыто
+    do_run_migrations(config.attributes["connection"])
+else:
+    asyncio.run(run_async_migrations())
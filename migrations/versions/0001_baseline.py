@@ -0,0 +1,71 @@
+"""Исходная схема (до перехода на миграции)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 08:39:43
+
+Таблицы users, notes, note_names и settings в том виде, в котором их
+создавал create_all первых версий. База, созданная без миграций,
+помечается этой ревизией (alembic stamp 0001) и обновляется следующими.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+NOTE_TYPE = sa.Enum("FOR_HEALTH", "FOR_REPOSE", name="notetype", native_enum=False)
+NOTE_STATUS = sa.Enum("PENDING", "PAID", "READ", "DELETED", name="notestatus", native_enum=False)
+USER_ROLE = sa.Enum("USER", "PRIEST", "ALTAR_SERVER", "ADMIN", name="userrole", native_enum=False)
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("telegram_id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=255), nullable=True),
+        sa.Column("role", USER_ROLE, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+    
+    op.create_table(
+        "notes",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("type", NOTE_TYPE, nullable=False),
+        sa.Column("status", NOTE_STATUS, nullable=False),
+        sa.Column("payment_id", sa.String(length=255), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("read_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_notes_user_id", "notes", ["user_id"])
+    op.create_index("ix_notes_status", "notes", ["status"])
+    op.create_index("ix_notes_payment_id", "notes", ["payment_id"], unique=True)
+    
+    op.create_table(
+        "note_names",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("note_id", sa.Integer(), sa.ForeignKey("notes.id"), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("list_type", NOTE_TYPE, nullable=False),
+    )
+    op.create_index("ix_note_names_note_id", "note_names", ["note_id"])
+    
+    op.create_table(
+        "settings",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("value", sa.Text(), nullable=False),
+    )
+    op.create_index("ix_settings_key", "settings", ["key"], unique=True)
+
+
+def downgrade():
+    for table in ("settings", "note_names", "notes", "users"):
+        op.drop_table(table)
@@ -0,0 +1,155 @@
+"""Таблицы приходов, поминовений, богослужений, статистики и архива
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 08:39:43
+
+База, созданная create_all последней версией без миграций, тоже
+помечается ревизией 0001: ее таблицы уже есть и пропускаются,
+недостающие индексы достраиваются.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+NOTE_TYPE = sa.Enum("FOR_HEALTH", "FOR_REPOSE", name="notetype", native_enum=False)
+NOTE_STATUS = sa.Enum("PENDING", "PAID", "READ", "DELETED", name="notestatus", native_enum=False)
+SUBSCRIPTION_STATUS = sa.Enum("PENDING", "ACTIVE", "COMPLETED", name="subscriptionstatus", native_enum=False)
+
+# (имя, таблица, колонки, уникальный)
+INDEXES = [
+    ("ix_daily_stats_day", "daily_stats", ["day"], False),
+    ("ix_notes_archive_created_at", "notes_archive", ["created_at"], False),
+    ("ix_service_slots_parish_starts", "service_slots", ["parish_id", "starts_at"], False),
+    ("ix_service_slots_starts_at", "service_slots", ["starts_at"], False),
+    ("ix_read_events_reader_ts", "read_events", ["reader_id", "ts"], False),
+    ("ix_subscriptions_active", "subscriptions", ["status", "start_date", "end_date"], False),
+    ("ix_subscriptions_payment_id", "subscriptions", ["payment_id"], True),
+    ("ix_subscriptions_user_id", "subscriptions", ["user_id"], False),
+    ("ix_subscription_names_subscription_id", "subscription_names", ["subscription_id"], False),
+]
+
+
+def parish_id_column():
+    """Колонка parish_id (приход по умолчанию - 1)."""
+    return sa.Column("parish_id", sa.Integer(), sa.ForeignKey("parishes.id"), server_default="1", nullable=False)
+
+
+def created_at_column(name: str = "created_at"):
+    """Время создания строки."""
+    return sa.Column(name, sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+
+
+def upgrade():
+    # В режиме --sql подключения нет: выводится SQL для базы на ревизии 0001
+    if op.get_context().as_sql:
+        existing = set()
+    else:
+        existing = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    def create_table(name: str, *columns):
+        if name not in existing:
+            op.create_table(name, *columns)
+    
+    create_table(
+        "parishes",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("code", sa.String(length=64), nullable=False, unique=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("yookassa_shop_id", sa.String(length=64), nullable=True),
+        sa.Column("yookassa_secret_key", sa.String(length=255), nullable=True),
+        created_at_column(),
+    )
+    create_table(
+        "daily_stats",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        parish_id_column(),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("note_type", NOTE_TYPE, nullable=False),
+        sa.Column("reader_id", sa.Integer(), nullable=False),
+        sa.Column("notes_paid", sa.Integer(), nullable=False),
+        sa.Column("donations_sum", sa.Float(), nullable=False),
+        sa.Column("notes_read", sa.Integer(), nullable=False),
+        sa.Column("read_latency_sum", sa.Float(), nullable=False),
+        sa.UniqueConstraint(
+            "parish_id", "day", "note_type", "reader_id",
+            name="uq_daily_stats_parish_day_type_reader"
+        ),
+    )
+    create_table(
+        "notes_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        parish_id_column(),
+        sa.Column("type", NOTE_TYPE, nullable=False),
+        sa.Column("status", NOTE_STATUS, nullable=False),
+        sa.Column("payment_id", sa.String(length=255), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("names_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("read_at", sa.DateTime(timezone=True), nullable=True),
+        created_at_column("archived_at"),
+    )
+    create_table(
+        "service_slots",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        parish_id_column(),
+        sa.Column("starts_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("service_type", sa.String(length=100), nullable=False),
+        created_at_column(),
+    )
+    create_table(
+        "read_events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("reader_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("type", NOTE_TYPE, nullable=False),
+        created_at_column("ts"),
+    )
+    create_table(
+        "subscriptions",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        parish_id_column(),
+        sa.Column("type", NOTE_TYPE, nullable=False),
+        sa.Column("status", SUBSCRIPTION_STATUS, nullable=False),
+        sa.Column("payment_id", sa.String(length=255), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("days", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=True),
+        sa.Column("end_date", sa.Date(), nullable=True),
+        created_at_column(),
+    )
+    create_table(
+        "subscription_names",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("subscription_id", sa.Integer(), sa.ForeignKey("subscriptions.id"), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("list_type", NOTE_TYPE, nullable=False),
+    )
+    
+    # Индексы строятся вне транзакции и CONCURRENTLY (PostgreSQL): таблицы
+    # базы, созданной до миграций, уже заполнены, и обычный CREATE INDEX
+    # остановил бы запись на время построения
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name, table, columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in (
+        "subscription_names", "subscriptions", "read_events",
+        "service_slots", "notes_archive", "daily_stats", "parishes",
+    ):
+        op.drop_table(table)
@@ -0,0 +1,158 @@
+"""Колонки приходов, оплаты, поминовений и богослужений в исходных таблицах
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 08:39:43
+
+users: parish_id, on_duty; notes: parish_id, paid_at, subscription_id,
+occurrence_date, slot_id; settings: parish_id, уникальность ключа в
+пределах прихода вместо глобальной. Существующие строки относятся к
+приходу по умолчанию. На SQLite таблицы пересоздаются (batch-режим).
+"""
+from alembic import op
+import sqlalchemy as sa
+from config import Config
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+DEFAULT_PARISH_ID = 1
+
+PARISHES = sa.table(
+    "parishes",
+    sa.column("id", sa.Integer()),
+    sa.column("code", sa.String()),
+    sa.column("name", sa.String()),
+)
+
+# (имя, таблица, колонки)
+INDEXES = [
+    ("ix_users_parish_role", "users", ["parish_id", "role"]),
+    ("ix_notes_created_at", "notes", ["created_at"]),
+    ("ix_notes_queue", "notes", ["parish_id", "status", "type", "created_at", "id"]),
+    ("ix_notes_slot_status", "notes", ["slot_id", "status"]),
+]
+
+
+def foreign_key(table: str, column: str, target: str) -> sa.ForeignKey:
+    """Именованный внешний ключ: batch-режим SQLite требует имя ограничения."""
+    return sa.ForeignKey(f"{target}.id", name=f"fk_{table}_{column}_{target}")
+
+
+def parish_id_column(table: str):
+    """Колонка parish_id: существующие строки получают приход по умолчанию."""
+    return sa.Column(
+        "parish_id", sa.Integer(), foreign_key(table, "parish_id", "parishes"),
+        server_default=str(DEFAULT_PARISH_ID), nullable=False
+    )
+
+
+def ensure_default_parish(bind):
+    """
+    Приход по умолчанию нужен до добавления parish_id: внешний ключ
+    проверяется для уже существующих строк. Как и ParishService.ensure_default,
+    в пустую таблицу приход вставляется без явного id, чтобы не сбить
+    последовательность PostgreSQL.
+    """
+    values = {"code": Config.DEFAULT_PARISH_CODE, "name": Config.PARISH_NAME}
+    if bind is None:
+        op.execute(PARISHES.insert().values(**values))
+        return
+    
+    if bind.execute(sa.select(PARISHES.c.id).where(PARISHES.c.id == DEFAULT_PARISH_ID)).first():
+        return
+    if bind.execute(sa.select(sa.func.count()).select_from(PARISHES)).scalar():
+        values["id"] = DEFAULT_PARISH_ID
+    op.execute(PARISHES.insert().values(**values))
+
+
+def upgrade():
+    # В режиме --sql подключения нет: выводится SQL для базы на ревизии 0002
+    bind = None if op.get_context().as_sql else op.get_bind()
+    inspector = sa.inspect(bind) if bind is not None else None
+    
+    def missing(table: str, columns):
+        if inspector is None:
+            return list(columns)
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        return [column for column in columns if column.name not in existing]
+    
+    def has_unique(table: str, name: str) -> bool:
+        if inspector is None:
+            return False
+        return any(constraint["name"] == name for constraint in inspector.get_unique_constraints(table))
+    
+    ensure_default_parish(bind)
+    
+    users_columns = missing("users", [
+        parish_id_column("users"),
+        sa.Column("on_duty", sa.Boolean(), server_default=sa.false(), nullable=False),
+    ])
+    if users_columns:
+        with op.batch_alter_table("users") as batch_op:
+            for column in users_columns:
+                batch_op.add_column(column)
+    
+    notes_columns = missing("notes", [
+        parish_id_column("notes"),
+        sa.Column("paid_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "subscription_id", sa.Integer(),
+            foreign_key("notes", "subscription_id", "subscriptions"), nullable=True
+        ),
+        sa.Column("occurrence_date", sa.Date(), nullable=True),
+        sa.Column(
+            "slot_id", sa.Integer(),
+            foreign_key("notes", "slot_id", "service_slots"), nullable=True
+        ),
+    ])
+    notes_unique = not has_unique("notes", "uq_notes_occurrence_subscription")
+    if notes_columns or notes_unique:
+        with op.batch_alter_table("notes") as batch_op:
+            for column in notes_columns:
+                batch_op.add_column(column)
+            if notes_unique:
+                batch_op.create_unique_constraint(
+                    "uq_notes_occurrence_subscription", ["occurrence_date", "subscription_id"]
+                )
+    
+    # Ключ настройки уникален в пределах прихода: глобальный уникальный
+    # индекс ix_settings_key заменяется ограничением (parish_id, key)
+    if inspector is None or any(index["name"] == "ix_settings_key" for index in inspector.get_indexes("settings")):
+        op.drop_index("ix_settings_key", table_name="settings")
+    settings_columns = missing("settings", [parish_id_column("settings")])
+    settings_unique = not has_unique("settings", "uq_settings_parish_key")
+    if settings_columns or settings_unique:
+        with op.batch_alter_table("settings") as batch_op:
+            for column in settings_columns:
+                batch_op.add_column(column)
+            if settings_unique:
+                batch_op.create_unique_constraint("uq_settings_parish_key", ["parish_id", "key"])
+    
+    # Индексы по заполненным таблицам - CONCURRENTLY, без остановки записи
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table("settings") as batch_op:
+        batch_op.drop_constraint("uq_settings_parish_key", type_="unique")
+        batch_op.drop_column("parish_id")
+    op.create_index("ix_settings_key", "settings", ["key"], unique=True)
+    with op.batch_alter_table("notes") as batch_op:
+        batch_op.drop_constraint("uq_notes_occurrence_subscription", type_="unique")
+        for column in ("slot_id", "occurrence_date", "subscription_id", "paid_at", "parish_id"):
+            batch_op.drop_column(column)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("on_duty")
+        batch_op.drop_column("parish_id")
@@ -0,0 +1,40 @@
+"""Время оплаты поминовения
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 16:20:11
+
+subscriptions.paid_at нужно выгрузке для бухгалтерии. Для уже
+оплаченных поминовений точное время не сохранялось: берется время
+создания (оплата проходит в пределах срока жизни платежа).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+SUBSCRIPTIONS = sa.table(
+    "subscriptions",
+    sa.column("status", sa.String()),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+    sa.column("paid_at", sa.DateTime(timezone=True)),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("subscriptions") as batch_op:
+        batch_op.add_column(sa.Column("paid_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        SUBSCRIPTIONS.update()
+        .where(SUBSCRIPTIONS.c.status.in_(("ACTIVE", "COMPLETED")))
+        .values(paid_at=SUBSCRIPTIONS.c.created_at)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("subscriptions") as batch_op:
+        batch_op.drop_column("paid_at")
@@ -1,10 +1,14 @@
 """SQLAlchemy модели для базы данных."""
-from datetime import datetime
+from datetime import date, datetime, timezone
 from enum import Enum
 from typing import List, Optional
-from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import (
+    String, Integer, Float, Boolean, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint,
+    Enum as SQLEnum
+)
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 
 
 class Base(DeclarativeBase):
@@ -12,6 +16,48 @@ class Base(DeclarativeBase):
     pass
 
 
+class UTCDateTime(TypeDecorator):
+    """
+    Момент времени, всегда aware и в UTC.
+    
+    SQLite хранит DateTime без часового пояса: значение приводится к UTC
+    при записи и получает пояс UTC при чтении, поэтому код работает
+    с одним соглашением на любой базе. Naive-значения не принимаются.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            raise ValueError("Ожидается datetime с часовым поясом")
+        return value.astimezone(timezone.utc)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+
+# Приход по умолчанию: создается при запуске, к нему относятся данные
+# установки с одним приходом
+DEFAULT_PARISH_ID = 1
+
+
+def parish_column():
+    """Колонка parish_id: данные каждого прихода изолированы по ней."""
+    return mapped_column(
+        Integer,
+        ForeignKey("parishes.id"),
+        nullable=False,
+        default=DEFAULT_PARISH_ID,
+        server_default=str(DEFAULT_PARISH_ID)
+    )
+
+
 class UserRole(str, Enum):
     """Роли пользователей."""
     USER = "user"
@@ -34,20 +80,56 @@ class NoteStatus(str, Enum):
     DELETED = "deleted"  # Удалена
 
 
+class SubscriptionStatus(str, Enum):
+    """Статусы поминовений на период."""
+    PENDING = "pending"  # Ожидает оплаты
+    ACTIVE = "active"  # Оплачено, записки создаются ежедневно
+    COMPLETED = "completed"  # Период завершен
+
+
+class Parish(Base):
+    """Приход: своя очередь, роли, настройки и реквизиты YooKassa."""
+    __tablename__ = "parishes"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Короткий код для ссылки https://t.me/<бот>?start=<code>
+    code: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Пустые значения - используются YOOKASSA_SHOP_ID/YOOKASSA_SECRET_KEY
+    yookassa_shop_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    yookassa_secret_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        nullable=False
+    )
+
+
 class User(Base):
     """Модель пользователя."""
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_parish_role", "parish_id", "role"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False, index=True)
     username: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    parish_id: Mapped[int] = parish_column()
     role: Mapped[UserRole] = mapped_column(
         SQLEnum(UserRole, native_enum=False),
         default=UserRole.USER,
         nullable=False
     )
+    # Дежурный читающий получает уведомления о новых оплаченных записках
+    on_duty: Mapped[bool] = mapped_column(
+        Boolean,
+        default=False,
+        server_default=false(),
+        nullable=False
+    )
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(),
         server_default=func.now(),
         nullable=False
     )
@@ -59,9 +141,19 @@ class User(Base):
 class Note(Base):
     """Модель записки."""
     __tablename__ = "notes"
+    __table_args__ = (
+        # Очередь прихода: выборка по статусу и типу с keyset-пагинацией по (created_at, id)
+        Index("ix_notes_queue", "parish_id", "status", "type", "created_at", "id"),
+        # Не более одной записки поминовения на день; индекс также служит
+        # ежедневной выборке записок поминовения по occurrence_date
+        UniqueConstraint("occurrence_date", "subscription_id", name="uq_notes_occurrence_subscription"),
+        # Пачка записок богослужения
+        Index("ix_notes_slot_status", "slot_id", "status"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    parish_id: Mapped[int] = parish_column()
     type: Mapped[NoteType] = mapped_column(
         SQLEnum(NoteType, native_enum=False),
         nullable=False
@@ -75,11 +167,26 @@ class Note(Base):
     payment_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, unique=True, index=True)
     amount: Mapped[float] = mapped_column(Float, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(),
         server_default=func.now(),
-        nullable=False
+        nullable=False,
+        index=True
+    )
+    paid_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(), nullable=True)
+    read_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(), nullable=True)
+    # Для записок поминовения на период: подписка и день чтения
+    subscription_id: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        ForeignKey("subscriptions.id"),
+        nullable=True
+    )
+    occurrence_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    # Богослужение, на котором записка будет прочитана (назначается при оплате)
+    slot_id: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        ForeignKey("service_slots.id"),
+        nullable=True
     )
-    read_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="notes")
@@ -102,11 +209,171 @@ class NoteName(Base):
     note: Mapped["Note"] = relationship("Note", back_populates="names")
 
 
+class ServiceSlot(Base):
+    """Богослужение, к которому собираются оплаченные записки."""
+    __tablename__ = "service_slots"
+    __table_args__ = (
+        Index("ix_service_slots_parish_starts", "parish_id", "starts_at"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    parish_id: Mapped[int] = parish_column()
+    starts_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=False, index=True)
+    service_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        nullable=False
+    )
+
+
+class Subscription(Base):
+    """
+    Поминовение на период (сорокоуст, год): оплачивается один раз,
+    записки на каждый день создаются планировщиком.
+    """
+    __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_active", "status", "start_date", "end_date"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    parish_id: Mapped[int] = parish_column()
+    type: Mapped[NoteType] = mapped_column(
+        SQLEnum(NoteType, native_enum=False),
+        nullable=False
+    )
+    status: Mapped[SubscriptionStatus] = mapped_column(
+        SQLEnum(SubscriptionStatus, native_enum=False),
+        default=SubscriptionStatus.PENDING,
+        nullable=False
+    )
+    payment_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, unique=True, index=True)
+    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    days: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Первый и последний (включительно) дни чтения, задаются при оплате
+    start_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    end_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    paid_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        nullable=False
+    )
+    
+    # Relationships
+    names: Mapped[List["SubscriptionName"]] = relationship(
+        "SubscriptionName",
+        back_populates="subscription",
+        cascade="all, delete-orphan"
+    )
+
+
+class SubscriptionName(Base):
+    """Имя в поминовении на период."""
+    __tablename__ = "subscription_names"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    subscription_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("subscriptions.id"),
+        nullable=False,
+        index=True
+    )
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    list_type: Mapped[NoteType] = mapped_column(
+        SQLEnum(NoteType, native_enum=False),
+        nullable=False
+    )
+    
+    # Relationships
+    subscription: Mapped["Subscription"] = relationship("Subscription", back_populates="names")
+
+
 class Setting(Base):
     """Модель настроек системы."""
     __tablename__ = "settings"
+    __table_args__ = (
+        UniqueConstraint("parish_id", "key", name="uq_settings_parish_key"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False, index=True)
+    parish_id: Mapped[int] = parish_column()
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
     value: Mapped[str] = mapped_column(Text, nullable=False)
 
+
+class NoteArchive(Base):
+    """Архив прочитанных записок: только агрегаты, без имен и пользователя."""
+    __tablename__ = "notes_archive"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    parish_id: Mapped[int] = parish_column()
+    type: Mapped[NoteType] = mapped_column(
+        SQLEnum(NoteType, native_enum=False),
+        nullable=False
+    )
+    status: Mapped[NoteStatus] = mapped_column(
+        SQLEnum(NoteStatus, native_enum=False),
+        nullable=False
+    )
+    payment_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    names_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=False, index=True)
+    read_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(), nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        nullable=False
+    )
+
+
+class DailyStat(Base):
+    """
+    Дневные агрегаты по типу записки и читающему.
+    Строки с reader_id = 0 содержат оплаты, остальные - прочтения.
+    """
+    __tablename__ = "daily_stats"
+    __table_args__ = (
+        UniqueConstraint(
+            "parish_id", "day", "note_type", "reader_id",
+            name="uq_daily_stats_parish_day_type_reader"
+        ),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    parish_id: Mapped[int] = parish_column()
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    note_type: Mapped[NoteType] = mapped_column(
+        SQLEnum(NoteType, native_enum=False),
+        nullable=False
+    )
+    reader_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    notes_paid: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    donations_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    notes_read: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    read_latency_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+
+class ReadEvent(Base):
+    """Журнал прочтений (append-only): кто, какую записку и когда прочитал."""
+    __tablename__ = "read_events"
+    __table_args__ = (
+        Index("ix_read_events_reader_ts", "reader_id", "ts"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    reader_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    # Без внешнего ключа: записки архивируются и удаляются
+    note_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    type: Mapped[NoteType] = mapped_column(
+        SQLEnum(NoteType, native_enum=False),
+        nullable=False
+    )
+    ts: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        nullable=False
+    )
@@ -0,0 +1,45 @@
+"""Активность читающих по журналу прочтений."""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ReadEvent, User, UserRole
+
+
+class ActivityService:
+    """Сервис активности священников и алтарников."""
+    
+    @staticmethod
+    async def get_reader_activity(
+        session: AsyncSession,
+        parish_id: int,
+        days: int = 7
+    ) -> list[tuple[User, int, datetime | None]]:
+        """
+        Активность читающих прихода: (пользователь, прочтений за days дней,
+        время последнего прочтения). Каждый подзапрос - диапазонное
+        чтение индекса (reader_id, ts) по одному читающему.
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        
+        reads_count = (
+            select(func.count(ReadEvent.id))
+            .where(ReadEvent.reader_id == User.id, ReadEvent.ts >= since)
+            .correlate(User)
+            .scalar_subquery()
+        )
+        last_seen = (
+            select(func.max(ReadEvent.ts))
+            .where(ReadEvent.reader_id == User.id)
+            .correlate(User)
+            .scalar_subquery()
+        )
+        
+        result = await session.execute(
+            select(User, reads_count, last_seen)
+            .where(
+                User.parish_id == parish_id,
+                User.role.in_((UserRole.PRIEST, UserRole.ALTAR_SERVER))
+            )
+            .order_by(User.role, User.id)
+        )
+        return [tuple(row) for row in result.all()]
@@ -0,0 +1,145 @@
+"""Архивация прочитанных и удаленных записок, удаление имен завершенных поминовений."""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, and_, exists, func
+from config import Config
+from database import db
+from models import (
+    Note, NoteName, NoteArchive, NoteStatus,
+    Subscription, SubscriptionName, SubscriptionStatus
+)
+from services.logging_service import operation_logger
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveService:
+    """
+    Перенос старых записок в notes_archive.
+    Имена удаляются (политика конфиденциальности), в архиве остаются
+    только тип, статус, сумма, количество имен и даты. Имена завершенных
+    поминовений удаляются в те же сроки.
+    """
+    
+    @staticmethod
+    async def archive_notes(
+        older_than_days: float = Config.ARCHIVE_AFTER_DAYS,
+        batch_size: int = Config.ARCHIVE_BATCH_SIZE,
+        batch_pause: float = Config.ARCHIVE_BATCH_PAUSE
+    ) -> int:
+        """
+        Архивировать READ/DELETED записки старше older_than_days.
+        Работает пачками по batch_size с паузой batch_pause секунд между
+        пачками. Возвращает количество перенесенных записок.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        started = time.perf_counter()
+        last_id = 0
+        archived = 0
+        
+        names_count = (
+            select(func.count(NoteName.id))
+            .where(NoteName.note_id == Note.id)
+            .correlate(Note)
+            .scalar_subquery()
+        )
+        
+        while True:
+            async with db.get_session() as session:
+                # Пачки, захваченные другим процессом, пропускаются
+                result = await session.execute(
+                    db.skip_locked(
+                        select(Note.id)
+                        .where(
+                            and_(
+                                Note.status.in_((NoteStatus.READ, NoteStatus.DELETED)),
+                                func.coalesce(Note.read_at, Note.created_at) < cutoff,
+                                Note.id > last_id
+                            )
+                        )
+                        .order_by(Note.id.asc())
+                        .limit(batch_size)
+                    )
+                )
+                ids = list(result.scalars().all())
+                if not ids:
+                    break
+                last_id = ids[-1]
+                
+                await session.execute(
+                    insert(NoteArchive).from_select(
+                        [
+                            NoteArchive.id, NoteArchive.parish_id, NoteArchive.type, NoteArchive.status,
+                            NoteArchive.payment_id, NoteArchive.amount,
+                            NoteArchive.names_count, NoteArchive.created_at,
+                            NoteArchive.read_at
+                        ],
+                        select(
+                            Note.id, Note.parish_id, Note.type, Note.status, Note.payment_id,
+                            Note.amount, names_count, Note.created_at, Note.read_at
+                        ).where(Note.id.in_(ids))
+                    )
+                )
+                await session.execute(delete(NoteName).where(NoteName.note_id.in_(ids)))
+                await session.execute(delete(Note).where(Note.id.in_(ids)))
+                await session.commit()
+            
+            archived += len(ids)
+            if len(ids) < batch_size:
+                break
+            await asyncio.sleep(batch_pause)
+        
+        elapsed = time.perf_counter() - started
+        if archived:
+            operation_logger.log_notes_archived(archived, elapsed)
+        return archived
+    
+    @staticmethod
+    async def purge_subscription_names(
+        older_than_days: float = Config.ARCHIVE_AFTER_DAYS,
+        batch_size: int = Config.ARCHIVE_BATCH_SIZE,
+        batch_pause: float = Config.ARCHIVE_BATCH_PAUSE
+    ) -> int:
+        """
+        Удалить имена завершенных поминовений, последний день которых
+        старше older_than_days: записки по дням уже получили свои копии
+        имен, и те удаляются при архивации. Пачками по batch_size
+        поминовений. Возвращает количество поминовений без имен.
+        """
+        cutoff_day = (datetime.now() - timedelta(days=older_than_days)).date()
+        purged = 0
+        
+        while True:
+            async with db.get_session() as session:
+                result = await session.execute(
+                    select(Subscription.id)
+                    .where(
+                        and_(
+                            Subscription.status == SubscriptionStatus.COMPLETED,
+                            Subscription.end_date < cutoff_day,
+                            exists().where(SubscriptionName.subscription_id == Subscription.id)
+                        )
+                    )
+                    .order_by(Subscription.id.asc())
+                    .limit(batch_size)
+                )
+                ids = list(result.scalars().all())
+                if not ids:
+                    break
+                
+                await session.execute(
+                    delete(SubscriptionName).where(SubscriptionName.subscription_id.in_(ids))
+                )
+                await session.commit()
+            
+            purged += len(ids)
+            if len(ids) < batch_size:
+                break
+            await asyncio.sleep(batch_pause)
+        
+        if purged:
+            operation_logger.log_subscription_names_purged(purged)
+        return purged
@@ -0,0 +1,116 @@
+"""Истечение и удаление неоплаченных записок и поминовений."""
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, and_
+from config import Config
+from database import db
+from models import Note, NoteName, NoteStatus, Subscription, SubscriptionName, SubscriptionStatus
+from services.note_service import NoteService
+from services.reconciliation_service import iter_payment_statuses
+from services.subscription_service import SubscriptionService
+from services.logging_service import operation_logger
+
+
+logger = logging.getLogger(__name__)
+
+# Статусы YooKassa, при которых платеж еще может завершиться
+_IN_PROGRESS_STATUSES = ("pending", "waiting_for_capture")
+
+
+class CleanupService:
+    """Удаление записок и поминовений, не оплаченных в течение PENDING_NOTE_TTL_HOURS."""
+    
+    @staticmethod
+    async def expire_pending_notes(
+        ttl_hours: float = Config.PENDING_NOTE_TTL_HOURS,
+        batch_size: int = Config.CLEANUP_BATCH_SIZE
+    ) -> tuple[int, int]:
+        """
+        Обработать просроченные PENDING-записки пачками по batch_size.
+        Перед удалением платеж сверяется с YooKassa: оплаченные записки
+        переводятся в очередь, незавершенные платежи пропускаются.
+        Возвращает (удалено, восстановлено оплаченных).
+        """
+        expired, recovered = await CleanupService._expire(
+            Note, NoteStatus.PENDING, NoteName, NoteName.note_id,
+            NoteService.update_note_payment, ttl_hours, batch_size
+        )
+        if expired or recovered:
+            operation_logger.log_pending_expired(expired, recovered)
+        return expired, recovered
+    
+    @staticmethod
+    async def expire_pending_subscriptions(
+        ttl_hours: float = Config.PENDING_NOTE_TTL_HOURS,
+        batch_size: int = Config.CLEANUP_BATCH_SIZE
+    ) -> tuple[int, int]:
+        """
+        То же для PENDING-поминовений: оплаченные активируются,
+        с незавершенным платежом пропускаются, остальные удаляются
+        вместе с именами (записок у неоплаченного поминовения нет).
+        Возвращает (удалено, активировано оплаченных).
+        """
+        expired, recovered = await CleanupService._expire(
+            Subscription, SubscriptionStatus.PENDING, SubscriptionName, SubscriptionName.subscription_id,
+            SubscriptionService.activate, ttl_hours, batch_size
+        )
+        if expired or recovered:
+            operation_logger.log_pending_subscriptions_expired(expired, recovered)
+        return expired, recovered
+    
+    @staticmethod
+    async def _expire(
+        model,
+        pending_status,
+        names_model,
+        names_key,
+        mark_paid,
+        ttl_hours: float,
+        batch_size: int
+    ) -> tuple[int, int]:
+        """
+        Общий цикл истечения записок и поминовений (model) со статусом
+        pending_status старше ttl_hours. Оплаченные проводятся через
+        mark_paid(session, id, payment_id), остальные удаляются вместе
+        с именами (names_model, внешний ключ names_key).
+        Возвращает (удалено, проведено оплаченных).
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=ttl_hours)
+        conditions = [model.status == pending_status, model.created_at < cutoff]
+        expired = 0
+        recovered = 0
+        
+        async for rows, statuses in iter_payment_statuses(model, conditions, batch_size):
+            to_pay = []
+            to_delete = []
+            for row_id, payment_id, _ in rows:
+                if not payment_id:
+                    to_delete.append(row_id)
+                    continue
+                
+                status = statuses[payment_id]
+                if status is None or status["status"] in _IN_PROGRESS_STATUSES:
+                    continue
+                if status["status"] == "succeeded":
+                    to_pay.append((row_id, payment_id))
+                else:
+                    to_delete.append(row_id)
+            
+            async with db.get_session() as session:
+                for row_id, payment_id in to_pay:
+                    if await mark_paid(session, row_id, payment_id):
+                        recovered += 1
+                
+                if to_delete:
+                    # Удаляются только строки, которые все еще не оплачены:
+                    # webhook мог провести оплату после сверки, и тогда
+                    # имена должны остаться
+                    still_pending = and_(model.id.in_(to_delete), model.status == pending_status)
+                    await session.execute(
+                        delete(names_model).where(names_key.in_(select(model.id).where(still_pending)))
+                    )
+                    result = await session.execute(delete(model).where(still_pending))
+                    expired += result.rowcount
+                    await session.commit()
+        
+        return expired, recovered
@@ -0,0 +1,99 @@
+"""Плавная остановка: дождаться текущей работы перед закрытием ресурсов."""
+import asyncio
+import logging
+import time
+from typing import Coroutine
+from aiohttp import web
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+# Маршруты, которые отвечают и во время остановки
+DRAIN_EXEMPT_PATHS = frozenset({"/healthz", "/readyz"})
+
+
+class DrainController:
+    """
+    Учет выполняющейся работы: HTTP-запросов (апдейты Telegram, webhook
+    YooKassa) и фоновых задач, запущенных через spawn. После begin()
+    новые запросы получают 503 - Telegram и YooKassa повторят их
+    на другом экземпляре или после перезапуска.
+    """
+    
+    def __init__(self):
+        """Инициализация контроллера."""
+        self.draining = False
+        self._tasks: set[asyncio.Task] = set()
+        self.drained = 0
+        self.abandoned = 0
+        self._deadline: float | None = None
+    
+    @property
+    def inflight(self) -> int:
+        """Сколько запросов и фоновых задач выполняется."""
+        return len(self._tasks)
+    
+    def track(self, task: asyncio.Task) -> asyncio.Task:
+        """Учитывать задачу до ее завершения."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    def spawn(self, coro: Coroutine, name: str | None = None) -> asyncio.Task:
+        """Запустить фоновую задачу, которую остановка дождется."""
+        return self.track(asyncio.create_task(coro, name=name))
+    
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        """Отклонять запросы во время остановки, учитывать выполняющиеся."""
+        if request.path in DRAIN_EXEMPT_PATHS:
+            return await handler(request)
+        if self.draining:
+            return web.Response(status=503, text="Shutting down", headers={"Retry-After": "5"})
+        
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await handler(request)
+        finally:
+            self._tasks.discard(task)
+    
+    def begin(self, timeout: float = Config.SHUTDOWN_DRAIN_SECONDS):
+        """Перестать принимать новую работу; отсчет общего срока остановки."""
+        if not self.draining:
+            self.draining = True
+            self._deadline = time.monotonic() + timeout
+            logger.info(f"Остановка: новые запросы отклоняются, выполняется: {self.inflight}")
+    
+    def remaining(self) -> float:
+        """Сколько секунд осталось до срока остановки."""
+        if self._deadline is None:
+            return 0.0
+        return max(self._deadline - time.monotonic(), 0.0)
+    
+    async def wait(self) -> tuple[int, int]:
+        """
+        Дождаться выполняющейся работы до срока остановки; незавершенное
+        к сроку отменяется. Возвращает (дождались, брошено).
+        """
+        current = asyncio.current_task()
+        # Задачи, запущенные уже во время ожидания (например, уведомления
+        # из дожидаемого обработчика), тоже дожидаются
+        while True:
+            tasks = self._tasks - {current}
+            if not tasks:
+                break
+            done, pending = await asyncio.wait(tasks, timeout=self.remaining())
+            self.drained += len(done)
+            if pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                self.abandoned += len(pending)
+                break
+        return self.drained, self.abandoned
+
+
+# Глобальный экземпляр контроллера остановки
+drain_controller = DrainController()
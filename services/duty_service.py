@@ -0,0 +1,90 @@
+"""Уведомления дежурных читающих о новых оплаченных записках."""
+import asyncio
+import logging
+from aiogram import Bot
+from config import Config
+from database import db
+from models import NoteType
+from services.events_service import event_bus, NOTE_PAID
+from services.note_service import NoteService
+from services.user_service import UserService
+
+
+logger = logging.getLogger(__name__)
+
+
+class DutyNotifier:
+    """
+    Подписчик NOTE_PAID. События за окно debounce_seconds объединяются
+    в одно уведомление каждому дежурному прихода записок.
+    """
+    
+    def __init__(self, bot: Bot, debounce_seconds: float = Config.DUTY_NOTIFY_DEBOUNCE_SECONDS):
+        """Инициализация уведомителя."""
+        self.bot = bot
+        self.debounce_seconds = debounce_seconds
+        self._pending: dict[tuple[int, NoteType], int] = {}
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+    
+    def start(self):
+        """Подписаться на события."""
+        event_bus.subscribe(NOTE_PAID, self._on_note_paid)
+    
+    async def close(self):
+        """Отписаться и отправить накопленное уведомление."""
+        event_bus.unsubscribe(NOTE_PAID, self._on_note_paid)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            await self._flush()
+    
+    @property
+    def pending(self) -> int:
+        """Сколько оплат ожидает отправки уведомления."""
+        return sum(self._pending.values())
+    
+    def _on_note_paid(self, payload: dict):
+        """Накопить событие и запланировать отправку."""
+        key = (payload["parish_id"], payload["type"])
+        self._pending[key] = self._pending.get(key, 0) + payload.get("count", 1)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._debounced_flush(), name="duty_notify")
+    
+    async def _debounced_flush(self):
+        """Подождать окно объединения и отправить уведомления."""
+        await asyncio.sleep(self.debounce_seconds)
+        await self._flush()
+    
+    async def _flush(self):
+        """Отправить по приходам одно сводное уведомление каждому дежурному."""
+        pending, self._pending = self._pending, {}
+        by_parish: dict[int, dict[NoteType, int]] = {}
+        for (parish_id, note_type), count in pending.items():
+            by_parish.setdefault(parish_id, {})[note_type] = count
+        
+        for parish_id, counts in by_parish.items():
+            await self._notify_parish(parish_id, counts)
+    
+    async def _notify_parish(self, parish_id: int, counts: dict[NoteType, int]):
+        """Сводное уведомление дежурным одного прихода."""
+        async with db.get_session() as session:
+            readers = await UserService.get_on_duty_readers(session, parish_id)
+            if not readers:
+                return
+            queue_count = await NoteService.get_queue_count(session, parish_id)
+        
+        health = counts.get(NoteType.FOR_HEALTH, 0)
+        repose = counts.get(NoteType.FOR_REPOSE, 0)
+        text = (
+            f"🔔 Новые оплаченные записки: {health + repose}\n"
+            f"За здравие: {health}, об упокоении: {repose}\n"
+            f"Всего в очереди: {queue_count}"
+        )
+        
+        for reader in readers:
+            try:
+                await self.bot.send_message(reader.telegram_id, text)
+                self.sent += 1
+            except Exception as e:
+                logger.warning(f"Не удалось уведомить дежурного {reader.id}: {e}")
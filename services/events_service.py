@@ -0,0 +1,45 @@
+"""Внутрипроцессная шина событий (pub/sub)."""
+import logging
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+# Записка оплачена: {"parish_id": int, "note_id": int | None, "type": NoteType, "count": int}
+NOTE_PAID = "note_paid"
+# Записка прочитана: {"parish_id": int, "note_id": int | None, "type": NoteType}
+NOTE_READ = "note_read"
+
+
+class EventBus:
+    """
+    Простая синхронная шина событий. Подписчики должны быстро
+    возвращать управление (например, планировать задачу), поэтому
+    публикация не блокирует транзакционный код.
+    """
+    
+    def __init__(self):
+        """Инициализация шины."""
+        self._subscribers: dict[str, list[Callable[[dict], Any]]] = {}
+    
+    def subscribe(self, topic: str, callback: Callable[[dict], Any]):
+        """Подписаться на событие."""
+        self._subscribers.setdefault(topic, []).append(callback)
+    
+    def unsubscribe(self, topic: str, callback: Callable[[dict], Any]):
+        """Отписаться от события."""
+        callbacks = self._subscribers.get(topic, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+    
+    def publish(self, topic: str, payload: dict):
+        """Опубликовать событие всем подписчикам."""
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Ошибка подписчика события {topic}: {e}")
+
+
+# Глобальный экземпляр шины
+event_bus = EventBus()
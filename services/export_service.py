@@ -0,0 +1,129 @@
+"""Потоковая выгрузка записок и платежей для бухгалтерии (без имен)."""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator
+from sqlalchemy import select, and_, literal, null
+from database import db
+from models import Note, NoteArchive, Subscription
+
+
+EXPORT_COLUMNS = (
+    "source", "note_id", "type", "status", "amount", "payment_id",
+    "created_at", "paid_at", "read_at"
+)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Строк на одну выборку (своя короткая сессия на каждую)
+FETCH_ROWS = 1000
+
+# Размер несжатого буфера перед сжатием и отдачей чанка
+CHUNK_BYTES = 64 * 1024
+
+
+def parse_date_range(date_from: str | None, date_to: str | None) -> tuple[datetime, datetime]:
+    """
+    Разбор периода YYYY-MM-DD..YYYY-MM-DD (обе даты включительно).
+    По умолчанию - последние 30 дней. Дни локальные, как в статистике
+    и расписании: границы - местная полночь, переведенная в UTC.
+    Ошибки формата - ValueError.
+    """
+    end_day = date.fromisoformat(date_to) if date_to else datetime.now().date()
+    start_day = date.fromisoformat(date_from) if date_from else end_day - timedelta(days=29)
+    if start_day > end_day:
+        raise ValueError("Начало периода позже окончания")
+    
+    start = datetime.combine(start_day, time.min).astimezone().astimezone(timezone.utc)
+    end = datetime.combine(end_day + timedelta(days=1), time.min).astimezone().astimezone(timezone.utc)
+    return start, end
+
+
+class ExportService:
+    """Выгрузка с постоянным потреблением памяти: пачки строк -> чанки gzip."""
+    
+    @staticmethod
+    async def iter_rows(
+        start: datetime,
+        end: datetime,
+        parish_id: int | None = None
+    ) -> AsyncIterator[tuple]:
+        """
+        Строки выгрузки (одного прихода или всех): актуальные записки, архив,
+        затем поминовения на период. Пожертвование за поминовение - строка
+        subscriptions: его ежедневные записки выгружаются с суммой 0.
+        """
+        queries = [
+            select(
+                literal("notes"), Note.id, Note.type, Note.status, Note.amount,
+                Note.payment_id, Note.created_at, Note.paid_at, Note.read_at
+            )
+            .where(and_(Note.created_at >= start, Note.created_at < end)),
+            select(
+                literal("archive"), NoteArchive.id, NoteArchive.type, NoteArchive.status,
+                NoteArchive.amount, NoteArchive.payment_id, NoteArchive.created_at,
+                null(), NoteArchive.read_at
+            )
+            .where(and_(NoteArchive.created_at >= start, NoteArchive.created_at < end)),
+            select(
+                literal("subscriptions"), Subscription.id, Subscription.type, Subscription.status,
+                Subscription.amount, Subscription.payment_id, Subscription.created_at,
+                Subscription.paid_at, null()
+            )
+            .where(and_(Subscription.created_at >= start, Subscription.created_at < end)),
+        ]
+        keys = [(Note.id,), (NoteArchive.id,), (Subscription.id,)]
+        if parish_id is not None:
+            queries = [
+                queries[0].where(Note.parish_id == parish_id),
+                queries[1].where(NoteArchive.parish_id == parish_id),
+                queries[2].where(Subscription.parish_id == parish_id),
+            ]
+        
+        # Соединение занято только на время выборки пачки
+        for query, query_keys in zip(queries, keys):
+            async for row in db.iter_batches(query, query_keys, FETCH_ROWS, read=True):
+                yield row
+    
+    @staticmethod
+    def _format_value(value) -> str | float | None:
+        """Приведение значения к виду для CSV/JSON."""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if hasattr(value, "value"):
+            return value.value
+        return value
+    
+    @staticmethod
+    async def iter_export(
+        start: datetime,
+        end: datetime,
+        fmt: str = "csv",
+        parish_id: int | None = None
+    ) -> AsyncIterator[bytes]:
+        """Сжатые gzip чанки выгрузки в формате csv или jsonl."""
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        
+        async for row in ExportService.iter_rows(start, end, parish_id):
+            values = [ExportService._format_value(value) for value in row]
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False))
+                buffer.write("\n")
+            
+            if buffer.tell() >= CHUNK_BYTES:
+                chunk = compressor.compress(buffer.getvalue().encode("utf-8"))
+                buffer.seek(0)
+                buffer.truncate()
+                if chunk:
+                    yield chunk
+        
+        yield compressor.compress(buffer.getvalue().encode("utf-8")) + compressor.flush()
@@ -0,0 +1,152 @@
+"""Проверки живости и готовности, мониторинг задержки event loop."""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from sqlalchemy import text
+from config import Config
+from database import db
+from services.drain_service import drain_controller
+from services.scheduler_service import scheduler
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Задержка планирования event loop: задача засыпает на interval секунд
+    и измеряет, насколько позже ее разбудили. Если loop заблокирован
+    дольше threshold (синхронный вызов, например SDK YooKassa), поток-
+    сторож выводит в лог стек потока loop - то есть место блокировки.
+    """
+    
+    def __init__(
+        self,
+        interval: float = Config.LOOP_LAG_INTERVAL_SECONDS,
+        threshold: float = Config.LOOP_LAG_THRESHOLD_SECONDS
+    ):
+        """Инициализация монитора."""
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.slow_ticks = 0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: int | None = None
+    
+    def start(self):
+        """Запустить измерение и поток-сторож."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure(), name="loop_lag_monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self):
+        """Остановить монитор."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _measure(self):
+        """Цикл измерения задержки."""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            
+            lag = max(now - started - self.interval, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.slow_ticks += 1
+                logger.warning(f"Задержка event loop: {lag * 1000:.0f} мс")
+    
+    def _watch(self):
+        """Поток-сторож: стек потока loop, пока тот не отвечает дольше threshold."""
+        dumped_for = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat <= self.threshold + self.interval:
+                continue
+            # Один дамп на одну блокировку
+            if dumped_for == heartbeat:
+                continue
+            dumped_for = heartbeat
+            self.stalls += 1
+            
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                stack = "".join(traceback.format_stack(frame))
+                logger.warning(f"Event loop заблокирован, стек:\n{stack}")
+    
+    def stats(self) -> dict:
+        """Показатели монитора (в миллисекундах)."""
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "slow_ticks": self.slow_ticks,
+            "stalls": self.stalls,
+        }
+
+
+async def _ping_db():
+    """SELECT 1 на основной БД."""
+    async with db.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+class HealthService:
+    """Проверки для оркестратора: ping БД кэшируется на HEALTH_DB_CACHE_SECONDS."""
+    
+    _db_checked_at: float | None = None
+    _db_ok = False
+    _db_error: str | None = None
+    _db_lock = asyncio.Lock()
+    
+    @staticmethod
+    async def check_db() -> tuple[bool, str | None]:
+        """Доступность БД (результат кэшируется): (ok, ошибка)."""
+        async with HealthService._db_lock:
+            now = time.monotonic()
+            checked_at = HealthService._db_checked_at
+            if checked_at is None or now - checked_at >= Config.HEALTH_DB_CACHE_SECONDS:
+                try:
+                    # Таймаут и на ожидание соединения: у SQLite оно одно
+                    await asyncio.wait_for(_ping_db(), Config.HEALTH_DB_TIMEOUT_SECONDS)
+                    HealthService._db_ok, HealthService._db_error = True, None
+                except Exception as e:
+                    HealthService._db_ok, HealthService._db_error = False, str(e) or type(e).__name__
+                    logger.warning(f"Проверка БД не прошла: {HealthService._db_error}")
+                HealthService._db_checked_at = time.monotonic()
+        return HealthService._db_ok, HealthService._db_error
+    
+    @staticmethod
+    async def readiness() -> tuple[bool, dict]:
+        """
+        Готовность принимать трафик: БД доступна и фоновые задачи работают.
+        Во время остановки экземпляр не готов, чтобы балансировщик снял его.
+        """
+        if drain_controller.draining:
+            return False, {"draining": True, "inflight": drain_controller.inflight}
+        
+        db_ok, db_error = await HealthService.check_db()
+        jobs = scheduler.status()
+        jobs_ok = scheduler.running and all(state == "running" for state in jobs.values())
+        
+        details = {
+            "database": "ok" if db_ok else f"error: {db_error}",
+            "scheduler": jobs,
+        }
+        return db_ok and jobs_ok, details
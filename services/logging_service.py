@@ -11,15 +11,26 @@ class OperationLogger:
     """Логгер для операций системы без персональных данных."""
     
     def __init__(self):
-        """Инициализация логгера."""
+        """Инициализация логгера (каталог и файл создаются при первой записи)."""
         self.log_dir = Path("logs")
+        self._logger: logging.Logger | None = None
+    
+    @property
+    def logger(self) -> logging.Logger:
+        """Логгер операций; настраивается при первом обращении."""
+        if self._logger is None:
+            self._logger = self._create_logger()
+        return self._logger
+    
+    def _create_logger(self) -> logging.Logger:
+        """Создать каталог логов и файловый обработчик с ротацией."""
         self.log_dir.mkdir(exist_ok=True)
         
-        self.logger = logging.getLogger("operations")
-        self.logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+        logger = logging.getLogger("operations")
+        logger.setLevel(getattr(logging, Config.LOG_LEVEL))
         
         # Очистка существующих обработчиков
-        self.logger.handlers.clear()
+        logger.handlers.clear()
         
         # Файловый обработчик с ротацией
         log_file = self.log_dir / "operations.log"
@@ -38,7 +49,8 @@ class OperationLogger:
         )
         file_handler.setFormatter(formatter)
         
-        self.logger.addHandler(file_handler)
+        logger.addHandler(file_handler)
+        return logger
     
     def log_note_created(self, note_id: int, note_type: str, names_count: int, amount: float):
         """Логирование создания записки."""
@@ -54,6 +66,27 @@ class OperationLogger:
             f"amount={amount:.2f}"
         )
     
+    def log_subscription_created(self, subscription_id: int, note_type: str, names_count: int, amount: float, days: int):
+        """Логирование создания поминовения на период."""
+        self.logger.info(
+            f"Subscription created: id={subscription_id}, type={note_type}, "
+            f"names_count={names_count}, amount={amount:.2f}, days={days}"
+        )
+    
+    def log_subscription_payment_created(self, subscription_id: int, payment_id: str, amount: float):
+        """Логирование создания платежа за поминовение на период."""
+        self.logger.info(
+            f"Payment created: subscription_id={subscription_id}, payment_id={payment_id}, "
+            f"amount={amount:.2f}"
+        )
+    
+    def log_subscriptions_materialized(self, day: str, count: int, completed: int):
+        """Логирование ежедневного создания записок поминовения."""
+        self.logger.info(
+            f"Subscriptions materialized: day={day}, notes_created={count}, "
+            f"completed={completed}"
+        )
+    
     def log_payment_status(self, payment_id: str, status: str, amount: float):
         """Логирование изменения статуса платежа."""
         self.logger.info(
@@ -68,6 +101,13 @@ class OperationLogger:
             f"reader_role={reader_role}, timestamp={datetime.now().isoformat()}"
         )
     
+    def log_batch_read(self, slot_id: int, notes_count: int, reader_role: str):
+        """Логирование прочтения пачки записок богослужения."""
+        self.logger.info(
+            f"Batch read: slot_id={slot_id}, notes_count={notes_count}, "
+            f"reader_role={reader_role}, timestamp={datetime.now().isoformat()}"
+        )
+    
     def log_role_changed(self, user_id: int, old_role: str, new_role: str):
         """Логирование изменения роли пользователя."""
         self.logger.info(
@@ -75,6 +115,38 @@ class OperationLogger:
             f"new_role={new_role}"
         )
     
+    def log_pending_expired(self, expired: int, recovered: int):
+        """Логирование очистки неоплаченных записок."""
+        self.logger.info(
+            f"Pending notes cleanup: expired={expired}, recovered_paid={recovered}"
+        )
+    
+    def log_payments_reconciled(self, count: int):
+        """Логирование восстановленных по сверке оплат."""
+        self.logger.info(f"Payments reconciled: recovered_paid={count}")
+    
+    def log_pending_subscriptions_expired(self, expired: int, recovered: int):
+        """Логирование очистки неоплаченных поминовений."""
+        self.logger.info(
+            f"Pending subscriptions cleanup: expired={expired}, activated_paid={recovered}"
+        )
+    
+    def log_subscriptions_reconciled(self, count: int):
+        """Логирование поминовений, активированных по сверке."""
+        self.logger.info(f"Subscriptions reconciled: activated_paid={count}")
+    
+    def log_subscription_names_purged(self, count: int):
+        """Логирование удаления имен завершенных поминовений."""
+        self.logger.info(f"Subscription names purged: subscriptions={count}")
+    
+    def log_notes_archived(self, count: int, seconds: float):
+        """Логирование архивации записок."""
+        rate = count / seconds if seconds > 0 else float(count)
+        self.logger.info(
+            f"Notes archived: count={count}, seconds={seconds:.2f}, "
+            f"rows_per_second={rate:.1f}"
+        )
+    
     def log_error(self, operation: str, error: str):
         """Логирование ошибки."""
         self.logger.error(f"Error in {operation}: {error}")
@@ -0,0 +1,199 @@
+"""Словарь церковных имен: нормализация и подсказки канонических форм."""
+import logging
+import mmap
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_PATH = Path(__file__).resolve().parent.parent / "data" / "church_names.txt"
+
+# Максимальное расстояние Левенштейна для подсказок
+MAX_EDIT_DISTANCE = 2
+
+# Окончания родительного падежа -> окончания именительного
+# (в записках имена часто пишут в родительном падеже: "о здравии Иоанна")
+_GENITIVE_ENDINGS = (
+    ("ии", ("ия", "ий")),
+    ("ия", ("ий",)),
+    ("ея", ("ей",)),
+    ("ы", ("а",)),
+    ("и", ("а", "я", "ь")),
+    ("я", ("ь", "й")),
+    ("а", ("",)),
+)
+
+# Уточнения перед именем, которые не проверяются по словарю
+_QUALIFIERS = frozenset((
+    "младенца", "младенец", "отрока", "отроковицы", "воина", "болящего",
+    "болящей", "путешествующего", "путешествующей", "заключенного",
+    "заключенной", "непраздной", "новопреставленного", "новопреставленной",
+    "приснопоминаемого", "приснопоминаемой", "убиенного", "убиенной",
+    "иерея", "протоиерея", "диакона", "монаха", "монахини", "инока",
+    "инокини", "схимонаха", "схимонахини", "игумена", "игумении",
+))
+
+
+def normalize(name: str) -> str:
+    """Нормализация имени для поиска: нижний регистр, ё -> е."""
+    return name.strip().lower().replace("ё", "е")
+
+
+def _deletes(word: str, distance: int) -> set[str]:
+    """Все варианты слова с удалением до distance символов."""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна с ранним выходом при превышении limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                current[j - 1] + 1,
+                previous[j] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NameDictionary:
+    """
+    Словарь церковных имен.
+    
+    Файл словаря отображается в память и разбирается при первом
+    обращении. Точный поиск - по словарю нормализованных форм, нечеткий -
+    по индексу удалений (symmetric delete): для запроса генерируются
+    удаления до MAX_EDIT_DISTANCE символов, кандидаты проверяются
+    точным расстоянием Левенштейна.
+    """
+    
+    def __init__(self, path: Path = DICTIONARY_PATH):
+        """Инициализация словаря (без загрузки)."""
+        self.path = path
+        self._forms: dict[str, str] | None = None
+        self._deletes: dict[str, tuple[str, ...]] = {}
+    
+    @property
+    def forms(self) -> dict[str, str]:
+        """Нормализованная форма -> каноническое имя (загружается лениво)."""
+        if self._forms is None:
+            self._load()
+        return self._forms
+    
+    def _load(self):
+        """Загрузка словаря из файла и построение индексов."""
+        forms: dict[str, str] = {}
+        
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for raw in iter(mm.readline, b""):
+                    line = raw.decode("utf-8").strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    
+                    canonical, _, variants = line.partition(":")
+                    canonical = canonical.strip()
+                    forms.setdefault(normalize(canonical), canonical)
+                    for variant in variants.split(","):
+                        if variant.strip():
+                            forms.setdefault(normalize(variant), canonical)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось загрузить словарь имен {self.path}: {e}")
+        
+        deletes: dict[str, list[str]] = {}
+        for form in forms:
+            for deleted in _deletes(form, MAX_EDIT_DISTANCE):
+                deletes.setdefault(deleted, []).append(form)
+        
+        self._deletes = {key: tuple(value) for key, value in deletes.items()}
+        self._forms = forms
+        logger.info(f"Словарь имен загружен: {len(forms)} форм")
+    
+    def _match(self, name: str) -> tuple[str, str] | None:
+        """
+        Точный поиск с учетом родительного падежа.
+        Возвращает (найденная форма, каноническое имя) или None.
+        """
+        forms = self.forms
+        word = normalize(name)
+        if word in forms:
+            return word, forms[word]
+        
+        for ending, replacements in _GENITIVE_ENDINGS:
+            if word.endswith(ending) and len(word) > len(ending) + 1:
+                stem = word[:-len(ending)]
+                for replacement in replacements:
+                    form = stem + replacement
+                    if form in forms:
+                        return form, forms[form]
+        return None
+    
+    def lookup(self, name: str) -> str | None:
+        """Каноническая форма имени или None, если имени нет в словаре."""
+        match = self._match(name)
+        return match[1] if match else None
+    
+    def suggest(self, name: str, max_distance: int = MAX_EDIT_DISTANCE, limit: int = 3) -> list[str]:
+        """Ближайшие канонические имена в пределах max_distance правок."""
+        word = normalize(name)
+        if not word:
+            return []
+        
+        forms = self.forms
+        max_distance = min(max_distance, MAX_EDIT_DISTANCE)
+        found: dict[str, int] = {}
+        checked = set()
+        
+        for deleted in _deletes(word, max_distance):
+            for form in self._deletes.get(deleted, ()):
+                if form in checked:
+                    continue
+                checked.add(form)
+                distance = _edit_distance(word, form, max_distance)
+                if distance <= max_distance:
+                    canonical = forms[form]
+                    found[canonical] = min(distance, found.get(canonical, distance))
+        
+        ordered = sorted(found.items(), key=lambda item: (item[1], item[0]))
+        return [canonical for canonical, _ in ordered[:limit]]
+    
+    def suggest_canonical(self, names: list[str]) -> dict[str, str]:
+        """
+        Подсказки для списка имен: {введенное имя: каноническая форма}.
+        Имена, уже записанные в церковной форме, пропускаются.
+        """
+        suggestions = {}
+        for name in names:
+            words = [w for w in name.split() if normalize(w) not in _QUALIFIERS]
+            if len(words) != 1:
+                continue
+            word = words[0]
+            
+            match = self._match(word)
+            if match:
+                form, canonical = match
+                if form != normalize(canonical):
+                    suggestions[name] = canonical
+                continue
+            
+            max_distance = 1 if len(word) <= 4 else MAX_EDIT_DISTANCE
+            candidates = self.suggest(word, max_distance=max_distance, limit=1)
+            if candidates:
+                suggestions[name] = candidates[0]
+        return suggestions
+
+
+# Глобальный экземпляр словаря
+name_dictionary = NameDictionary()
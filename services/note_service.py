@@ -1,10 +1,89 @@
 """Сервис для работы с записками."""
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from sqlalchemy.orm import selectinload
-from models import Note, NoteName, NoteType, NoteStatus, User
+from collections import defaultdict
+from sqlalchemy import bindparam, select, update, insert, func, tuple_
+from sqlalchemy.orm import aliased, selectinload
+from models import Note, NoteName, NoteType, NoteStatus, ReadEvent, User
 from services.logging_service import operation_logger
+from services.stats_service import StatsService, seconds_since
+from services.events_service import event_bus, NOTE_PAID, NOTE_READ
+from services.slot_service import SlotService, slot_batch_cache
+
+
+@dataclass(frozen=True, slots=True)
+class NoteInfo:
+    """Записка для чтения (без ORM-сущности, связей и identity map)."""
+    id: int
+    parish_id: int
+    type: NoteType
+    status: NoteStatus
+    amount: float
+    payment_id: str | None
+    names_for_health: tuple[str, ...] = ()
+    names_for_repose: tuple[str, ...] = ()
+
+
+notes = Note.__table__
+note_names = NoteName.__table__
+
+# Горячие чтения - запросы Core, построенные один раз: значения передаются
+# параметрами, поэтому SQL берется из кэша компиляции SQLAlchemy, а на
+# PostgreSQL - и из кэша подготовленных выражений asyncpg
+NOTE_COLUMNS = (
+    notes.c.id,
+    notes.c.parish_id,
+    notes.c.type,
+    notes.c.status,
+    notes.c.amount,
+    notes.c.payment_id
+)
+
+NOTE_BY_PAYMENT_ID = select(*NOTE_COLUMNS).where(notes.c.payment_id == bindparam("payment_id"))
+
+QUEUE_COUNT = (
+    select(func.count())
+    .select_from(notes)
+    .where(notes.c.parish_id == bindparam("parish_id"), notes.c.status == NoteStatus.PAID)
+)
+QUEUE_COUNT_BY_TYPE = QUEUE_COUNT.where(notes.c.type == bindparam("note_type"))
+QUEUE_COUNTS = (
+    select(notes.c.type, func.count())
+    .where(notes.c.parish_id == bindparam("parish_id"), notes.c.status == NoteStatus.PAID)
+    .group_by(notes.c.type)
+)
+
+# Записка с именами одним запросом (строка на имя)
+NOTE_WITH_NAMES = (
+    select(*NOTE_COLUMNS, note_names.c.name, note_names.c.list_type)
+    .select_from(notes.outerjoin(note_names, note_names.c.note_id == notes.c.id))
+    .order_by(note_names.c.id)
+)
+NOTE_WITH_NAMES_BY_ID = NOTE_WITH_NAMES.where(notes.c.id == bindparam("note_id"))
+NEXT_NOTE_ID = (
+    select(notes.c.id)
+    .where(
+        notes.c.parish_id == bindparam("parish_id"),
+        notes.c.status == NoteStatus.PAID,
+        notes.c.type == bindparam("note_type")
+    )
+    .order_by(notes.c.created_at.asc(), notes.c.id.asc())
+    .limit(1)
+    .scalar_subquery()
+)
+NEXT_NOTE_WITH_NAMES = NOTE_WITH_NAMES.where(notes.c.id == NEXT_NOTE_ID)
+
+
+def note_info_from_rows(rows) -> NoteInfo | None:
+    """Собрать NoteInfo из строк NOTE_WITH_NAMES."""
+    if not rows:
+        return None
+    return NoteInfo(
+        *rows[0][:len(NOTE_COLUMNS)],
+        names_for_health=tuple(row.name for row in rows if row.list_type == NoteType.FOR_HEALTH),
+        names_for_repose=tuple(row.name for row in rows if row.list_type == NoteType.FOR_REPOSE)
+    )
 
 
 class NoteService:
@@ -17,11 +96,13 @@ class NoteService:
         note_type: NoteType,
         names_for_health: list[str],
         names_for_repose: list[str],
-        amount: float
+        amount: float,
+        parish_id: int
     ) -> Note:
-        """Создать новую записку."""
+        """Создать новую записку в очереди прихода parish_id."""
         note = Note(
             user_id=user_id,
+            parish_id=parish_id,
             type=note_type,
             status=NoteStatus.PENDING,
             amount=amount
@@ -59,6 +140,26 @@ class NoteService:
         
         return note
     
+    @staticmethod
+    async def set_payment_id(
+        session: AsyncSession,
+        note_id: int,
+        payment_id: str
+    ) -> bool:
+        """Сохранить ID платежа (статус записки не меняется до оплаты)."""
+        result = await session.execute(
+            select(Note).where(Note.id == note_id)
+        )
+        note = result.scalar_one_or_none()
+        
+        if not note:
+            return False
+        
+        note.payment_id = payment_id
+        await session.commit()
+        
+        return True
+    
     @staticmethod
     async def update_note_payment(
         session: AsyncSession,
@@ -75,85 +176,220 @@ class NoteService:
             return False
         
         note.payment_id = payment_id
-        note.status = NoteStatus.PAID
+        became_paid = note.status != NoteStatus.PAID
+        if became_paid:
+            note.status = NoteStatus.PAID
+            note.paid_at = datetime.now(timezone.utc)
+            note.slot_id = await SlotService.get_assignable_slot_id(session, note.parish_id)
+            await StatsService.record_paid(session, note.parish_id, note.type, note.amount)
         await session.commit()
         
+        if became_paid:
+            event_bus.publish(NOTE_PAID, {
+                "parish_id": note.parish_id,
+                "note_id": note.id,
+                "type": note.type,
+                "count": 1
+            })
+        
         return True
     
     @staticmethod
     async def get_note_by_payment_id(
         session: AsyncSession,
         payment_id: str
-    ) -> Note | None:
-        """Получить записку по ID платежа."""
-        result = await session.execute(
-            select(Note)
-            .options(selectinload(Note.names), selectinload(Note.user))
-            .where(Note.payment_id == payment_id)
-        )
-        return result.scalar_one_or_none()
+    ) -> NoteInfo | None:
+        """Получить записку по ID платежа (без имен)."""
+        connection = await session.connection()
+        row = (await connection.execute(NOTE_BY_PAYMENT_ID, {"payment_id": payment_id})).first()
+        return NoteInfo(*row) if row else None
     
     @staticmethod
     async def get_queue_count(
         session: AsyncSession,
+        parish_id: int,
         note_type: NoteType | None = None
     ) -> int:
-        """Получить количество записок в очереди."""
-        query = select(func.count(Note.id)).where(Note.status == NoteStatus.PAID)
-        
+        """Получить количество записок в очереди прихода."""
+        connection = await session.connection()
         if note_type:
-            query = query.where(Note.type == note_type)
-        
-        result = await session.execute(query)
+            result = await connection.execute(
+                QUEUE_COUNT_BY_TYPE, {"parish_id": parish_id, "note_type": note_type}
+            )
+        else:
+            result = await connection.execute(QUEUE_COUNT, {"parish_id": parish_id})
         return result.scalar() or 0
     
+    @staticmethod
+    async def get_queue_counts(session: AsyncSession, parish_id: int) -> dict[NoteType, int]:
+        """Количество записок в очереди прихода по типам одним запросом."""
+        connection = await session.connection()
+        result = await connection.execute(QUEUE_COUNTS, {"parish_id": parish_id})
+        counts = dict.fromkeys(NoteType, 0)
+        counts.update(result.all())
+        return counts
+    
     @staticmethod
     async def get_next_note(
         session: AsyncSession,
+        parish_id: int,
         note_type: NoteType
-    ) -> Note | None:
-        """Получить следующую записку из очереди."""
-        result = await session.execute(
-            select(Note)
-            .options(selectinload(Note.names), selectinload(Note.user))
+    ) -> NoteInfo | None:
+        """Получить следующую записку из очереди прихода (с именами)."""
+        connection = await session.connection()
+        result = await connection.execute(
+            NEXT_NOTE_WITH_NAMES, {"parish_id": parish_id, "note_type": note_type}
+        )
+        return note_info_from_rows(result.all())
+    
+    @staticmethod
+    async def get_note_info(session: AsyncSession, note_id: int) -> NoteInfo | None:
+        """Записка с именами для показа читающему (только чтение)."""
+        connection = await session.connection()
+        result = await connection.execute(NOTE_WITH_NAMES_BY_ID, {"note_id": note_id})
+        return note_info_from_rows(result.all())
+    
+    @staticmethod
+    async def get_queue_page(
+        session: AsyncSession,
+        parish_id: int,
+        note_type: NoteType,
+        after_id: int | None = None,
+        limit: int = 10
+    ) -> tuple[list[tuple[int, datetime, int]], int | None]:
+        """
+        Страница очереди прихода с keyset-пагинацией по (created_at, id), без OFFSET.
+        Курсор - id последней записки предыдущей страницы: его created_at
+        берется из БД, поэтому сравнение не зависит от точности времени.
+        Возвращает [(id, created_at, количество имен)] и курсор следующей страницы.
+        """
+        names_count = (
+            select(func.count(NoteName.id))
+            .where(NoteName.note_id == Note.id)
+            .correlate(Note)
+            .scalar_subquery()
+        )
+        query = (
+            select(Note.id, Note.created_at, names_count)
             .where(
-                and_(
-                    Note.status == NoteStatus.PAID,
-                    Note.type == note_type
-                )
+                Note.parish_id == parish_id,
+                Note.status == NoteStatus.PAID,
+                Note.type == note_type
             )
-            .order_by(Note.created_at.asc())
-            .limit(1)
+            .order_by(Note.created_at.asc(), Note.id.asc())
+            .limit(limit + 1)
         )
-        return result.scalar_one_or_none()
+        
+        if after_id is not None:
+            anchor_note = aliased(Note)
+            anchor = (
+                select(anchor_note.created_at)
+                .where(anchor_note.id == after_id)
+                .scalar_subquery()
+            )
+            query = query.where(tuple_(Note.created_at, Note.id) > tuple_(anchor, after_id))
+        
+        rows = [tuple(row) for row in (await session.execute(query)).all()]
+        next_after = rows[limit - 1][0] if len(rows) > limit else None
+        return rows[:limit], next_after
     
     @staticmethod
     async def mark_note_as_read(
         session: AsyncSession,
         note_id: int,
-        reader_role: str
+        reader_role: str,
+        reader_id: int | None = None
     ) -> bool:
-        """Отметить записку как прочитанную."""
+        """
+        Отметить записку как прочитанную. Условный UPDATE: только
+        оплаченная записка переходит в READ, поэтому повторное нажатие
+        или второй читающий не учитывают прочтение дважды.
+        """
         result = await session.execute(
-            select(Note).where(Note.id == note_id)
+            update(Note)
+            .where(Note.id == note_id, Note.status == NoteStatus.PAID)
+            .values(status=NoteStatus.READ, read_at=datetime.now(timezone.utc))
+            .returning(Note.parish_id, Note.type, Note.paid_at, Note.slot_id)
         )
-        note = result.scalar_one_or_none()
-        
-        if not note:
+        row = result.first()
+        if row is None:
             return False
         
-        note.status = NoteStatus.READ
-        note.read_at = datetime.now()
+        parish_id, note_type, paid_at, slot_id = row
+        await StatsService.record_read(
+            session,
+            parish_id,
+            note_type,
+            reader_id,
+            seconds_since(paid_at)
+        )
+        if reader_id:
+            session.add(ReadEvent(reader_id=reader_id, note_id=note_id, type=note_type))
         await session.commit()
+        # Записка прочитана из общей очереди: собранная пачка богослужения
+        # больше не должна ее содержать
+        if slot_id is not None:
+            slot_batch_cache.pop(slot_id, None)
         
+        event_bus.publish(NOTE_READ, {"parish_id": parish_id, "note_id": note_id, "type": note_type})
         operation_logger.log_note_read(
             note_id=note_id,
-            note_type=note.type.value,
+            note_type=note_type.value,
             reader_role=reader_role
         )
         
         return True
     
+    @staticmethod
+    async def mark_slot_as_read(
+        session: AsyncSession,
+        parish_id: int,
+        slot_id: int,
+        reader_role: str,
+        reader_id: int | None = None
+    ) -> list[tuple[int, NoteType]]:
+        """
+        Отметить прочитанными все оплаченные записки богослужения одной
+        транзакцией: UPDATE ... RETURNING, агрегаты и журнал прочтений пачкой.
+        Возвращает [(user_id, тип)] прочитанных записок.
+        """
+        result = await session.execute(
+            update(Note)
+            .where(
+                Note.parish_id == parish_id,
+                Note.slot_id == slot_id,
+                Note.status == NoteStatus.PAID
+            )
+            .values(status=NoteStatus.READ, read_at=datetime.now(timezone.utc))
+            .returning(Note.id, Note.user_id, Note.type, Note.paid_at)
+        )
+        rows = result.all()
+        if not rows:
+            return []
+        
+        totals = defaultdict(lambda: [0, 0.0])
+        for _, _, note_type, paid_at in rows:
+            totals[note_type][0] += 1
+            totals[note_type][1] += max(seconds_since(paid_at) or 0.0, 0.0)
+        for note_type, (count, latency) in totals.items():
+            await StatsService.record_read(session, parish_id, note_type, reader_id, latency, count)
+        
+        if reader_id:
+            await session.execute(
+                insert(ReadEvent),
+                [
+                    {"reader_id": reader_id, "note_id": note_id, "type": note_type}
+                    for note_id, _, note_type, _ in rows
+                ]
+            )
+        await session.commit()
+        
+        for note_type in totals:
+            event_bus.publish(NOTE_READ, {"parish_id": parish_id, "note_id": None, "type": note_type})
+        operation_logger.log_batch_read(slot_id, len(rows), reader_role)
+        
+        return [(user_id, note_type) for _, user_id, note_type, _ in rows]
+    
     @staticmethod
     async def delete_note(
         session: AsyncSession,
@@ -170,6 +406,8 @@ class NoteService:
         
         note.status = NoteStatus.DELETED
         await session.commit()
+        if note.slot_id is not None:
+            slot_batch_cache.pop(note.slot_id, None)
         
         return True
     
@@ -0,0 +1,96 @@
+"""Приходы: у каждого своя очередь, роли, настройки и реквизиты YooKassa."""
+import re
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import Config
+from models import Parish, DEFAULT_PARISH_ID
+
+
+# Код прихода используется в ссылке /start <code>
+PARISH_CODE_PATTERN = re.compile(r"^[a-z0-9_-]{2,64}$")
+
+
+def yookassa_credentials(parish: Parish | None) -> tuple[str, str]:
+    """Реквизиты YooKassa прихода (shop_id, secret_key); пустые - из окружения."""
+    if parish and parish.yookassa_shop_id and parish.yookassa_secret_key:
+        return parish.yookassa_shop_id, parish.yookassa_secret_key
+    return Config.YOOKASSA_SHOP_ID, Config.YOOKASSA_SECRET_KEY
+
+
+class ParishService:
+    """Сервис для работы с приходами."""
+    
+    @staticmethod
+    async def ensure_default(session: AsyncSession) -> Parish:
+        """Создать приход по умолчанию (id = 1), если его еще нет."""
+        parish = await session.get(Parish, DEFAULT_PARISH_ID)
+        if parish:
+            return parish
+        
+        # Явный id не сдвигает последовательность PostgreSQL, поэтому
+        # первый приход создается обычной вставкой в пустую таблицу
+        count = (await session.execute(select(func.count(Parish.id)))).scalar() or 0
+        parish = Parish(code=Config.DEFAULT_PARISH_CODE, name=Config.PARISH_NAME)
+        if count:
+            parish.id = DEFAULT_PARISH_ID
+        session.add(parish)
+        await session.commit()
+        await session.refresh(parish)
+        return parish
+    
+    @staticmethod
+    async def get(session: AsyncSession, parish_id: int) -> Parish | None:
+        """Получить приход по ID."""
+        return await session.get(Parish, parish_id)
+    
+    @staticmethod
+    async def get_by_code(session: AsyncSession, code: str) -> Parish | None:
+        """Получить приход по коду из ссылки /start."""
+        result = await session.execute(
+            select(Parish).where(Parish.code == code.lower())
+        )
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def list_parishes(session: AsyncSession) -> list[Parish]:
+        """Все приходы."""
+        result = await session.execute(select(Parish).order_by(Parish.id.asc()))
+        return list(result.scalars().all())
+    
+    @staticmethod
+    async def add_parish(
+        session: AsyncSession,
+        code: str,
+        name: str,
+        yookassa_shop_id: str | None = None,
+        yookassa_secret_key: str | None = None
+    ) -> Parish:
+        """Добавить приход. ValueError - некорректный или занятый код."""
+        code = code.lower()
+        if not PARISH_CODE_PATTERN.match(code):
+            raise ValueError("Код прихода: 2-64 символа, латиница, цифры, '_' и '-'")
+        if await ParishService.get_by_code(session, code):
+            raise ValueError(f"Приход с кодом {code} уже существует")
+        
+        parish = Parish(
+            code=code,
+            name=name,
+            yookassa_shop_id=yookassa_shop_id,
+            yookassa_secret_key=yookassa_secret_key
+        )
+        session.add(parish)
+        await session.commit()
+        await session.refresh(parish)
+        return parish
+    
+    @staticmethod
+    async def get_credentials(
+        session: AsyncSession,
+        parish_ids
+    ) -> dict[int, tuple[str, str]]:
+        """Реквизиты YooKassa нескольких приходов: {parish_id: (shop_id, secret_key)}."""
+        if not parish_ids:
+            return {}
+        result = await session.execute(select(Parish).where(Parish.id.in_(set(parish_ids))))
+        parishes = {parish.id: parish for parish in result.scalars().all()}
+        return {parish_id: yookassa_credentials(parishes.get(parish_id)) for parish_id in parish_ids}
@@ -1,28 +1,51 @@
 """Сервис для интеграции с Яндекс.Кассой."""
-from yookassa import Configuration, Payment
-from yookassa.domain.notification import WebhookNotificationFactory
-from yookassa.domain.response import PaymentResponse
+import asyncio
+from typing import TYPE_CHECKING
+import aiohttp
 from config import Config
+from models import Parish, DEFAULT_PARISH_ID
 from services.logging_service import operation_logger
+from services.parish_service import yookassa_credentials
+from services.settings_service import get_settings
+
+if TYPE_CHECKING:
+    from yookassa.domain.response import PaymentResponse
+
+
+def _yookassa():
+    """
+    SDK YooKassa импортируется при первом обращении: импорт занимает
+    заметную часть запуска, а фоновые проверки работают без SDK.
+    """
+    import yookassa
+    return yookassa
 
 
 class PaymentService:
-    """Сервис для работы с платежами через Яндекс.Кассу."""
+    """
+    Сервис для работы с платежами через Яндекс.Кассу. Платеж создается
+    на реквизиты прихода parish (без прихода - из окружения).
+    """
     
-    def __init__(self):
+    def __init__(self, parish: Parish | None = None):
         """Инициализация сервиса платежей."""
-        Configuration.account_id = Config.YOOKASSA_SHOP_ID
-        Configuration.secret_key = Config.YOOKASSA_SECRET_KEY
+        self.parish_id = parish.id if parish else DEFAULT_PARISH_ID
+        self.account_id, self.secret_key = yookassa_credentials(parish)
     
-    def create_payment(
+    def _create(
         self,
         amount: float,
-        note_id: int,
-        user_id: int,
+        metadata: dict,
+        idempotence_key: str,
         return_url: str
-    ) -> PaymentResponse:
+    ) -> "PaymentResponse":
         """Создать платеж в Яндекс.Кассе."""
-        payment = Payment.create({
+        yookassa = _yookassa()
+        # Конфигурация SDK глобальная: реквизиты выставляются перед каждым
+        # (синхронным) вызовом, чтобы сервисы разных приходов не смешивались
+        yookassa.Configuration.account_id = self.account_id
+        yookassa.Configuration.secret_key = self.secret_key
+        return yookassa.Payment.create({
             "amount": {
                 "value": f"{amount:.2f}",
                 "currency": "RUB"
@@ -32,12 +55,24 @@ class PaymentService:
                 "return_url": return_url
             },
             "capture": True,
-            "description": Config.PAYMENT_DESCRIPTION,
-            "metadata": {
-                "note_id": str(note_id),
-                "user_id": str(user_id)
-            }
-        }, str(note_id))
+            "description": get_settings(self.parish_id).PAYMENT_DESCRIPTION,
+            "metadata": metadata
+        }, idempotence_key)
+    
+    def create_payment(
+        self,
+        amount: float,
+        note_id: int,
+        user_id: int,
+        return_url: str
+    ) -> "PaymentResponse":
+        """Создать платеж за записку."""
+        payment = self._create(
+            amount,
+            {"note_id": str(note_id), "user_id": str(user_id)},
+            str(note_id),
+            return_url
+        )
         
         operation_logger.log_payment_created(
             note_id=note_id,
@@ -47,8 +82,33 @@ class PaymentService:
         
         return payment
     
+    def create_subscription_payment(
+        self,
+        amount: float,
+        subscription_id: int,
+        user_id: int,
+        return_url: str
+    ) -> "PaymentResponse":
+        """Создать платеж за поминовение на период."""
+        payment = self._create(
+            amount,
+            {"subscription_id": str(subscription_id), "user_id": str(user_id)},
+            f"subscription-{subscription_id}",
+            return_url
+        )
+        
+        operation_logger.log_subscription_payment_created(
+            subscription_id=subscription_id,
+            payment_id=payment.id,
+            amount=amount
+        )
+        
+        return payment
+    
     def process_webhook(self, request_body: dict) -> dict | None:
         """Обработать webhook от Яндекс.Кассы."""
+        from yookassa.domain.notification import WebhookNotificationFactory
+        
         try:
             notification = WebhookNotificationFactory().create(request_body)
             payment_object = notification.object
@@ -65,12 +125,14 @@ class PaymentService:
             
             metadata = payment_object.metadata or {}
             note_id = metadata.get("note_id")
+            subscription_id = metadata.get("subscription_id")
             
             return {
                 "payment_id": payment_id,
                 "status": status,
                 "amount": amount,
-                "note_id": note_id
+                "note_id": note_id,
+                "subscription_id": subscription_id
             }
         except Exception as e:
             operation_logger.log_error("webhook_processing", str(e))
@@ -78,8 +140,11 @@ class PaymentService:
     
     def get_payment_status(self, payment_id: str) -> dict | None:
         """Получить статус платежа."""
+        yookassa = _yookassa()
+        yookassa.Configuration.account_id = self.account_id
+        yookassa.Configuration.secret_key = self.secret_key
         try:
-            payment = Payment.find_one(payment_id)
+            payment = yookassa.Payment.find_one(payment_id)
             return {
                 "id": payment.id,
                 "status": payment.status,
@@ -90,3 +155,72 @@ class PaymentService:
             operation_logger.log_error("get_payment_status", str(e))
             return None
 
+
+class YooKassaClient:
+    """
+    Асинхронный клиент API YooKassa для фоновых проверок платежей.
+    Использует одну HTTP-сессию и ограничивает число параллельных запросов.
+    """
+    
+    API_URL = "https://api.yookassa.ru/v3"
+    
+    def __init__(self, concurrency: int = Config.RECONCILE_CONCURRENCY):
+        """Инициализация клиента (сессия создается при первом запросе)."""
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая HTTP-сессия (реквизиты передаются в каждом запросе)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+        return self._session
+    
+    async def get_payment_status(
+        self,
+        payment_id: str,
+        credentials: tuple[str, str] | None = None
+    ) -> dict | None:
+        """
+        Получить статус платежа (формат как у PaymentService.get_payment_status).
+        credentials - (shop_id, secret_key) прихода, по умолчанию из окружения.
+        """
+        auth = aiohttp.BasicAuth(*(credentials or yookassa_credentials(None)))
+        async with self._semaphore:
+            try:
+                async with self._get_session().get(
+                    f"{self.API_URL}/payments/{payment_id}",
+                    auth=auth
+                ) as response:
+                    response.raise_for_status()
+                    payment = await response.json()
+                return {
+                    "id": payment["id"],
+                    "status": payment["status"],
+                    "amount": float(payment["amount"]["value"]),
+                    "paid": payment.get("paid", False)
+                }
+            except Exception as e:
+                operation_logger.log_error("get_payment_status_async", str(e))
+                return None
+    
+    async def get_payment_statuses(
+        self,
+        payment_ids: list[str],
+        credentials: tuple[str, str] | None = None
+    ) -> dict[str, dict | None]:
+        """Статусы нескольких платежей одного прихода параллельно: {payment_id: статус}."""
+        statuses = await asyncio.gather(
+            *(self.get_payment_status(payment_id, credentials) for payment_id in payment_ids)
+        )
+        return dict(zip(payment_ids, statuses))
+    
+    async def close(self):
+        """Закрыть HTTP-сессию."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# Глобальный экземпляр клиента
+yookassa_client = YooKassaClient()
@@ -0,0 +1,105 @@
+"""Версия пачки записок богослужения для печати (HTML) по подписанной ссылке."""
+import hashlib
+import hmac
+import time
+from html import escape
+from typing import AsyncIterator
+from sqlalchemy import select
+from config import Config
+from database import db
+from models import Note, NoteName, NoteStatus, NoteType, ServiceSlot
+from services.slot_service import to_local
+
+
+# Имен на одну выборку из БД
+FETCH_ROWS = 1000
+
+# Размер чанка ответа: имена копятся в буфере и отправляются крупными блоками
+CHUNK_SIZE = 64 * 1024
+
+PRINT_CSS = """
+@page { size: A4; margin: 15mm; }
+body { font-family: "Times New Roman", serif; font-size: 14pt; line-height: 1.35; }
+h1 { font-size: 18pt; text-align: center; margin: 0 0 8mm; }
+h2 { font-size: 16pt; margin: 6mm 0 3mm; border-bottom: 1px solid #000; }
+ol { columns: 2; column-gap: 10mm; margin: 0; padding-left: 8mm; }
+li { break-inside: avoid; }
+section + section { break-before: page; }
+@media screen { body { max-width: 210mm; margin: 10mm auto; } }
+"""
+
+SECTION_TITLES = {
+    NoteType.FOR_HEALTH: "За здравие",
+    NoteType.FOR_REPOSE: "Об упокоении",
+}
+
+
+def _signature(slot_id: int, expires: int) -> str:
+    """HMAC-подпись ссылки на печать."""
+    secret = (Config.PRINT_LINK_SECRET or Config.TELEGRAM_BOT_TOKEN).encode()
+    return hmac.new(secret, f"slot:{slot_id}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def build_print_url(slot_id: int) -> str:
+    """Подписанная ссылка на версию для печати, действует PRINT_LINK_TTL_MINUTES."""
+    expires = int(time.time() + Config.PRINT_LINK_TTL_MINUTES * 60)
+    return (
+        f"{Config.TELEGRAM_WEBHOOK_URL}/print/slot/{slot_id}"
+        f"?exp={expires}&sig={_signature(slot_id, expires)}"
+    )
+
+
+def verify_print_signature(slot_id: int, expires: str, signature: str) -> bool:
+    """Проверить подпись и срок действия ссылки."""
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(slot_id, int(expires)))
+
+
+class PrintService:
+    """Потоковая отрисовка пачки: память не зависит от количества имен."""
+    
+    @staticmethod
+    async def iter_slot_html(slot: ServiceSlot) -> AsyncIterator[bytes]:
+        """
+        HTML пачки богослужения, сгруппированный по типу списка, чанками.
+        Имена читаются пачками в коротких сессиях, поэтому отдача медленному
+        клиенту не держит соединение с БД.
+        """
+        title = escape(f"{slot.service_type}, {to_local(slot.starts_at):%d.%m.%Y %H:%M}")
+        buffer = [
+            "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">",
+            f"<title>{title}</title><style>{PRINT_CSS}</style></head><body>",
+            f"<h1>{title}</h1>",
+        ]
+        size = 0
+        current_type = None
+        
+        rows = db.iter_batches(
+            select(NoteName.list_type, NoteName.name)
+            .join(Note, Note.id == NoteName.note_id)
+            .where(Note.slot_id == slot.id, Note.status == NoteStatus.PAID),
+            (NoteName.list_type, Note.id, NoteName.id),
+            FETCH_ROWS
+        )
+        async for list_type, name in rows:
+            if list_type != current_type:
+                if current_type is not None:
+                    buffer.append("</ol></section>")
+                buffer.append(f"<section><h2>{SECTION_TITLES[list_type]}</h2><ol>")
+                current_type = list_type
+            
+            item = f"<li>{escape(name)}</li>"
+            buffer.append(item)
+            size += len(item)
+            if size >= CHUNK_SIZE:
+                yield "".join(buffer).encode()
+                buffer.clear()
+                size = 0
+        
+        if current_type is None:
+            buffer.append("<p>Записок нет.</p>")
+        else:
+            buffer.append("</ol></section>")
+        buffer.append("</body></html>")
+        yield "".join(buffer).encode()
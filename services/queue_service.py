@@ -0,0 +1,52 @@
+"""Кэш страниц просмотра очереди для читающих."""
+import time
+from typing import Any
+from config import Config
+from services.events_service import event_bus, NOTE_PAID, NOTE_READ
+
+
+class QueuePageCache:
+    """
+    Отрисованные страницы очереди по ключу (приход, тип записки, курсор).
+    Живут ttl секунд и сбрасываются при оплате или прочтении любой
+    записки прихода, поэтому устаревшая страница не показывается.
+    """
+    
+    MAX_ENTRIES = 1000
+    
+    def __init__(self, ttl: float = Config.QUEUE_PAGE_CACHE_SECONDS):
+        """Инициализация кэша."""
+        self.ttl = ttl
+        self._pages: dict[tuple, tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: tuple) -> Any | None:
+        """Получить страницу из кэша."""
+        entry = self._pages.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, key: tuple, page: Any):
+        """Сохранить страницу."""
+        if len(self._pages) >= self.MAX_ENTRIES:
+            self._pages.clear()
+        self._pages[key] = (time.monotonic() + self.ttl, page)
+    
+    def invalidate(self, payload: dict | None = None):
+        """Сбросить страницы прихода из события (без прихода - все)."""
+        parish_id = (payload or {}).get("parish_id")
+        if parish_id is None:
+            self._pages.clear()
+            return
+        for key in [key for key in self._pages if key[0] == parish_id]:
+            del self._pages[key]
+
+
+# Глобальный экземпляр кэша
+queue_page_cache = QueuePageCache()
+event_bus.subscribe(NOTE_PAID, queue_page_cache.invalidate)
+event_bus.subscribe(NOTE_READ, queue_page_cache.invalidate)
@@ -0,0 +1,182 @@
+"""Сверка зависших PENDING-записок и поминовений с YooKassa."""
+import logging
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+from typing import AsyncIterator
+from sqlalchemy import select, update, and_
+from config import Config
+from database import db
+from models import Note, NoteStatus, Subscription, SubscriptionStatus
+from services.payment_service import yookassa_client
+from services.parish_service import ParishService
+from services.stats_service import StatsService
+from services.events_service import event_bus, NOTE_PAID
+from services.slot_service import SlotService
+from services.subscription_service import SubscriptionService
+from services.logging_service import operation_logger
+
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_payment_statuses(model, conditions: list, batch_size: int) -> AsyncIterator[tuple[list, dict]]:
+    """
+    Пачки строк (id, payment_id, parish_id) записок или поминовений
+    (model), подходящих под conditions, и статусы их платежей:
+    {payment_id: статус YooKassa или None}. Каждая пачка читается
+    короткой транзакцией (keyset по id), запросы к YooKassa выполняются
+    вне ее, с реквизитами прихода строки.
+    """
+    last_id = 0
+    
+    while True:
+        async with db.get_session() as session:
+            result = await session.execute(
+                select(model.id, model.payment_id, model.parish_id)
+                .where(and_(*conditions, model.id > last_id))
+                .order_by(model.id.asc())
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            
+            by_parish = defaultdict(list)
+            for _, payment_id, parish_id in rows:
+                if payment_id:
+                    by_parish[parish_id].append(payment_id)
+            credentials = await ParishService.get_credentials(session, by_parish)
+        
+        statuses = {}
+        for parish_id, payment_ids in by_parish.items():
+            statuses.update(
+                await yookassa_client.get_payment_statuses(payment_ids, credentials[parish_id])
+            )
+        
+        yield rows, statuses
+        
+        if len(rows) < batch_size:
+            return
+
+
+def _succeeded(status: dict | None) -> bool:
+    """Платеж завершен успешно."""
+    return status is not None and status["status"] == "succeeded"
+
+
+class ReconciliationService:
+    """Восстановление оплат, webhook по которым был потерян."""
+    
+    @staticmethod
+    def _window(model, pending_status, min_age_minutes: float) -> list:
+        """
+        Условия сверки: неоплаченные строки с платежом старше min_age_minutes.
+        Более старые, чем PENDING_NOTE_TTL_HOURS, обрабатывает CleanupService.
+        """
+        now = datetime.now(timezone.utc)
+        return [
+            model.status == pending_status,
+            model.payment_id.is_not(None),
+            model.created_at < now - timedelta(minutes=min_age_minutes),
+            model.created_at >= now - timedelta(hours=Config.PENDING_NOTE_TTL_HOURS),
+        ]
+    
+    @staticmethod
+    async def reconcile_pending_payments(
+        min_age_minutes: float = Config.RECONCILE_AFTER_MINUTES,
+        batch_size: int = Config.RECONCILE_BATCH_SIZE
+    ) -> int:
+        """
+        Проверить статусы платежей PENDING-записок старше min_age_minutes
+        и одним UPDATE на приход перевести оплаченные в очередь.
+        Возвращает количество восстановленных записок.
+        """
+        recovered = 0
+        conditions = ReconciliationService._window(Note, NoteStatus.PENDING, min_age_minutes)
+        
+        async for rows, statuses in iter_payment_statuses(Note, conditions, batch_size):
+            paid = defaultdict(list)
+            for note_id, payment_id, parish_id in rows:
+                if _succeeded(statuses[payment_id]):
+                    paid[parish_id].append(note_id)
+            if paid:
+                recovered += await ReconciliationService._mark_paid(paid)
+        
+        if recovered:
+            operation_logger.log_payments_reconciled(recovered)
+        return recovered
+    
+    @staticmethod
+    async def _mark_paid(paid: dict[int, list[int]]) -> int:
+        """
+        Перевести оплаченные записки {приход: [id]} в очередь, если они
+        все еще PENDING (webhook мог успеть раньше). Возвращает их количество.
+        """
+        async with db.get_session() as session:
+            totals = defaultdict(lambda: [0, 0.0])
+            for parish_id, paid_ids in paid.items():
+                result = await session.execute(
+                    update(Note)
+                    .where(
+                        and_(
+                            Note.id.in_(paid_ids),
+                            Note.status == NoteStatus.PENDING
+                        )
+                    )
+                    .values(
+                        status=NoteStatus.PAID,
+                        paid_at=datetime.now(timezone.utc),
+                        slot_id=await SlotService.get_assignable_slot_id(session, parish_id)
+                    )
+                    .returning(Note.type, Note.amount)
+                )
+                for note_type, amount in result.all():
+                    totals[parish_id, note_type][0] += 1
+                    totals[parish_id, note_type][1] += amount
+            
+            if not totals:
+                return 0
+            for (parish_id, note_type), (count, amount) in totals.items():
+                await StatsService.record_paid(session, parish_id, note_type, amount, count)
+            await session.commit()
+        
+        for (parish_id, note_type), (count, _) in totals.items():
+            event_bus.publish(NOTE_PAID, {
+                "parish_id": parish_id,
+                "note_id": None,
+                "type": note_type,
+                "count": count
+            })
+        return sum(count for count, _ in totals.values())
+    
+    @staticmethod
+    async def reconcile_pending_subscriptions(
+        min_age_minutes: float = Config.RECONCILE_AFTER_MINUTES,
+        batch_size: int = Config.RECONCILE_BATCH_SIZE
+    ) -> int:
+        """
+        То же для PENDING-поминовений: оплаченные активируются так же,
+        как по webhook. Возвращает количество активированных поминовений.
+        """
+        recovered = 0
+        conditions = ReconciliationService._window(
+            Subscription, SubscriptionStatus.PENDING, min_age_minutes
+        )
+        
+        async for rows, statuses in iter_payment_statuses(Subscription, conditions, batch_size):
+            paid = [
+                (subscription_id, payment_id) for subscription_id, payment_id, _ in rows
+                if _succeeded(statuses[payment_id])
+            ]
+            if not paid:
+                continue
+            async with db.get_session() as session:
+                for subscription_id, payment_id in paid:
+                    # activate пропускает уже активированные по webhook
+                    if await SubscriptionService.activate(session, subscription_id, payment_id):
+                        recovered += 1
+        
+        if recovered:
+            operation_logger.log_subscriptions_reconciled(recovered)
+        return recovered
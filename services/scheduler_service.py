@@ -0,0 +1,112 @@
+"""Периодические фоновые задачи внутри приложения."""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Планировщик периодических задач на asyncio."""
+    
+    def __init__(self):
+        """Инициализация планировщика."""
+        self._jobs: dict[str, tuple[Callable[[], Awaitable], float, float]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._busy: set[str] = set()
+        self._stopping = False
+    
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        first_delay: float = 0.0
+    ):
+        """Зарегистрировать задачу, выполняемую каждые interval секунд."""
+        self._jobs[name] = (func, interval, first_delay)
+    
+    def start(self):
+        """Запустить все зарегистрированные задачи."""
+        for name, (func, interval, first_delay) in self._jobs.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(
+                    self._run(name, func, interval, first_delay),
+                    name=f"job:{name}"
+                )
+        logger.info(f"Планировщик запущен, задач: {len(self._tasks)}")
+    
+    async def stop(self, timeout: float = 0.0) -> tuple[int, int]:
+        """
+        Остановить все задачи. Ожидающие следующего запуска отменяются сразу,
+        выполняющиеся получают timeout секунд на завершение. Возвращает
+        (завершились сами, отменены во время выполнения).
+        """
+        self._stopping = True
+        busy = {self._tasks[name] for name in self._busy if name in self._tasks}
+        for task in self._tasks.values():
+            if task not in busy:
+                task.cancel()
+        
+        finished, abandoned = 0, 0
+        if busy and timeout > 0:
+            done, _ = await asyncio.wait(busy, timeout=timeout)
+            finished = len(done)
+        for task in busy:
+            if not task.done():
+                task.cancel()
+                abandoned += 1
+        
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        self._busy.clear()
+        self._stopping = False
+        return finished, abandoned
+    
+    @property
+    def running(self) -> bool:
+        """Запущен ли планировщик."""
+        return bool(self._tasks)
+    
+    def status(self) -> dict[str, str]:
+        """
+        Состояние задач: running, stopped (отменена) или failed - цикл
+        задачи завершился исключением и задача больше не выполняется.
+        """
+        states = {}
+        for name, task in self._tasks.items():
+            if not task.done():
+                states[name] = "running"
+            elif task.cancelled():
+                states[name] = "stopped"
+            else:
+                states[name] = "failed"
+        return states
+    
+    async def _run(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        first_delay: float
+    ):
+        """Цикл выполнения одной задачи."""
+        await asyncio.sleep(first_delay)
+        while True:
+            self._busy.add(name)
+            try:
+                await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в фоновой задаче {name}: {e}")
+            finally:
+                self._busy.discard(name)
+            if self._stopping:
+                return
+            await asyncio.sleep(interval)
+
+
+# Глобальный экземпляр планировщика
+scheduler = Scheduler()
@@ -0,0 +1,188 @@
+"""Настройки приходов из таблицы settings с кэшем в памяти процесса."""
+import logging
+from collections import defaultdict
+from sqlalchemy import select, cast, Integer, String
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import Config
+from models import Setting, DEFAULT_PARISH_ID
+
+
+logger = logging.getLogger(__name__)
+
+# Ключ строки с версией настроек (увеличивается при каждом изменении)
+VERSION_KEY = "settings_version"
+
+
+def _parse_amount(raw: str) -> float:
+    """Разбор минимальной суммы пожертвования."""
+    try:
+        value = float(raw.replace(",", "."))
+    except ValueError:
+        raise ValueError("Введите число, например 100 или 150.50")
+    if not 1 <= value <= 1000000:
+        raise ValueError("Сумма должна быть от 1 до 1000000")
+    return value
+
+
+def _parse_names_limit(raw: str) -> int:
+    """Разбор максимального количества имен."""
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError("Введите целое число")
+    if not 1 <= value <= 1000:
+        raise ValueError("Количество имен должно быть от 1 до 1000")
+    return value
+
+
+def _parse_description(raw: str) -> str:
+    """Разбор описания платежа (ограничение YooKassa - 128 символов)."""
+    value = raw.strip()
+    if not value or len(value) > 128:
+        raise ValueError("Описание должно быть от 1 до 128 символов")
+    return value
+
+
+class Settings:
+    """
+    Снимок настроек. Чтение - обычный доступ к атрибуту, без запросов
+    к БД; снимок заменяется целиком при изменении версии в таблице.
+    """
+    
+    # Ключ в таблице -> (атрибут, функция разбора)
+    EDITABLE = {
+        "min_donation_amount": ("MIN_DONATION_AMOUNT", _parse_amount),
+        "max_names_per_note": ("MAX_NAMES_PER_NOTE", _parse_names_limit),
+        "payment_description": ("PAYMENT_DESCRIPTION", _parse_description),
+    }
+    
+    def __init__(self):
+        """Значения по умолчанию берутся из Config (переменных окружения)."""
+        self.MIN_DONATION_AMOUNT: float = Config.MIN_DONATION_AMOUNT
+        self.MAX_NAMES_PER_NOTE: int = Config.MAX_NAMES_PER_NOTE
+        self.PAYMENT_DESCRIPTION: str = Config.PAYMENT_DESCRIPTION
+        self.version = 0
+    
+    @staticmethod
+    def _defaults() -> dict:
+        """Значения из окружения для всех редактируемых настроек."""
+        return {attribute: getattr(Config, attribute) for attribute, _ in Settings.EDITABLE.values()}
+    
+    def _apply(self, rows: dict[str, str], version: int):
+        """
+        Собрать снимок заново: значения из окружения, поверх - строки
+        таблицы. Удаленная или некорректная строка возвращает значение
+        из окружения, а не оставляет прежнее.
+        """
+        values = self._defaults()
+        for key, (attribute, parse) in self.EDITABLE.items():
+            if key in rows:
+                try:
+                    values[attribute] = parse(rows[key])
+                except ValueError as e:
+                    logger.error(f"Некорректное значение настройки {key}: {e}")
+        
+        for attribute, value in values.items():
+            setattr(self, attribute, value)
+        self.version = version
+
+
+# Снимок настроек прихода по умолчанию
+settings = Settings()
+
+# Снимки настроек по приходам
+_snapshots: dict[int, Settings] = {DEFAULT_PARISH_ID: settings}
+
+
+def get_settings(parish_id: int = DEFAULT_PARISH_ID) -> Settings:
+    """Снимок настроек прихода (значения из окружения, если строк в БД нет)."""
+    snapshot = _snapshots.get(parish_id)
+    if snapshot is None:
+        snapshot = _snapshots[parish_id] = Settings()
+    return snapshot
+
+
+class SettingsService:
+    """Загрузка, обновление и изменение настроек."""
+    
+    @staticmethod
+    async def load(session: AsyncSession):
+        """Загрузить настройки всех приходов из БД в снимки."""
+        result = await session.execute(select(Setting.parish_id, Setting.key, Setting.value))
+        rows = defaultdict(dict)
+        for parish_id, key, value in result.all():
+            rows[parish_id][key] = value
+        
+        # Приходы, строки которых удалены, возвращаются к значениям из окружения
+        for parish_id in rows.keys() | _snapshots.keys():
+            parish_rows = rows.get(parish_id, {})
+            get_settings(parish_id)._apply(parish_rows, int(parish_rows.get(VERSION_KEY, 0)))
+        logger.info(f"Настройки загружены, приходов с настройками: {len(rows)}")
+    
+    @staticmethod
+    async def refresh_if_changed():
+        """Перечитать настройки, если их версия в БД изменилась (другим процессом)."""
+        from database import db
+        
+        async with db.get_session() as session:
+            result = await session.execute(
+                select(Setting.parish_id, Setting.value).where(Setting.key == VERSION_KEY)
+            )
+            versions = {parish_id: int(version) for parish_id, version in result.all()}
+            # Снимок без строки версии в БД (строки удалены) сравнивается с 0
+            changed = any(
+                versions.get(parish_id, 0) != get_settings(parish_id).version
+                for parish_id in versions.keys() | _snapshots.keys()
+            )
+            if changed:
+                await SettingsService.load(session)
+    
+    @staticmethod
+    async def _upsert(
+        session: AsyncSession,
+        parish_id: int,
+        key: str,
+        value: str,
+        increment=None
+    ):
+        """
+        Upsert строки настройки: value для новой строки, для существующей -
+        value или выражение increment от текущего значения.
+        """
+        dialect = session.bind.dialect.name
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        
+        statement = insert(Setting).values(parish_id=parish_id, key=key, value=value)
+        statement = statement.on_conflict_do_update(
+            index_elements=["parish_id", "key"],
+            set_={"value": statement.excluded.value if increment is None else increment}
+        )
+        await session.execute(statement)
+    
+    @staticmethod
+    async def set_value(
+        session: AsyncSession,
+        key: str,
+        raw: str,
+        parish_id: int = DEFAULT_PARISH_ID
+    ) -> str:
+        """
+        Изменить настройку прихода и увеличить ее версию.
+        Возвращает итоговое значение; ошибки ввода - ValueError.
+        """
+        if key not in Settings.EDITABLE:
+            raise ValueError(f"Неизвестная настройка: {key}")
+        attribute, parse = Settings.EDITABLE[key]
+        value = str(parse(raw))
+        
+        await SettingsService._upsert(session, parish_id, key, value)
+        # Версия увеличивается в одном выражении: одновременные изменения
+        # из разных процессов не теряют инвалидацию
+        await SettingsService._upsert(
+            session, parish_id, VERSION_KEY, "1",
+            increment=cast(cast(Setting.value, Integer) + 1, String)
+        )
+        await session.commit()
+        await SettingsService.load(session)
+        return value
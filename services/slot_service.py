@@ -0,0 +1,232 @@
+"""Богослужения (слоты) и заранее собранные пачки записок для чтения."""
+import logging
+from datetime import datetime, timedelta
+from html import escape
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import Config
+from database import db
+from models import Note, NoteName, NoteStatus, NoteType, ServiceSlot
+
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram - 4096 символов; запас на HTML-разметку заголовков
+MAX_PAGE_LENGTH = 3500
+
+# Длина названия службы (колонка service_slots.service_type)
+SERVICE_TYPE_MAX_LENGTH = 100
+
+
+def local_now() -> datetime:
+    """Текущее время с часовым поясом сервера."""
+    return datetime.now().astimezone()
+
+
+def to_local(moment: datetime) -> datetime:
+    """Время из БД (aware UTC) в часовом поясе сервера."""
+    return moment.astimezone()
+
+
+class SlotBatch:
+    """Собранная пачка записок богослужения, готовая к показу."""
+    
+    def __init__(self, slot: ServiceSlot, note_ids: list[int], pages: list[str], names_count: int):
+        """Инициализация пачки."""
+        self.slot_id = slot.id
+        self.parish_id = slot.parish_id
+        self.starts_at = slot.starts_at
+        self.service_type = slot.service_type
+        self.note_ids = note_ids
+        self.pages = pages
+        self.names_count = names_count
+        self.built_at = local_now()
+
+
+class SlotService:
+    """
+    Записка при оплате закрепляется за ближайшим богослужением, до начала
+    которого больше SLOT_CUTOFF_MINUTES. В это окно состав пачки уже не
+    меняется, поэтому она собирается заранее и читающие открывают готовый текст.
+    """
+    
+    @staticmethod
+    async def add_slot(
+        session: AsyncSession,
+        parish_id: int,
+        starts_at: datetime,
+        service_type: str
+    ) -> ServiceSlot:
+        """Добавить богослужение в расписание прихода."""
+        slot = ServiceSlot(parish_id=parish_id, starts_at=starts_at, service_type=service_type)
+        session.add(slot)
+        await session.commit()
+        await session.refresh(slot)
+        return slot
+    
+    @staticmethod
+    async def delete_slot(session: AsyncSession, parish_id: int, slot_id: int) -> bool:
+        """
+        Удалить богослужение прихода. Закрепленные записки возвращаются
+        в общую очередь (slot_id = NULL).
+        """
+        slot = await session.get(ServiceSlot, slot_id)
+        if not slot or slot.parish_id != parish_id:
+            return False
+        
+        await session.execute(
+            update(Note).where(Note.slot_id == slot_id).values(slot_id=None)
+        )
+        result = await session.execute(delete(ServiceSlot).where(ServiceSlot.id == slot_id))
+        await session.commit()
+        slot_batch_cache.pop(slot_id, None)
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def get_slot(session: AsyncSession, slot_id: int) -> ServiceSlot | None:
+        """Получить богослужение по ID."""
+        return await session.get(ServiceSlot, slot_id)
+    
+    @staticmethod
+    async def get_upcoming_slots(
+        session: AsyncSession,
+        parish_id: int,
+        limit: int = 20
+    ) -> list[tuple[ServiceSlot, int]]:
+        """Ближайшие богослужения прихода с количеством закрепленных непрочитанных записок."""
+        notes_count = (
+            select(func.count(Note.id))
+            .where(Note.slot_id == ServiceSlot.id, Note.status == NoteStatus.PAID)
+            .correlate(ServiceSlot)
+            .scalar_subquery()
+        )
+        since = local_now() - timedelta(hours=Config.SLOT_BATCH_KEEP_HOURS)
+        result = await session.execute(
+            select(ServiceSlot, notes_count)
+            .where(ServiceSlot.parish_id == parish_id, ServiceSlot.starts_at >= since)
+            .order_by(ServiceSlot.starts_at.asc())
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+    
+    @staticmethod
+    def assignable_slot_query(parish_id):
+        """
+        Запрос ID богослужения для только что оплаченной записки. parish_id -
+        значение или колонка (для коррелированного подзапроса в INSERT ... SELECT).
+        """
+        return (
+            select(ServiceSlot.id)
+            .where(
+                ServiceSlot.parish_id == parish_id,
+                ServiceSlot.starts_at > local_now() + timedelta(minutes=Config.SLOT_CUTOFF_MINUTES)
+            )
+            .order_by(ServiceSlot.starts_at.asc())
+            .limit(1)
+        )
+    
+    @staticmethod
+    async def get_assignable_slot_id(session: AsyncSession, parish_id: int) -> int | None:
+        """ID богослужения прихода для только что оплаченной записки (или None)."""
+        result = await session.execute(SlotService.assignable_slot_query(parish_id))
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def get_current_slot(session: AsyncSession, parish_id: int) -> ServiceSlot | None:
+        """Идущее или ближайшее богослужение прихода, пачка которого уже закрыта."""
+        now = local_now()
+        result = await session.execute(
+            select(ServiceSlot)
+            .where(
+                ServiceSlot.parish_id == parish_id,
+                ServiceSlot.starts_at >= now - timedelta(hours=Config.SLOT_BATCH_KEEP_HOURS),
+                ServiceSlot.starts_at <= now + timedelta(minutes=Config.SLOT_CUTOFF_MINUTES)
+            )
+            .order_by(ServiceSlot.starts_at.asc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def build_batch(session: AsyncSession, slot: ServiceSlot) -> SlotBatch:
+        """Собрать пачку одним запросом и разбить текст на страницы."""
+        result = await session.execute(
+            select(Note.id, NoteName.list_type, NoteName.name)
+            .join(NoteName, NoteName.note_id == Note.id)
+            .where(Note.slot_id == slot.id, Note.status == NoteStatus.PAID)
+            .order_by(Note.created_at.asc(), Note.id.asc(), NoteName.id.asc())
+        )
+        
+        note_ids = []
+        names = {NoteType.FOR_HEALTH: [], NoteType.FOR_REPOSE: []}
+        for note_id, list_type, name in result.all():
+            if not note_ids or note_ids[-1] != note_id:
+                note_ids.append(note_id)
+            names[list_type].append(name)
+        
+        header = f"⛪ <b>{escape(slot.service_type)}, {to_local(slot.starts_at):%d.%m.%Y %H:%M}</b>\n\n"
+        pages = []
+        page = header
+        sections = (
+            (NoteType.FOR_HEALTH, "🙏 <b>За здравие</b>"),
+            (NoteType.FOR_REPOSE, "🕯️ <b>Об упокоении</b>"),
+        )
+        for note_type, title in sections:
+            if not names[note_type]:
+                continue
+            page += f"{title}\n"
+            for i, name in enumerate(names[note_type], 1):
+                line = f"{i}. {name}\n"
+                if len(page) + len(line) > MAX_PAGE_LENGTH:
+                    pages.append(page)
+                    page = f"{title} (продолжение)\n"
+                page += line
+            page += "\n"
+        pages.append(page)
+        
+        return SlotBatch(slot, note_ids, pages, sum(len(group) for group in names.values()))
+    
+    @staticmethod
+    async def get_batch(session: AsyncSession, slot: ServiceSlot) -> SlotBatch:
+        """Пачка из кэша; при промахе собирается и кэшируется."""
+        batch = slot_batch_cache.get(slot.id)
+        if batch is None:
+            batch = await SlotService.build_batch(session, slot)
+            slot_batch_cache[slot.id] = batch
+        return batch
+    
+    @staticmethod
+    async def prebuild_batches() -> int:
+        """
+        Задача планировщика: собрать пачки богослужений, состав которых
+        уже закрыт (во всех приходах), и удалить из кэша прошедшие.
+        Возвращает число собранных.
+        """
+        now = local_now()
+        async with db.get_session() as session:
+            result = await session.execute(
+                select(ServiceSlot).where(
+                    ServiceSlot.starts_at >= now - timedelta(hours=Config.SLOT_BATCH_KEEP_HOURS),
+                    ServiceSlot.starts_at <= now + timedelta(minutes=Config.SLOT_CUTOFF_MINUTES)
+                )
+            )
+            slots = list(result.scalars().all())
+            
+            built = 0
+            for slot in slots:
+                if slot.id not in slot_batch_cache:
+                    slot_batch_cache[slot.id] = await SlotService.build_batch(session, slot)
+                    built += 1
+        
+        active = {slot.id for slot in slots}
+        for slot_id in list(slot_batch_cache):
+            if slot_id not in active:
+                del slot_batch_cache[slot_id]
+        
+        if built:
+            logger.info(f"Собрано пачек записок к богослужениям: {built}")
+        return built
+
+
+# Собранные пачки по ID богослужения
+slot_batch_cache: dict[int, SlotBatch] = {}
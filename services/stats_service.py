@@ -0,0 +1,142 @@
+"""Дневные агрегаты: пожертвования, прочтения, время до прочтения."""
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import DailyStat, NoteType, User
+
+
+# Агрегаты оплат хранятся без читающего
+NO_READER = 0
+
+
+def seconds_since(moment: datetime | None) -> float | None:
+    """Секунд прошло с moment (aware, как все моменты из UTCDateTime)."""
+    if moment is None:
+        return None
+    return (datetime.now(timezone.utc) - moment).total_seconds()
+
+
+class StatsService:
+    """
+    Инкрементальное ведение таблицы daily_stats.
+    Вызывается в той же транзакции, что и смена статуса записки.
+    """
+    
+    @staticmethod
+    async def _increment(
+        session: AsyncSession,
+        parish_id: int,
+        day: date,
+        note_type: NoteType,
+        reader_id: int,
+        **values
+    ):
+        """Upsert строки агрегата с прибавлением values к счетчикам."""
+        dialect = session.bind.dialect.name
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        
+        statement = insert(DailyStat).values(
+            parish_id=parish_id,
+            day=day,
+            note_type=note_type,
+            reader_id=reader_id,
+            **values
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["parish_id", "day", "note_type", "reader_id"],
+            set_={
+                name: getattr(DailyStat, name) + getattr(statement.excluded, name)
+                for name in values
+            }
+        )
+        await session.execute(statement)
+    
+    @staticmethod
+    async def record_paid(
+        session: AsyncSession,
+        parish_id: int,
+        note_type: NoteType,
+        amount: float,
+        count: int = 1
+    ):
+        """Учесть оплату записок (без commit)."""
+        await StatsService._increment(
+            session,
+            parish_id,
+            datetime.now().date(),
+            note_type,
+            NO_READER,
+            notes_paid=count,
+            donations_sum=amount
+        )
+    
+    @staticmethod
+    async def record_read(
+        session: AsyncSession,
+        parish_id: int,
+        note_type: NoteType,
+        reader_id: int | None,
+        latency_seconds: float | None,
+        count: int = 1
+    ):
+        """Учесть прочтение записок (без commit); latency_seconds - сумма по запискам."""
+        await StatsService._increment(
+            session,
+            parish_id,
+            datetime.now().date(),
+            note_type,
+            reader_id or NO_READER,
+            notes_read=count,
+            read_latency_sum=max(latency_seconds or 0.0, 0.0)
+        )
+    
+    @staticmethod
+    async def get_daily_report(session: AsyncSession, parish_id: int, days: int) -> list:
+        """
+        Сводка прихода по дням и типам записок за последние days дней.
+        Строки: (day, note_type, notes_paid, donations_sum, notes_read, read_latency_sum).
+        """
+        since = datetime.now().date() - timedelta(days=days - 1)
+        result = await session.execute(
+            select(
+                DailyStat.day,
+                DailyStat.note_type,
+                func.sum(DailyStat.notes_paid),
+                func.sum(DailyStat.donations_sum),
+                func.sum(DailyStat.notes_read),
+                func.sum(DailyStat.read_latency_sum)
+            )
+            .where(DailyStat.parish_id == parish_id, DailyStat.day >= since)
+            .group_by(DailyStat.day, DailyStat.note_type)
+            .order_by(DailyStat.day.desc(), DailyStat.note_type.asc())
+        )
+        return list(result.all())
+    
+    @staticmethod
+    async def get_reader_report(session: AsyncSession, parish_id: int, days: int) -> list:
+        """
+        Прочтения по читающим прихода за последние days дней.
+        Строки: (User, notes_read, read_latency_sum).
+        """
+        since = datetime.now().date() - timedelta(days=days - 1)
+        totals = (
+            select(
+                DailyStat.reader_id,
+                func.sum(DailyStat.notes_read).label("notes_read"),
+                func.sum(DailyStat.read_latency_sum).label("read_latency_sum")
+            )
+            .where(
+                DailyStat.parish_id == parish_id,
+                DailyStat.day >= since,
+                DailyStat.reader_id != NO_READER
+            )
+            .group_by(DailyStat.reader_id)
+            .subquery()
+        )
+        result = await session.execute(
+            select(User, totals.c.notes_read, totals.c.read_latency_sum)
+            .join(totals, totals.c.reader_id == User.id)
+            .order_by(totals.c.notes_read.desc())
+        )
+        return list(result.all())
@@ -0,0 +1,261 @@
+"""Поминовения на период (сорокоуст, год) и ежедневное создание записок."""
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, insert, update, and_, exists, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import db
+from models import (
+    Note, NoteName, NoteStatus, NoteType,
+    Subscription, SubscriptionName, SubscriptionStatus
+)
+from services.logging_service import operation_logger
+from services.stats_service import StatsService
+from services.events_service import event_bus, NOTE_PAID
+from services.slot_service import SlotService
+
+
+logger = logging.getLogger(__name__)
+
+# Доступные периоды поминовения: дней -> название
+SUBSCRIPTION_PERIODS = {
+    40: "Сорокоуст (40 дней)",
+    365: "На год",
+}
+
+
+class SubscriptionService:
+    """
+    Поминовение оплачивается один раз. Каждый день активные поминовения
+    превращаются в обычные оплаченные записки (одна на день), поэтому
+    читающие работают с ними так же, как с разовыми.
+    """
+    
+    @staticmethod
+    async def create_subscription(
+        session: AsyncSession,
+        user_id: int,
+        note_type: NoteType,
+        names_for_health: list[str],
+        names_for_repose: list[str],
+        amount: float,
+        days: int,
+        parish_id: int
+    ) -> Subscription:
+        """Создать поминовение на период в приходе parish_id (ожидает оплаты)."""
+        subscription = Subscription(
+            user_id=user_id,
+            parish_id=parish_id,
+            type=note_type,
+            status=SubscriptionStatus.PENDING,
+            amount=amount,
+            days=days
+        )
+        session.add(subscription)
+        await session.flush()
+        
+        session.add_all(
+            [
+                SubscriptionName(subscription_id=subscription.id, name=name, list_type=NoteType.FOR_HEALTH)
+                for name in names_for_health
+            ] + [
+                SubscriptionName(subscription_id=subscription.id, name=name, list_type=NoteType.FOR_REPOSE)
+                for name in names_for_repose
+            ]
+        )
+        await session.commit()
+        await session.refresh(subscription)
+        
+        operation_logger.log_subscription_created(
+            subscription_id=subscription.id,
+            note_type=note_type.value,
+            names_count=len(names_for_health) + len(names_for_repose),
+            amount=amount,
+            days=days
+        )
+        
+        return subscription
+    
+    @staticmethod
+    async def set_payment_id(
+        session: AsyncSession,
+        subscription_id: int,
+        payment_id: str
+    ) -> bool:
+        """Сохранить ID платежа (статус не меняется до оплаты)."""
+        result = await session.execute(
+            update(Subscription)
+            .where(Subscription.id == subscription_id)
+            .values(payment_id=payment_id)
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def get_by_payment_id(
+        session: AsyncSession,
+        payment_id: str
+    ) -> Subscription | None:
+        """Получить поминовение по ID платежа."""
+        result = await session.execute(
+            select(Subscription).where(Subscription.payment_id == payment_id)
+        )
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def activate(
+        session: AsyncSession,
+        subscription_id: int,
+        payment_id: str,
+        today: date | None = None
+    ) -> bool:
+        """
+        Активировать оплаченное поминовение: период начинается сегодня,
+        записка на сегодня создается сразу.
+        """
+        today = today or datetime.now().date()
+        result = await session.execute(
+            select(Subscription).where(Subscription.id == subscription_id)
+        )
+        subscription = result.scalar_one_or_none()
+        
+        if not subscription or subscription.status != SubscriptionStatus.PENDING:
+            return False
+        
+        subscription.payment_id = payment_id
+        subscription.status = SubscriptionStatus.ACTIVE
+        subscription.paid_at = datetime.now(timezone.utc)
+        subscription.start_date = today
+        subscription.end_date = today + timedelta(days=subscription.days - 1)
+        # Пожертвование учитывается один раз, записки - по мере создания
+        await StatsService.record_paid(
+            session, subscription.parish_id, subscription.type, subscription.amount, 0
+        )
+        
+        created = await SubscriptionService._materialize(session, today, subscription_id)
+        await session.commit()
+        SubscriptionService._publish(created)
+        
+        return True
+    
+    @staticmethod
+    async def materialize_day(day: date | None = None) -> int:
+        """
+        Задача планировщика: завершить истекшие поминовения и создать
+        записки на day для всех активных. Повторный запуск за тот же день
+        ничего не создает. Возвращает количество созданных записок.
+        """
+        day = day or datetime.now().date()
+        
+        async with db.get_session() as session:
+            result = await session.execute(
+                update(Subscription)
+                .where(
+                    and_(
+                        Subscription.status == SubscriptionStatus.ACTIVE,
+                        Subscription.end_date < day
+                    )
+                )
+                .values(status=SubscriptionStatus.COMPLETED)
+            )
+            completed = result.rowcount
+            
+            created = await SubscriptionService._materialize(session, day)
+            await session.commit()
+        
+        SubscriptionService._publish(created)
+        count = sum(created.values())
+        operation_logger.log_subscriptions_materialized(day.isoformat(), count, completed)
+        return count
+    
+    @staticmethod
+    async def _materialize(
+        session: AsyncSession,
+        day: date,
+        subscription_id: int | None = None
+    ) -> Counter:
+        """
+        Создать записки на day двумя INSERT ... SELECT (записки и имена)
+        вместо построчной вставки. Без commit. Возвращает число записок
+        по (приходу, типу); богослужение выбирается в приходе поминовения.
+        """
+        already_created = exists().where(
+            and_(
+                Note.occurrence_date == day,
+                Note.subscription_id == Subscription.id
+            )
+        )
+        conditions = [
+            Subscription.status == SubscriptionStatus.ACTIVE,
+            Subscription.start_date <= day,
+            Subscription.end_date >= day,
+            ~already_created
+        ]
+        if subscription_id is not None:
+            conditions.append(Subscription.id == subscription_id)
+        
+        slot_id = (
+            SlotService.assignable_slot_query(Subscription.parish_id)
+            .correlate(Subscription)
+            .scalar_subquery()
+        )
+        notes_select = select(
+            Subscription.parish_id,
+            Subscription.user_id,
+            Subscription.type,
+            literal(NoteStatus.PAID, Note.status.type),
+            literal(0.0),
+            literal(datetime.now(timezone.utc), Note.paid_at.type),
+            Subscription.id,
+            literal(day, Note.occurrence_date.type),
+            slot_id
+        ).where(and_(*conditions))
+        
+        result = await session.execute(
+            insert(Note)
+            .from_select(
+                [
+                    "parish_id", "user_id", "type", "status", "amount", "paid_at",
+                    "subscription_id", "occurrence_date", "slot_id"
+                ],
+                notes_select
+            )
+            .returning(Note.parish_id, Note.type)
+        )
+        created = Counter(tuple(row) for row in result.all())
+        if not created:
+            return created
+        
+        has_names = exists().where(NoteName.note_id == Note.id)
+        names_conditions = [
+            Note.occurrence_date == day,
+            Note.subscription_id.is_not(None),
+            ~has_names
+        ]
+        if subscription_id is not None:
+            names_conditions.append(Note.subscription_id == subscription_id)
+        
+        await session.execute(
+            insert(NoteName).from_select(
+                ["note_id", "name", "list_type"],
+                select(Note.id, SubscriptionName.name, SubscriptionName.list_type)
+                .join(SubscriptionName, SubscriptionName.subscription_id == Note.subscription_id)
+                .where(and_(*names_conditions))
+            )
+        )
+        
+        for (parish_id, note_type), count in created.items():
+            await StatsService.record_paid(session, parish_id, note_type, 0.0, count)
+        
+        return created
+    
+    @staticmethod
+    def _publish(created: Counter):
+        """Сообщить о новых записках в очереди."""
+        for (parish_id, note_type), count in created.items():
+            event_bus.publish(NOTE_PAID, {
+                "parish_id": parish_id,
+                "note_id": None,
+                "type": note_type,
+                "count": count
+            })
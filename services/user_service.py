@@ -1,11 +1,35 @@
 """Сервис для управления пользователями и ролями."""
+from dataclasses import dataclass
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import selectinload
-from models import User, UserRole
+from models import User, UserRole, DEFAULT_PARISH_ID
 from services.logging_service import operation_logger
 
 
+@dataclass(frozen=True, slots=True)
+class UserInfo:
+    """Данные пользователя для чтения (без ORM-сущности и identity map)."""
+    id: int
+    telegram_id: int
+    parish_id: int
+    role: UserRole
+    on_duty: bool
+
+
+users = User.__table__
+
+# Поиск по Telegram ID выполняется на каждый апдейт (RoleMiddleware):
+# запрос Core строится один раз, SQL берется из кэша компиляции
+USER_BY_TELEGRAM_ID = select(
+    users.c.id,
+    users.c.telegram_id,
+    users.c.parish_id,
+    users.c.role,
+    users.c.on_duty
+).where(users.c.telegram_id == bindparam("telegram_id"))
+
+
 class UserService:
     """Сервис для работы с пользователями."""
     
@@ -13,9 +37,14 @@ class UserService:
     async def get_or_create_user(
         session: AsyncSession,
         telegram_id: int,
-        username: str = None
+        username: str = None,
+        parish_id: int | None = None
     ) -> User:
-        """Получить пользователя или создать нового."""
+        """
+        Получить пользователя или создать нового. parish_id - приход из
+        ссылки /start: обычный пользователь переходит в него, роли
+        священника/алтарника/администратора привязаны к своему приходу.
+        """
         result = await session.execute(
             select(User).where(User.telegram_id == telegram_id)
         )
@@ -25,11 +54,15 @@ class UserService:
             user = User(
                 telegram_id=telegram_id,
                 username=username,
-                role=UserRole.USER
+                role=UserRole.USER,
+                parish_id=parish_id or DEFAULT_PARISH_ID
             )
             session.add(user)
             await session.commit()
             await session.refresh(user)
+        elif parish_id and user.role == UserRole.USER and user.parish_id != parish_id:
+            user.parish_id = parish_id
+            await session.commit()
         
         return user
     
@@ -37,20 +70,20 @@ class UserService:
     async def get_user_by_telegram_id(
         session: AsyncSession,
         telegram_id: int
-    ) -> User | None:
-        """Получить пользователя по Telegram ID."""
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        return result.scalar_one_or_none()
+    ) -> UserInfo | None:
+        """Получить пользователя по Telegram ID (только чтение)."""
+        connection = await session.connection()
+        row = (await connection.execute(USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id})).first()
+        return UserInfo(*row) if row else None
     
     @staticmethod
     async def update_user_role(
         session: AsyncSession,
         user_id: int,
-        new_role: UserRole
+        new_role: UserRole,
+        parish_id: int | None = None
     ) -> bool:
-        """Обновить роль пользователя."""
+        """Обновить роль пользователя (и привязать его к приходу parish_id)."""
         result = await session.execute(
             select(User).where(User.id == user_id)
         )
@@ -61,6 +94,8 @@ class UserService:
         
         old_role = user.role
         user.role = new_role
+        if parish_id:
+            user.parish_id = parish_id
         await session.commit()
         
         operation_logger.log_role_changed(
@@ -74,11 +109,47 @@ class UserService:
     @staticmethod
     async def get_users_by_role(
         session: AsyncSession,
-        role: UserRole
+        role: UserRole,
+        parish_id: int
     ) -> list[User]:
-        """Получить всех пользователей с определенной ролью."""
+        """Получить всех пользователей прихода с определенной ролью."""
         result = await session.execute(
-            select(User).where(User.role == role)
+            select(User).where(User.parish_id == parish_id, User.role == role)
+        )
+        return list(result.scalars().all())
+    
+    @staticmethod
+    async def set_on_duty(
+        session: AsyncSession,
+        user_id: int,
+        on_duty: bool
+    ) -> bool:
+        """Включить или выключить дежурство читающего."""
+        result = await session.execute(
+            update(User).where(User.id == user_id).values(on_duty=on_duty)
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def get_telegram_ids(session: AsyncSession, user_ids: set[int]) -> dict[int, int]:
+        """Telegram ID пользователей: {user_id: telegram_id}."""
+        if not user_ids:
+            return {}
+        result = await session.execute(
+            select(User.id, User.telegram_id).where(User.id.in_(user_ids))
+        )
+        return dict(result.all())
+    
+    @staticmethod
+    async def get_on_duty_readers(session: AsyncSession, parish_id: int) -> list[User]:
+        """Получить дежурных священников и алтарников прихода."""
+        result = await session.execute(
+            select(User).where(
+                User.parish_id == parish_id,
+                User.on_duty.is_(True),
+                User.role.in_((UserRole.PRIEST, UserRole.ALTAR_SERVER))
+            )
         )
         return list(result.scalars().all())
     
@@ -0,0 +1,64 @@
+"""Общие настройки тестов: SQLite вместо PostgreSQL, без .env разработчика."""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+import pytest
+
+# До импорта config: настройки читаются при импорте модуля
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def run_db():
+    """
+    Выполнить сценарий на свежей базе в памяти: глобальный db сервисов
+    создается через init_db и закрывается после сценария, снимки
+    настроек возвращаются к значениям из окружения.
+    """
+    from database import db
+    from services.settings_service import _snapshots
+    
+    def run(scenario):
+        async def main():
+            await db.init_db()
+            try:
+                return await scenario()
+            finally:
+                await db.close()
+                for snapshot in _snapshots.values():
+                    snapshot._apply({}, 0)
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def far_east_timezone(monkeypatch):
+    """Часовой пояс сервера далеко от UTC (UTC+10), как у части приходов."""
+    monkeypatch.setenv("TZ", "Asia/Vladivostok")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def payment_statuses(monkeypatch):
+    """
+    Статусы платежей вместо запросов к YooKassa: {payment_id: статус}.
+    Платеж без статуса - ошибка запроса (None).
+    """
+    from services.payment_service import yookassa_client
+    
+    statuses = {}
+    
+    async def get_payment_statuses(payment_ids, credentials=None):
+        return {
+            payment_id: {"id": payment_id, "status": statuses[payment_id]} if payment_id in statuses else None
+            for payment_id in payment_ids
+        }
+    
+    monkeypatch.setattr(yookassa_client, "get_payment_statuses", get_payment_statuses)
+    return statuses
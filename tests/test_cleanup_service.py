@@ -0,0 +1,103 @@
+"""Истечение неоплаченных записок и поминовений (CleanupService)."""
+from sqlalchemy import select, update
+from database import db
+from models import (
+    DEFAULT_PARISH_ID, Note, NoteName, NoteStatus, NoteType,
+    Subscription, SubscriptionName, SubscriptionStatus
+)
+from services.cleanup_service import CleanupService
+from services.note_service import NoteService
+from services.subscription_service import SubscriptionService
+from services.user_service import UserService
+
+
+async def create_pending_notes(payment_ids: list[str | None]) -> list[int]:
+    """Неоплаченные записки с одним именем; None - платеж не создавался."""
+    async with db.get_session() as session:
+        user = await UserService.get_or_create_user(session, 1)
+        ids = []
+        for payment_id in payment_ids:
+            note = await NoteService.create_note(
+                session, user.id, NoteType.FOR_HEALTH, ["Иоанн"], [], 100.0, DEFAULT_PARISH_ID
+            )
+            if payment_id:
+                await NoteService.set_payment_id(session, note.id, payment_id)
+            ids.append(note.id)
+        return ids
+
+
+async def note_states() -> dict[int, tuple[NoteStatus, int]]:
+    """{id записки: (статус, количество имен)}."""
+    async with db.get_session() as session:
+        notes = (await session.execute(select(Note.id, Note.status))).all()
+        names = (await session.execute(select(NoteName.note_id))).scalars().all()
+    return {note_id: (status, names.count(note_id)) for note_id, status in notes}
+
+
+def test_expire_pending_notes(run_db, payment_statuses):
+    payment_statuses.update({"canceled": "canceled", "waiting": "pending", "succeeded": "succeeded"})
+    
+    async def scenario():
+        ids = await create_pending_notes([None, "canceled", "waiting", "succeeded", "failed-request"])
+        # ttl_hours < 0: все записки уже просрочены
+        result = await CleanupService.expire_pending_notes(ttl_hours=-1)
+        return ids, result, await note_states()
+    
+    (unpaid, canceled, waiting, succeeded, unknown), result, states = run_db(scenario)
+    
+    assert result == (2, 1)
+    assert unpaid not in states and canceled not in states
+    assert states[waiting] == (NoteStatus.PENDING, 1)
+    assert states[succeeded] == (NoteStatus.PAID, 1)
+    # Статус не получен - записка ждет следующего запуска
+    assert states[unknown] == (NoteStatus.PENDING, 1)
+
+
+def test_expire_keeps_names_of_note_paid_during_check(run_db, payment_statuses, monkeypatch):
+    from services.payment_service import yookassa_client
+    check = yookassa_client.get_payment_statuses
+    
+    async def paid_by_webhook_during_check(payment_ids, credentials=None):
+        # Webhook проводит оплату, пока сверка ждет ответа YooKassa
+        async with db.get_session() as session:
+            await session.execute(update(Note).values(status=NoteStatus.PAID))
+            await session.commit()
+        return await check(payment_ids, credentials)
+    
+    payment_statuses["late"] = "canceled"
+    monkeypatch.setattr(yookassa_client, "get_payment_statuses", paid_by_webhook_during_check)
+    
+    async def scenario():
+        (note_id,) = await create_pending_notes(["late"])
+        result = await CleanupService.expire_pending_notes(ttl_hours=-1)
+        return result, (await note_states())[note_id]
+    
+    assert run_db(scenario) == ((0, 0), (NoteStatus.PAID, 1))
+
+
+def test_expire_pending_subscriptions(run_db, payment_statuses):
+    payment_statuses.update({"sub-canceled": "canceled", "sub-succeeded": "succeeded"})
+    
+    async def scenario():
+        async with db.get_session() as session:
+            user = await UserService.get_or_create_user(session, 1)
+            ids = []
+            for payment_id in ("sub-canceled", "sub-succeeded"):
+                subscription = await SubscriptionService.create_subscription(
+                    session, user.id, NoteType.FOR_REPOSE, [], ["Петр"], 1200.0, 40, DEFAULT_PARISH_ID
+                )
+                await SubscriptionService.set_payment_id(session, subscription.id, payment_id)
+                ids.append(subscription.id)
+        
+        result = await CleanupService.expire_pending_subscriptions(ttl_hours=-1)
+        
+        async with db.get_session() as session:
+            statuses = dict((await session.execute(select(Subscription.id, Subscription.status))).all())
+            names = (await session.execute(select(SubscriptionName.subscription_id))).scalars().all()
+        return ids, result, statuses, names
+    
+    (canceled, succeeded), result, statuses, names = run_db(scenario)
+    
+    assert result == (1, 1)
+    assert statuses == {succeeded: SubscriptionStatus.ACTIVE}
+    assert names == [succeeded]
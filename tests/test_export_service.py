@@ -0,0 +1,95 @@
+"""Выгрузка для бухгалтерии (ExportService)."""
+import asyncio
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta, timezone
+from database import db
+from models import DEFAULT_PARISH_ID, NoteType
+from services import export_service
+from services.archive_service import ArchiveService
+from services.export_service import ExportService, parse_date_range
+from services.note_service import NoteService
+from services.subscription_service import SubscriptionService
+from services.user_service import UserService
+
+
+async def create_paid_notes(count: int, amount: float = 100.0):
+    """count оплаченных записок одного пользователя."""
+    async with db.get_session() as session:
+        user = await UserService.get_or_create_user(session, 1)
+        for index in range(count):
+            note = await NoteService.create_note(
+                session, user.id, NoteType.FOR_HEALTH, ["Иоанн"], [], amount, DEFAULT_PARISH_ID
+            )
+            await NoteService.update_note_payment(session, note.id, f"pay-{index}")
+
+
+def read_csv(chunks: list[bytes]) -> list[dict]:
+    """Строки выгрузки из gzip-чанков CSV."""
+    return list(csv.DictReader(io.StringIO(gzip.decompress(b"".join(chunks)).decode())))
+
+
+def test_export_releases_connection_between_batches(run_db, monkeypatch):
+    monkeypatch.setattr(export_service, "FETCH_ROWS", 2)
+    
+    async def scenario():
+        await create_paid_notes(5)
+        now = datetime.now(timezone.utc)
+        chunks = []
+        async for chunk in ExportService.iter_export(now - timedelta(hours=1), now + timedelta(hours=1)):
+            chunks.append(chunk)
+            # Пока клиент читает выгрузку, другие запросы получают соединение
+            async with db.get_session() as session:
+                await asyncio.wait_for(UserService.get_user_by_telegram_id(session, 1), timeout=1)
+        return chunks
+    
+    rows = read_csv(run_db(scenario))
+    
+    assert [int(row["note_id"]) for row in rows] == [1, 2, 3, 4, 5]
+
+
+def test_date_range_uses_local_days(far_east_timezone):
+    start, end = parse_date_range("2026-10-18", "2026-10-18")
+    
+    # Местная полночь во Владивостоке (UTC+10) - 14:00 UTC предыдущего дня
+    assert start == datetime(2026, 10, 17, 14, tzinfo=timezone.utc)
+    assert end == datetime(2026, 10, 18, 14, tzinfo=timezone.utc)
+
+
+def test_export_totals_cover_notes_archive_and_subscriptions(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            user = await UserService.get_or_create_user(session, 1)
+            paid = []
+            for amount in (100.0, 250.0):
+                note = await NoteService.create_note(
+                    session, user.id, NoteType.FOR_HEALTH, ["Иоанн"], [], amount, DEFAULT_PARISH_ID
+                )
+                await NoteService.update_note_payment(session, note.id, f"pay-{note.id}")
+                paid.append(note)
+            await NoteService.create_note(
+                session, user.id, NoteType.FOR_HEALTH, ["Анна"], [], 50.0, DEFAULT_PARISH_ID
+            )
+            subscription = await SubscriptionService.create_subscription(
+                session, user.id, NoteType.FOR_REPOSE, [], ["Петр"], 1200.0, 40, DEFAULT_PARISH_ID
+            )
+            await SubscriptionService.activate(session, subscription.id, "sub-pay")
+            await NoteService.mark_note_as_read(session, paid[0].id, "priest")
+        # Прочитанная записка уходит в архив и выгружается оттуда
+        await ArchiveService.archive_notes(older_than_days=-1)
+        
+        start, end = parse_date_range(None, None)
+        return [chunk async for chunk in ExportService.iter_export(start, end)]
+    
+    rows = read_csv(run_db(scenario))
+    
+    by_source = {}
+    for row in rows:
+        by_source.setdefault(row["source"], []).append((row["status"], float(row["amount"])))
+    assert sorted(by_source["notes"]) == [("paid", 0.0), ("paid", 250.0), ("pending", 50.0)]
+    assert by_source["archive"] == [("read", 100.0)]
+    assert by_source["subscriptions"] == [("active", 1200.0)]
+    # Получено: разовые записки и поминовение, ожидающая оплаты не входит
+    received = sum(amount for status, amount in sum(by_source.values(), []) if status != "pending")
+    assert received == 1550.0
@@ -0,0 +1,81 @@
+"""Оплата и прочтение записок (NoteService): время и статистика."""
+from datetime import timedelta, timezone
+from sqlalchemy import select
+from database import db
+from models import DEFAULT_PARISH_ID, DailyStat, Note, NoteStatus, NoteType
+from services.note_service import NoteService
+from services.slot_service import SlotService, local_now
+from services.user_service import UserService
+
+
+async def create_paid_note(session, telegram_id: int) -> Note:
+    """Оплаченная записка нового пользователя в приходе по умолчанию."""
+    user = await UserService.get_or_create_user(session, telegram_id)
+    note = await NoteService.create_note(
+        session, user.id, NoteType.FOR_HEALTH, ["Иоанн"], [], 100.0, DEFAULT_PARISH_ID
+    )
+    await NoteService.update_note_payment(session, note.id, f"pay-{telegram_id}")
+    return note
+
+
+async def read_stats(session) -> tuple[int, float]:
+    """Прочтения и суммарная задержка оплата -> прочтение."""
+    result = await session.execute(
+        select(DailyStat.notes_read, DailyStat.read_latency_sum)
+        .where(DailyStat.reader_id != 0)
+    )
+    rows = result.all()
+    return sum(row[0] for row in rows), sum(row[1] for row in rows)
+
+
+def test_read_latency_ignores_server_timezone(run_db, far_east_timezone):
+    async def scenario():
+        async with db.get_session() as session:
+            reader = await UserService.get_or_create_user(session, 100)
+            single = await create_paid_note(session, 1)
+            assert await NoteService.mark_note_as_read(session, single.id, "priest", reader_id=reader.id)
+        
+        async with db.get_session() as session:
+            slot = await SlotService.add_slot(
+                session, DEFAULT_PARISH_ID, local_now() + timedelta(days=1), "Литургия"
+            )
+            await create_paid_note(session, 2)
+            assert await NoteService.mark_slot_as_read(session, DEFAULT_PARISH_ID, slot.id, "priest", reader_id=reader.id)
+        
+        async with db.get_session() as session:
+            notes = (await session.execute(select(Note))).scalars().all()
+            return notes, await read_stats(session)
+    
+    notes, (reads, latency) = run_db(scenario)
+    
+    assert [note.status for note in notes] == [NoteStatus.READ, NoteStatus.READ]
+    for note in notes:
+        assert note.paid_at.tzinfo == timezone.utc
+        assert note.read_at.tzinfo == timezone.utc
+        assert 0 <= (note.read_at - note.paid_at).total_seconds() < 60
+    assert reads == 2
+    # Смещение в 10 часов дало бы 36000 секунд на записку
+    assert 0 <= latency < 60
+
+
+def test_queue_pages_cover_queue_once(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            ids = [(await create_paid_note(session, telegram_id)).id for telegram_id in range(1, 6)]
+            pages = []
+            after_id = None
+            while True:
+                rows, after_id = await NoteService.get_queue_page(
+                    session, DEFAULT_PARISH_ID, NoteType.FOR_HEALTH, after_id, limit=2
+                )
+                pages.append([row[0] for row in rows])
+                if after_id is None:
+                    return ids, pages
+                # Прочтение между страницами не сдвигает курсор
+                if len(pages) == 1:
+                    await NoteService.mark_note_as_read(session, ids[0], "priest")
+    
+    ids, pages = run_db(scenario)
+    
+    # Записки созданы в одну секунду: порядок при равном created_at - по id
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
@@ -0,0 +1,34 @@
+"""Подписанные ссылки на версию для печати (print_service)."""
+import time
+from urllib.parse import parse_qs, urlsplit
+from services.print_service import build_print_url, verify_print_signature
+
+
+def link_params(slot_id: int) -> tuple[str, str]:
+    """(exp, sig) из ссылки на печать пачки slot_id."""
+    query = parse_qs(urlsplit(build_print_url(slot_id)).query)
+    return query["exp"][0], query["sig"][0]
+
+
+def test_signed_link_is_accepted():
+    expires, signature = link_params(7)
+    
+    assert verify_print_signature(7, expires, signature)
+
+
+def test_signature_is_bound_to_slot_and_expiry():
+    expires, signature = link_params(7)
+    
+    assert not verify_print_signature(8, expires, signature)
+    assert not verify_print_signature(7, str(int(expires) + 60), signature)
+    assert not verify_print_signature(7, expires, signature[:-1] + ("0" if signature[-1] != "0" else "1"))
+    assert not verify_print_signature(7, expires, "")
+
+
+def test_expired_or_malformed_link_is_rejected(monkeypatch):
+    expires, signature = link_params(7)
+    
+    assert not verify_print_signature(7, "", signature)
+    assert not verify_print_signature(7, "-1", signature)
+    monkeypatch.setattr(time, "time", lambda: int(expires) + 1)
+    assert not verify_print_signature(7, expires, signature)
@@ -0,0 +1,50 @@
+"""Сверка зависших оплат с YooKassa (ReconciliationService)."""
+from sqlalchemy import func, select
+from database import db
+from models import DEFAULT_PARISH_ID, DailyStat, Note, NoteStatus, NoteType, Subscription, SubscriptionStatus
+from services.note_service import NoteService
+from services.reconciliation_service import ReconciliationService
+from services.subscription_service import SubscriptionService
+from services.user_service import UserService
+
+
+def test_reconcile_recovers_lost_webhooks_once(run_db, payment_statuses):
+    payment_statuses.update({"paid-1": "succeeded", "paid-2": "succeeded", "waiting": "pending", "sub": "succeeded"})
+    
+    async def scenario():
+        async with db.get_session() as session:
+            user = await UserService.get_or_create_user(session, 1)
+            for payment_id, amount in (("paid-1", 100.0), ("paid-2", 250.0), ("waiting", 50.0)):
+                note = await NoteService.create_note(
+                    session, user.id, NoteType.FOR_HEALTH, ["Иоанн"], [], amount, DEFAULT_PARISH_ID
+                )
+                await NoteService.set_payment_id(session, note.id, payment_id)
+            subscription = await SubscriptionService.create_subscription(
+                session, user.id, NoteType.FOR_REPOSE, [], ["Петр"], 1200.0, 40, DEFAULT_PARISH_ID
+            )
+            await SubscriptionService.set_payment_id(session, subscription.id, "sub")
+        
+        # min_age_minutes < 0: только что созданные записки уже в окне сверки
+        runs = []
+        for _ in range(2):
+            runs.append((
+                await ReconciliationService.reconcile_pending_payments(min_age_minutes=-1),
+                await ReconciliationService.reconcile_pending_subscriptions(min_age_minutes=-1),
+            ))
+        
+        async with db.get_session() as session:
+            notes = dict((await session.execute(select(Note.payment_id, Note.status))).all())
+            subscription = await session.get(Subscription, subscription.id)
+            paid = (await session.execute(
+                select(func.sum(DailyStat.donations_sum)).where(DailyStat.reader_id == 0)
+            )).scalar_one()
+        return runs, notes, subscription.status, paid
+    
+    runs, notes, subscription_status, paid = run_db(scenario)
+    
+    # Повторный запуск ничего не проводит второй раз
+    assert runs == [(2, 1), (0, 0)]
+    assert notes["paid-1"] == notes["paid-2"] == NoteStatus.PAID
+    assert notes["waiting"] == NoteStatus.PENDING
+    assert subscription_status == SubscriptionStatus.ACTIVE
+    assert paid == 100.0 + 250.0 + 1200.0
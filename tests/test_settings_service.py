@@ -0,0 +1,56 @@
+"""Снимки настроек прихода и их версия в БД (SettingsService)."""
+from sqlalchemy import delete, select
+from config import Config
+from database import db
+from models import DEFAULT_PARISH_ID, Setting
+from services.settings_service import VERSION_KEY, Settings, SettingsService, get_settings
+
+
+def test_apply_overrides_environment_defaults():
+    snapshot = Settings()
+    snapshot._apply({"min_donation_amount": "150", "max_names_per_note": "20"}, 3)
+    
+    assert snapshot.MIN_DONATION_AMOUNT == 150.0
+    assert snapshot.MAX_NAMES_PER_NOTE == 20
+    assert snapshot.PAYMENT_DESCRIPTION == Config.PAYMENT_DESCRIPTION
+    assert snapshot.version == 3
+
+
+def test_apply_resets_removed_and_invalid_rows():
+    snapshot = Settings()
+    snapshot._apply({"min_donation_amount": "150", "max_names_per_note": "20"}, 1)
+    snapshot._apply({"max_names_per_note": "-5"}, 2)
+    
+    assert snapshot.MIN_DONATION_AMOUNT == Config.MIN_DONATION_AMOUNT
+    assert snapshot.MAX_NAMES_PER_NOTE == Config.MAX_NAMES_PER_NOTE
+    assert snapshot.version == 2
+
+
+def test_set_value_bumps_version_in_database(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            session.add(Setting(parish_id=DEFAULT_PARISH_ID, key=VERSION_KEY, value="5"))
+            await session.commit()
+            # Версия в БД обогнала снимок процесса (изменение из другого процесса)
+            await SettingsService.set_value(session, "max_names_per_note", "20")
+            await SettingsService.set_value(session, "max_names_per_note", "30")
+            rows = (await session.execute(select(Setting.key, Setting.value))).all()
+        return dict(rows), get_settings().version, get_settings().MAX_NAMES_PER_NOTE
+    
+    rows, version, names_limit = run_db(scenario)
+    
+    assert rows == {VERSION_KEY: "7", "max_names_per_note": "30"}
+    assert (version, names_limit) == (7, 30)
+
+
+def test_refresh_resets_snapshot_without_version_row(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            await SettingsService.set_value(session, "max_names_per_note", "20")
+            # Другой процесс удалил настройки прихода
+            await session.execute(delete(Setting))
+            await session.commit()
+        await SettingsService.refresh_if_changed()
+        return get_settings().version, get_settings().MAX_NAMES_PER_NOTE
+    
+    assert run_db(scenario) == (0, Config.MAX_NAMES_PER_NOTE)
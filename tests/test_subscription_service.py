@@ -0,0 +1,109 @@
+"""Поминовения на период: оплата, ежедневные записки и выгрузка."""
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import func, select
+from database import db
+from models import (
+    DEFAULT_PARISH_ID, DailyStat, Note, NoteName, NoteStatus, NoteType,
+    Subscription, SubscriptionName, SubscriptionStatus
+)
+from services.archive_service import ArchiveService
+from services.export_service import ExportService
+from services.subscription_service import SubscriptionService
+from services.user_service import UserService
+
+
+TODAY = date.today() - timedelta(days=10)
+
+
+async def create_active_subscription(session, days: int = 3, payment_id: str = "sub-pay-1") -> Subscription:
+    """Оплаченное поминовение на days дней, начиная с TODAY."""
+    user = await UserService.get_or_create_user(session, 1)
+    subscription = await SubscriptionService.create_subscription(
+        session, user.id, NoteType.FOR_REPOSE, [], ["Петр", "Мария"], 1200.0, days, DEFAULT_PARISH_ID
+    )
+    assert await SubscriptionService.activate(session, subscription.id, payment_id, today=TODAY)
+    return subscription
+
+
+def test_materialization_creates_one_note_per_day(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            subscription = await create_active_subscription(session)
+            # Повторная оплата того же поминовения ничего не создает
+            assert not await SubscriptionService.activate(session, subscription.id, "sub-pay-1", today=TODAY)
+        
+        created = [
+            await SubscriptionService.materialize_day(TODAY + timedelta(days=offset))
+            for offset in (0, 1, 2, 3)
+        ]
+        
+        async with db.get_session() as session:
+            notes = (await session.execute(select(Note).order_by(Note.occurrence_date))).scalars().all()
+            names = (await session.execute(select(func.count(NoteName.id)))).scalar_one()
+            subscription = await session.get(Subscription, subscription.id)
+            paid = (await session.execute(
+                select(func.sum(DailyStat.notes_paid), func.sum(DailyStat.donations_sum))
+                .where(DailyStat.reader_id == 0)
+            )).one()
+            return created, notes, names, subscription, tuple(paid)
+    
+    created, notes, names, subscription, (notes_paid, donations) = run_db(scenario)
+    
+    # День оплаты уже создан при активации, последний день периода - TODAY + 2
+    assert created == [0, 1, 1, 0]
+    assert [note.occurrence_date for note in notes] == [TODAY + timedelta(days=offset) for offset in range(3)]
+    assert all(note.status == NoteStatus.PAID and note.amount == 0 for note in notes)
+    assert names == 6
+    assert subscription.status == SubscriptionStatus.COMPLETED
+    assert subscription.end_date == TODAY + timedelta(days=2)
+    # Пожертвование учитывается один раз, записки - по одной в день
+    assert (notes_paid, donations) == (3, 1200.0)
+
+
+def test_export_includes_subscription_payment(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            await create_active_subscription(session)
+        
+        now = datetime.now(timezone.utc)
+        return [
+            row async for row in ExportService.iter_rows(now - timedelta(hours=1), now + timedelta(hours=1))
+        ]
+    
+    rows = run_db(scenario)
+    
+    payments = [row for row in rows if row[0] == "subscriptions"]
+    assert len(payments) == 1
+    _, _, note_type, status, amount, payment_id, _, paid_at, _ = payments[0]
+    assert (note_type, status, amount, payment_id) == (
+        NoteType.FOR_REPOSE, SubscriptionStatus.ACTIVE, 1200.0, "sub-pay-1"
+    )
+    assert paid_at is not None
+    # Записка дня оплаты выгружается без суммы, чтобы не учесть пожертвование дважды
+    assert sum(row[4] for row in rows) == 1200.0
+
+
+def test_completed_subscription_names_are_purged(run_db):
+    async def scenario():
+        async with db.get_session() as session:
+            finished = await create_active_subscription(session)
+            running = await create_active_subscription(session, days=40, payment_id="sub-pay-2")
+        # Первое поминовение завершилось 8 дней назад, второе еще идет
+        await SubscriptionService.materialize_day(date.today())
+        
+        purged = await ArchiveService.purge_subscription_names(older_than_days=7)
+        
+        async with db.get_session() as session:
+            remaining = (await session.execute(
+                select(SubscriptionName.subscription_id).distinct()
+            )).scalars().all()
+            note_names = (await session.execute(select(func.count(NoteName.id)))).scalar_one()
+            return purged, remaining, note_names, finished.id, running.id
+    
+    purged, remaining, note_names, finished_id, running_id = run_db(scenario)
+    
+    assert purged == 1
+    assert remaining == [running_id]
+    # Записки по дням (день оплаты каждого и сегодня у идущего) хранят
+    # свои копии имен до архивации
+    assert note_names == 2 * 3
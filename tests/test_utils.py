@@ -0,0 +1,11 @@
+"""Вспомогательные функции (utils)."""
+from utils import decode_id, encode_id
+
+
+def test_callback_ids_round_trip_compactly():
+    for value in (0, 1, 35, 36, 10 ** 6, 2 ** 63 - 1):
+        assert decode_id(encode_id(value)) == value
+    
+    assert encode_id(35) == "z"
+    # Максимальный BIGINT укладывается в 13 символов callback_data
+    assert len(encode_id(2 ** 63 - 1)) == 13
@@ -1,6 +1,13 @@
 """Вспомогательные функции."""
 import re
-from config import Config
+from services.settings_service import Settings, settings
+
+
+# Разрешаем только буквы, пробелы, дефисы и апострофы
+NAME_PATTERN = re.compile(r"[а-яА-ЯёЁa-zA-Z\s\-\']+")
+
+# Сколько ошибок показывать пользователю в одном ответе
+MAX_REPORTED_ERRORS = 20
 
 
 def validate_name(name: str) -> tuple[bool, str]:
@@ -16,25 +23,80 @@ def validate_name(name: str) -> tuple[bool, str]:
     if len(name) > 100:
         return False, "Имя слишком длинное (максимум 100 символов)"
     
-    # Разрешаем только буквы, пробелы, дефисы и апострофы
-    if not re.match(r'^[а-яА-ЯёЁa-zA-Z\s\-\']+$', name):
+    if not NAME_PATTERN.fullmatch(name):
         return False, "Имя содержит недопустимые символы"
     
     return True, ""
 
 
-def validate_names_list(names: list[str]) -> tuple[bool, str]:
+def parse_names(text: str) -> list[str]:
+    """Разбить текст на имена: по одному на строку, пустые строки пропускаются."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def validate_new_names(
+    new_names: list[str],
+    current_count: int = 0,
+    limits: Settings | None = None
+) -> list[str]:
+    """
+    Валидация новых имен за один проход.
+    current_count - сколько имен уже добавлено в записку,
+    limits - настройки прихода (по умолчанию - прихода по умолчанию).
+    Возвращает список ошибок (пустой, если все имена корректны).
+    """
+    limits = limits or settings
+    errors = []
+    
+    if not new_names:
+        return ["Список имен не может быть пустым"]
+    
+    total = current_count + len(new_names)
+    if total > limits.MAX_NAMES_PER_NOTE:
+        errors.append(
+            f"Максимальное количество имен: {limits.MAX_NAMES_PER_NOTE} "
+            f"(уже добавлено {current_count}, в сообщении {len(new_names)})"
+        )
+    
+    fullmatch = NAME_PATTERN.fullmatch
+    for index, name in enumerate(new_names, 1):
+        if len(name) > 100:
+            errors.append(f"Имя №{index}: слишком длинное (максимум 100 символов)")
+        elif not fullmatch(name):
+            errors.append(f"Имя №{index} ('{name}'): содержит недопустимые символы")
+    
+    return errors
+
+
+def format_errors(errors: list[str]) -> str:
+    """Форматирование списка ошибок для ответа пользователю."""
+    shown = errors[:MAX_REPORTED_ERRORS]
+    text = "❌ Ошибки в списке имен:\n" + "\n".join(f"• {error}" for error in shown)
+    
+    hidden = len(errors) - len(shown)
+    if hidden > 0:
+        text += f"\n…и еще ошибок: {hidden}"
+    
+    return text
+
+
+def validate_names_list(names: list[str], limits: Settings | None = None) -> tuple[bool, str]:
     """
     Валидация списка имен.
     Возвращает (is_valid, error_message).
     """
+    limits = limits or settings
     if not names:
         return False, "Список имен не может быть пустым"
     
-    if len(names) > Config.MAX_NAMES_PER_NOTE:
-        return False, f"Максимальное количество имен: {Config.MAX_NAMES_PER_NOTE}"
+    if len(names) > limits.MAX_NAMES_PER_NOTE:
+        return False, f"Максимальное количество имен: {limits.MAX_NAMES_PER_NOTE}"
     
+    fullmatch = NAME_PATTERN.fullmatch
     for name in names:
+        stripped = name.strip() if name else ""
+        if stripped and len(stripped) <= 100 and fullmatch(stripped):
+            continue
         is_valid, error = validate_name(name)
         if not is_valid:
             return False, f"Ошибка в имени '{name}': {error}"
@@ -42,13 +104,14 @@ def validate_names_list(names: list[str]) -> tuple[bool, str]:
     return True, ""
 
 
-def validate_amount(amount: float) -> tuple[bool, str]:
+def validate_amount(amount: float, limits: Settings | None = None) -> tuple[bool, str]:
     """
     Валидация суммы пожертвования.
     Возвращает (is_valid, error_message).
     """
-    if amount < Config.MIN_DONATION_AMOUNT:
-        return False, f"Минимальная сумма пожертвования: {Config.MIN_DONATION_AMOUNT:.2f} руб."
+    limits = limits or settings
+    if amount < limits.MIN_DONATION_AMOUNT:
+        return False, f"Минимальная сумма пожертвования: {limits.MIN_DONATION_AMOUNT:.2f} руб."
     
     if amount > 1000000:
         return False, "Сумма слишком большая"
@@ -74,6 +137,22 @@ def format_note_text(note_type: str, names_for_health: list[str], names_for_repo
     return text
 
 
+def encode_id(value: int) -> str:
+    """Число в base36 для компактного callback_data (лимит Telegram - 64 байта)."""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        value, remainder = divmod(value, 36)
+        encoded = digits[remainder] + encoded
+        if value == 0:
+            return encoded
+
+
+def decode_id(value: str) -> int:
+    """Обратное преобразование encode_id."""
+    return int(value, 36)
+
+
 def format_prayer_text(note_type: str, names: list[str]) -> str:
     """Форматирование молитвы для прочтения."""
     if note_type == "for_health":